@@ -1,4 +1,4 @@
-import os, sys, re
+import codecs, hashlib, os, sys, tempfile
 import requests
 from urllib.parse import urlparse
 
@@ -27,36 +27,49 @@ def _is_trusted_host(url: str) -> bool:
 		return False
 	return hostname in _TRUSTED_HOSTS or hostname.endswith(".l42.eu")
 
-def fetch_url(system, url):
-	def _build_auth_header(target_url: str) -> dict:
-		"""Return an auth header dict for target_url, or {} if credentials must not be sent."""
-		if not system.startswith("lucos_"):
-			return {}
-		if not _is_trusted_host(target_url):
-			print(f"Skipping auth header for untrusted host: {urlparse(target_url).hostname}")
-			return {}
-		key_var = f"KEY_{system.upper()}"
-		key = os.environ.get(key_var)
-		if not key:
-			sys.exit(
-				f"No {key_var} environment variable found — won't be able to authenticate against ingestion endpoint {target_url}"
-			)
-		return {"Authorization": f"Bearer {key}"}
-
-	# In dev environment, where URLs can be referencing localhost, switch domain to the docker internal domain to allow requests between containers
-	def map_localhost(url) -> str:
-		if url.startswith("http://localhost:"):
-			return url.replace("http://localhost:", "http://host.docker.internal:")
-		return url
-
-	url = map_localhost(url)
+# Bodies of live-source exports larger than this are spooled to a temporary
+# file rather than held in memory.
+SPOOL_MEMORY_LIMIT = 8 * 1024 * 1024
+STREAM_CHUNK_SIZE = 64 * 1024
+
+RDF_CONTENT_TYPES = {"text/turtle", "application/rdf+xml", "application/ld+json", "application/n-triples"}
+
+# Schema.org http → https
+SCHEMA_ORG_HTTP = "http://schema.org/"
+SCHEMA_ORG_HTTPS = "https://schema.org/"
+
+def _build_auth_header(system, target_url: str) -> dict:
+	"""Return an auth header dict for target_url, or {} if credentials must not be sent."""
+	if not system.startswith("lucos_"):
+		return {}
+	if not _is_trusted_host(target_url):
+		print(f"Skipping auth header for untrusted host: {urlparse(target_url).hostname}")
+		return {}
+	key_var = f"KEY_{system.upper()}"
+	key = os.environ.get(key_var)
+	if not key:
+		sys.exit(
+			f"No {key_var} environment variable found — won't be able to authenticate against ingestion endpoint {target_url}"
+		)
+	return {"Authorization": f"Bearer {key}"}
+
+# In dev environment, where URLs can be referencing localhost, switch domain to the docker internal domain to allow requests between containers
+def _map_localhost(url) -> str:
+	if url.startswith("http://localhost:"):
+		return url.replace("http://localhost:", "http://host.docker.internal:")
+	return url
+
+def _get(system, url, extra_headers, stream):
+	"""GET url with auth headers, following the first redirect manually."""
+	url = _map_localhost(url)
 	print(f"Ingesting data from <{url}>")
 
 	# Fetch data
 	resp = session.get(
 		url,
-		headers={**_build_auth_header(url)},
+		headers={**_build_auth_header(system, url), **extra_headers},
 		allow_redirects=False,
+		stream=stream,
 	)
 
 	# Do first redirect manually so we can re-evaluate auth for the redirect target.
@@ -64,29 +77,131 @@ def fetch_url(system, url):
 	if resp.is_redirect or resp.is_permanent_redirect:
 		redirect_url = resp.headers["Location"]
 		redirect_url = requests.compat.urljoin(resp.url, redirect_url)
-		redirect_url = map_localhost(redirect_url)
+		redirect_url = _map_localhost(redirect_url)
 		print(f"Following redirect to {redirect_url}")
+		resp.close()
 
 		resp = session.get(
 			redirect_url,
-			headers={**_build_auth_header(redirect_url)},
+			headers={**_build_auth_header(system, redirect_url), **extra_headers},
 			allow_redirects=True,
+			stream=stream,
 		)
+	return resp
 
-	resp.raise_for_status()
-	content = resp.text
-
-	# Schema.org http → https
-	content = re.sub(r"http://schema\.org/", "https://schema.org/", content)
+def _rdf_content_type(resp, url) -> str:
+	"""Return the response's media type, raising ValueError if it isn't RDF."""
 	content_type = resp.headers.get("Content-Type", "").split(";")[0]
 
 	# Validate content-type is RDF before returning — uploading non-RDF to Fuseki gives a
 	# cryptic 400 and makes diagnosis hard. Fail fast with a clear error instead.
-	RDF_CONTENT_TYPES = {"text/turtle", "application/rdf+xml", "application/ld+json", "application/n-triples"}
 	if content_type not in RDF_CONTENT_TYPES:
 		raise ValueError(
 			f"Expected RDF content from <{url}> but got Content-Type {content_type!r}. "
 			f"Check auth headers and that the endpoint supports content negotiation for RDF."
 		)
+	return content_type
+
+def _charset(resp) -> str:
+	"""Return the charset declared in the response's Content-Type, defaulting to UTF-8.
+
+	All of the RDF syntaxes we accept are UTF-8 unless declared otherwise, so this
+	deliberately ignores requests' ISO-8859-1 default for text/* types.
+	"""
+	for param in resp.headers.get("Content-Type", "").split(";")[1:]:
+		key, _, value = param.strip().partition("=")
+		if key.lower() == "charset" and value:
+			return value.strip('"')
+	return "utf-8"
+
+def _rewrite_schema_org(text) -> str:
+	"""Rewrite http://schema.org/ URIs in text to https://schema.org/."""
+	return text.replace(SCHEMA_ORG_HTTP, SCHEMA_ORG_HTTPS)
+
+def _partial_match_length(text, pattern) -> int:
+	"""Length of the longest suffix of text which is a proper prefix of pattern."""
+	for length in range(min(len(pattern) - 1, len(text)), 0, -1):
+		if text.endswith(pattern[:length]):
+			return length
+	return 0
+
+def fetch_url(system, url):
+	"""Fetch RDF from url, returning (content, content_type).
 
+	The body is decoded and rewritten exactly as fetch_source does it, so an
+	item reads the same whether a webhook or the bulk ingest wrote it last.
+	"""
+	resp = _get(system, url, {}, stream=False)
+	resp.raise_for_status()
+	content = _rewrite_schema_org(resp.content.decode(_charset(resp), errors="replace"))
+	content_type = _rdf_content_type(resp, url)
 	return (content, content_type)
+
+def fetch_source(system, url, validators=None):
+	"""
+	Fetch RDF from url as a streaming conditional GET.
+
+	*validators* is a dict with optional "etag" and "last_modified" keys, as
+	returned by a previous call.  They are sent as If-None-Match and
+	If-Modified-Since; if the server answers 304 Not Modified, None is returned
+	without any body having been transferred.
+
+	Otherwise returns (body, content_type, validators, payload_hash).  The body is
+	read in chunks and never held as a single string: each chunk has the
+	schema.org http → https rewrite applied, is fed to a running SHA-256, and is
+	written UTF-8 encoded to a spooled temporary file, which stays in memory up to
+	SPOOL_MEMORY_LIMIT and spills to disk beyond that.  body is that file, rewound
+	to the start; the caller is responsible for closing it.  payload_hash is
+	"sha256:" + the hex digest of the rewritten body followed by the content type,
+	the same value as hashing (content + content_type) in full.  validators holds
+	the ETag / Last-Modified values of this response for use on the next fetch.
+	"""
+	conditional_headers = {}
+	if validators:
+		if validators.get("etag"):
+			conditional_headers["If-None-Match"] = validators["etag"]
+		if validators.get("last_modified"):
+			conditional_headers["If-Modified-Since"] = validators["last_modified"]
+
+	resp = _get(system, url, conditional_headers, stream=True)
+	try:
+		if resp.status_code == 304:
+			print(f"Not modified since last fetch: <{url}>")
+			return None
+
+		resp.raise_for_status()
+		content_type = _rdf_content_type(resp, url)
+
+		response_validators = {}
+		if resp.headers.get("ETag"):
+			response_validators["etag"] = resp.headers["ETag"]
+		if resp.headers.get("Last-Modified"):
+			response_validators["last_modified"] = resp.headers["Last-Modified"]
+
+		decoder = codecs.getincrementaldecoder(_charset(resp))(errors="replace")
+		digest = hashlib.sha256()
+		body = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_LIMIT)
+		try:
+			def _write(text):
+				encoded = _rewrite_schema_org(text).encode("utf-8")
+				digest.update(encoded)
+				body.write(encoded)
+
+			# Hold back any trailing characters that could be the start of a
+			# schema.org URI split across two chunks.
+			pending = ""
+			for chunk in resp.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+				text = pending + decoder.decode(chunk)
+				held = _partial_match_length(text, SCHEMA_ORG_HTTP)
+				_write(text[:len(text) - held])
+				pending = text[len(text) - held:]
+			_write(pending + decoder.decode(b"", final=True))
+		except BaseException:
+			body.close()
+			raise
+	finally:
+		resp.close()
+
+	digest.update(content_type.encode("utf-8"))
+	body.seek(0)
+	return (body, content_type, response_validators, "sha256:" + digest.hexdigest())
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+Synthetic-scale benchmarks for the ingestor hot paths.
+
+Generates deterministic RDF shaped like the real exports — an eolas taxonomy with
+rdfs:subClassOf chains and blank-node periods, contacts linked by owl:sameAs,
+and media tracks with albums and makers — at a chosen number of triples, then
+times skolemise_graph, diff_graph_in_triplestore, compute_inferences (and,
+on its own, the transitive closure of the eolas:containedIn place hierarchy),
+graph_to_typesense_docs, graph_to_track_docs, graph_to_docs (both from one
+pass, as update_searchindex builds them) and compute_person_closures.
+Triplestore calls are answered by the in-memory TriplestoreStandin, so the
+figures include its query cost but need no running services.  With --http the
+stand-in is served on a local port and reached through the ingestor's requests
+session, adding real HTTP round trips; --latency adds a delay to each of them.
+
+Each benchmark is run twice: once for wall-clock time, and once under
+tracemalloc for peak Python memory (skip with --no-memory).
+
+	python benchmark.py --scale 10k --scale 100k
+	python benchmark.py --scale 1m --only skolemise_graph --json results.json
+	python benchmark.py --scale 10k --http --latency 0.02
+"""
+import argparse, gc, json, os, random, sys, time, tracemalloc
+from contextlib import contextmanager
+import requests
+
+# Nothing here talks to the real triplestore or search index, but both modules
+# refuse to import without a key.
+os.environ.setdefault("KEY_LUCOS_ARACHNE", "benchmark")
+
+from rdflib import BNode, Graph, Literal, URIRef
+from rdflib.namespace import DCTERMS, FOAF, OWL, RDF, RDFS, SKOS, XSD
+import triplestore
+from triplestore import live_systems, diff_graph_in_triplestore, compute_inferences
+from searchindex import (
+	MO, EOLAS_NS, MMM,
+	graph_to_typesense_docs, graph_to_track_docs, graph_to_docs, compute_person_closures,
+)
+from skolemise import skolemise_graph
+from closure import transitive_closure
+from triplestore_standin import TriplestoreStandin, StandinServer
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+EOLAS_GRAPH = live_systems["lucos_eolas"]
+CONTACTS_GRAPH = live_systems["lucos_contacts"]
+MEDIA_GRAPH = live_systems["lucos_media_metadata_api"]
+ONTOLOGY_GRAPH = "urn:lucos:benchmark:ontology"
+
+EOLAS = "https://eolas.l42.eu/metadata/"
+CONTACTS = "https://contacts.l42.eu/people/"
+MEDIA = "https://media-api.l42.eu/v2/"
+MEDIA_SEARCH = "https://media-metadata.l42.eu/search"
+
+# Share of the requested triple count given to each source
+SOURCE_SHARES = {EOLAS_GRAPH: 0.3, CONTACTS_GRAPH: 0.1, MEDIA_GRAPH: 0.6}
+
+
+# ---------------------------------------------------------------------------
+# Synthetic data
+# ---------------------------------------------------------------------------
+
+def _search_url(field, value):
+	return URIRef(f"{MEDIA_SEARCH}?p.{field}={value.replace(' ', '%20')}")
+
+
+def _add_type_metadata(g, type_uri, label, category_uri):
+	g.add((type_uri, RDF.type, OWL.Class))
+	g.add((type_uri, SKOS.prefLabel, Literal(label)))
+	g.add((type_uri, EOLAS_NS.hasCategory, category_uri))
+
+
+def _add_categories(g, count):
+	categories = []
+	for i in range(count):
+		category = URIRef(f"{EOLAS}category/{i}/")
+		g.add((category, RDF.type, EOLAS_NS.Category))
+		g.add((category, SKOS.prefLabel, Literal(f"Category {i}")))
+		categories.append(category)
+	return categories
+
+
+def _eolas_graph(target, rng, person_uris):
+	g = Graph()
+	categories = _add_categories(g, 8)
+
+	# Type taxonomy: each new class is a subclass of an earlier one, giving
+	# subClassOf chains of varying depth under a handful of roots.
+	types = []
+	for i in range(max(20, target // 500)):
+		type_uri = URIRef(f"{EOLAS}type/{i}/")
+		_add_type_metadata(g, type_uri, f"Type {i}", categories[i % len(categories)])
+		if i >= 5:
+			g.add((type_uri, RDFS.subClassOf, types[rng.randrange(max(0, i - 10), i)]))
+		types.append(type_uri)
+
+	places = []
+	i = 0
+	while len(g) < target:
+		subj = URIRef(f"{EOLAS}thing/{i}/")
+		kind = i % 10
+		if kind < 2:
+			# People, linked to from contacts via owl:sameAs
+			g.add((subj, RDF.type, FOAF.Person))
+			g.add((subj, SKOS.prefLabel, Literal(f"Person {i}")))
+			person_uris.append(subj)
+		else:
+			g.add((subj, RDF.type, rng.choice(types)))
+			g.add((subj, SKOS.prefLabel, Literal(f"Thing {i}")))
+			g.add((subj, RDFS.label, Literal(f"Thing {i}", lang="en")))
+			if kind < 5:
+				# Places form containedIn trees, which the transitive closure expands
+				if places:
+					g.add((subj, EOLAS_NS.containedIn, rng.choice(places[-50:])))
+				places.append(subj)
+			elif kind < 7:
+				period = BNode()
+				g.add((subj, EOLAS_NS.hasPeriod, period))
+				g.add((period, EOLAS_NS.startDate, Literal(f"{1900 + i % 120}-01-01", datatype=XSD.date)))
+				g.add((period, EOLAS_NS.endDate, Literal(f"{1901 + i % 120}-12-31", datatype=XSD.date)))
+				if kind == 6:
+					# Nested blank node
+					source = BNode()
+					g.add((period, DCTERMS.source, source))
+					g.add((source, RDFS.label, Literal(f"Source {i % 37}")))
+			else:
+				g.add((subj, DCTERMS.description, Literal(f"Description of thing {i}. " * 3)))
+		i += 1
+	return g
+
+
+def _contacts_graph(target, rng, person_uris):
+	g = Graph()
+	i = 0
+	while len(g) < target:
+		subj = URIRef(f"{CONTACTS}{i}")
+		g.add((subj, RDF.type, FOAF.Person))
+		g.add((subj, FOAF.name, Literal(f"Contact {i}")))
+		g.add((subj, SKOS.prefLabel, Literal(f"Contact {i}")))
+		if person_uris and i % 3 == 0:
+			other = rng.choice(person_uris)
+			g.add((subj, OWL.sameAs, other))
+			if i % 6 == 0:
+				g.add((other, EOLAS_NS.preferredIdentifier, subj))
+		i += 1
+	return g
+
+
+def _media_graph(target, rng, person_uris):
+	g = Graph()
+	categories = _add_categories(g, 2)
+	_add_type_metadata(g, MO.Track, "Track", categories[0])
+	_add_type_metadata(g, MO.Record, "Album", categories[0])
+	_add_type_metadata(g, MO.MusicArtist, "Artist", categories[1])
+
+	albums = []
+	artists = []
+	i = 0
+	while len(g) < target:
+		if i % 12 == 0:
+			album = URIRef(f"{MEDIA}albums/{i}")
+			g.add((album, RDF.type, MO.Record))
+			g.add((album, SKOS.prefLabel, Literal(f"Album {i}")))
+			albums.append(album)
+		if i % 40 == 0:
+			artist = URIRef(f"{MEDIA}artists/{i}")
+			g.add((artist, RDF.type, MO.MusicArtist))
+			g.add((artist, SKOS.prefLabel, Literal(f"Artist {i}")))
+			if person_uris and i % 400 == 0:
+				g.add((artist, OWL.sameAs, rng.choice(person_uris)))
+			artists.append(f"Artist {i}")
+		track = URIRef(f"{MEDIA}tracks/{i}")
+		g.add((track, RDF.type, MO.Track))
+		g.add((track, SKOS.prefLabel, Literal(f"Track {i}")))
+		g.add((track, FOAF.maker, _search_url("artist", rng.choice(artists))))
+		g.add((track, MMM.onAlbum, rng.choice(albums[-20:])))
+		g.add((track, MO.genre, _search_url("genre", f"Genre {i % 30}")))
+		g.add((track, DCTERMS.date, Literal(str(1950 + i % 70))))
+		g.add((track, MO.duration, Literal(f"PT{120 + i % 240}S")))
+		g.add((track, MMM.trackLanguage, URIRef(f"{EOLAS}language/{['en', 'fr', 'ga', 'de'][i % 4]}/")))
+		i += 1
+	return g
+
+
+def _ontology_graph():
+	g = Graph()
+	g.add((EOLAS_NS.containedIn, RDF.type, OWL.TransitiveProperty))
+	g.add((MMM.onAlbum, OWL.inverseOf, MMM.hasTrack))
+	g.add((SKOS.related, RDF.type, OWL.SymmetricProperty))
+	return g
+
+
+def generate_sources(n_triples, seed=0):
+	"""
+	Return {graph_uri: Graph} for the eolas, contacts and media sources plus a
+	small ontology graph, totalling roughly *n_triples*.  The same arguments
+	always produce the same triples (blank node identities aside).
+	"""
+	rng = random.Random(seed)
+	person_uris = []
+	sources = {}
+	sources[EOLAS_GRAPH] = _eolas_graph(int(n_triples * SOURCE_SHARES[EOLAS_GRAPH]), rng, person_uris)
+	sources[CONTACTS_GRAPH] = _contacts_graph(int(n_triples * SOURCE_SHARES[CONTACTS_GRAPH]), rng, person_uris)
+	sources[MEDIA_GRAPH] = _media_graph(int(n_triples * SOURCE_SHARES[MEDIA_GRAPH]), rng, person_uris)
+	sources[ONTOLOGY_GRAPH] = _ontology_graph()
+	return sources
+
+
+def _previous_version(graph, seed=0):
+	"""A copy of *graph* as it might have looked one run earlier: ~1% of triples differ."""
+	rng = random.Random(seed)
+	old = Graph()
+	for s, p, o in graph:
+		roll = rng.random()
+		if roll < 0.005:
+			continue  # added since
+		if roll < 0.01 and isinstance(o, Literal):
+			o = Literal(f"{o} (old)")  # changed since
+		old.add((s, p, o))
+	return old
+
+
+def _standin_with(sources):
+	"""A TriplestoreStandin holding the Skolemised sources, as Phase 1 would leave them."""
+	standin = TriplestoreStandin(fast_updates=True)
+	for graph_uri, graph in sources.items():
+		standin.load(graph_uri, skolemise_graph(graph))
+	return standin
+
+
+class Transport:
+	"""
+	How benchmarks reach their TriplestoreStandin: in-process by default, or
+	over HTTP via a StandinServer (*http*), waiting *latency* seconds before
+	each response.
+	"""
+
+	def __init__(self, http=False, latency=0.0):
+		self.http = http
+		self.latency = latency
+
+	@contextmanager
+	def session(self, standin):
+		"""Point triplestore.py's HTTP session at *standin* for the duration, and yield it."""
+		standin.latency = self.latency
+		original = triplestore.session
+		try:
+			if not self.http:
+				triplestore.session = standin
+				yield standin
+				return
+			with StandinServer(standin) as server:
+				triplestore.session = server.mount(requests.Session())
+				yield triplestore.session
+		finally:
+			triplestore.session = original
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks: each setup takes the sources and a Transport, and returns
+# (triples processed, zero-argument callable)
+# ---------------------------------------------------------------------------
+
+def _bench_skolemise(sources, transport):
+	graph = sources[EOLAS_GRAPH]
+	return (len(graph), lambda: skolemise_graph(graph))
+
+
+def _bench_diff(sources, transport):
+	graph = sources[MEDIA_GRAPH] + sources[EOLAS_GRAPH]
+	standin = TriplestoreStandin(fast_updates=True)
+	standin.load(MEDIA_GRAPH, skolemise_graph(_previous_version(graph)))
+
+	def run():
+		with transport.session(standin):
+			diff_graph_in_triplestore(MEDIA_GRAPH, graph, "text/turtle")
+	return (len(graph), run)
+
+
+def _bench_inferences(sources, transport):
+	standin = _standin_with(sources)
+
+	def run():
+		with transport.session(standin):
+			compute_inferences()
+	return (len(standin), run)
+
+
+def _bench_transitive_closure(sources, transport):
+	successors = {}
+	for s, o in sources[EOLAS_GRAPH].subject_objects(EOLAS_NS.containedIn):
+		successors.setdefault(str(s), set()).add(str(o))
+	return (sum(len(o) for o in successors.values()), lambda: transitive_closure(successors))
+
+
+def _bench_typesense_docs(sources, transport):
+	graph = sources[EOLAS_GRAPH] + sources[MEDIA_GRAPH]
+	return (len(graph), lambda: graph_to_typesense_docs(graph))
+
+
+def _bench_track_docs(sources, transport):
+	graph = sources[MEDIA_GRAPH]
+	return (len(graph), lambda: graph_to_track_docs(graph))
+
+
+def _bench_docs(sources, transport):
+	graph = sources[MEDIA_GRAPH]
+	return (len(graph), lambda: graph_to_docs(graph))
+
+
+def _bench_person_closures(sources, transport):
+	standin = _standin_with(sources)
+
+	def run():
+		with transport.session(standin) as session:
+			compute_person_closures(session, CONTACTS_GRAPH)
+	return (len(standin), run)
+
+
+BENCHMARKS = {
+	"skolemise_graph": _bench_skolemise,
+	"diff_graph_in_triplestore": _bench_diff,
+	"compute_inferences": _bench_inferences,
+	"transitive_closure": _bench_transitive_closure,
+	"graph_to_typesense_docs": _bench_typesense_docs,
+	"graph_to_track_docs": _bench_track_docs,
+	"graph_to_docs": _bench_docs,
+	"compute_person_closures": _bench_person_closures,
+}
+
+
+def _quietly(fn):
+	"""Run fn with stdout discarded — the hot paths log progress lines."""
+	stdout = sys.stdout
+	with open(os.devnull, "w") as devnull:
+		sys.stdout = devnull
+		try:
+			return fn()
+		finally:
+			sys.stdout = stdout
+
+
+def run_benchmark(name, sources, measure_memory=True, transport=None):
+	"""
+	Run one benchmark against *sources* and return a result dict with the
+	triples processed, elapsed seconds, throughput in triples per second and
+	(unless *measure_memory* is False) peak traced memory in bytes.
+	*transport* defaults to calling the stand-in in-process.
+	"""
+	setup = BENCHMARKS[name]
+	transport = transport or Transport()
+	(triples, fn) = setup(sources, transport)
+	gc.collect()
+	start = time.perf_counter()
+	_quietly(fn)
+	seconds = time.perf_counter() - start
+	result = {
+		"benchmark": name,
+		"triples": triples,
+		"seconds": round(seconds, 4),
+		"triples_per_second": round(triples / seconds) if seconds > 0 else None,
+		"peak_memory_bytes": None,
+	}
+	if measure_memory:
+		# Fresh state: benchmarks like compute_inferences write to their stand-in
+		(_, fn) = setup(sources, transport)
+		gc.collect()
+		tracemalloc.start()
+		try:
+			_quietly(fn)
+			(_, peak) = tracemalloc.get_traced_memory()
+		finally:
+			tracemalloc.stop()
+		result["peak_memory_bytes"] = peak
+	return result
+
+
+def _format_row(scale, result):
+	peak = result["peak_memory_bytes"]
+	peak_mb = f"{peak / 1024 / 1024:10.1f}" if peak is not None else f"{'-':>10}"
+	return (
+		f"{scale:>5}  {result['benchmark']:<27} {result['triples']:>9} "
+		f"{result['seconds']:>9.3f} {result['triples_per_second'] or 0:>12} {peak_mb}"
+	)
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--scale", action="append", choices=SCALES.keys(),
+		help="Triple count to generate (repeatable; default: all of 10k, 100k, 1m)")
+	parser.add_argument("--only", action="append", choices=BENCHMARKS.keys(),
+		help="Benchmark to run (repeatable; default: all)")
+	parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic data generator")
+	parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass")
+	parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON to PATH")
+	parser.add_argument("--http", action="store_true",
+		help="Reach the triplestore stand-in over HTTP rather than in-process")
+	parser.add_argument("--latency", type=float, default=0.0,
+		help="Seconds the triplestore stand-in waits before each response")
+	args = parser.parse_args(argv)
+	transport = Transport(http=args.http, latency=args.latency)
+
+	results = []
+	print(f"{'scale':>5}  {'benchmark':<27} {'triples':>9} {'seconds':>9} {'triples/s':>12} {'peak MiB':>10}", flush=True)
+	for scale in args.scale or list(SCALES):
+		sources = generate_sources(SCALES[scale], seed=args.seed)
+		for name in args.only or list(BENCHMARKS):
+			result = run_benchmark(name, sources, measure_memory=not args.no_memory, transport=transport)
+			result["scale"] = scale
+			results.append(result)
+			print(_format_row(scale, result), flush=True)
+
+	if args.json:
+		with open(args.json, "w", encoding="utf-8") as f:
+			json.dump(results, f, indent="\t")
+	return results
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,91 @@
+"""
+Transitive closure of a directed graph, for owl:TransitiveProperty inference.
+
+The graph is condensed into its strongly connected components (Tarjan's
+algorithm, run iteratively so deep hierarchies don't hit the recursion limit).
+Tarjan emits each component only after every component reachable from it, so
+reachability is then computed once per component, in that order, from the
+already-finished sets of its successors — rather than by a fresh traversal
+from every node.
+"""
+
+
+def strongly_connected_components(successors):
+	"""
+	Yield the strongly connected components of the graph given by *successors*
+	(a dict mapping each node to an iterable of its direct successors) as lists
+	of nodes.  Each component is yielded after all components reachable from it.
+	"""
+	index = {}
+	lowlink = {}
+	stack = []
+	on_stack = set()
+	for root in successors:
+		if root in index:
+			continue
+		index[root] = lowlink[root] = len(index)
+		stack.append(root)
+		on_stack.add(root)
+		work = [(root, iter(successors[root]))]
+		while work:
+			(node, children) = work[-1]
+			for child in children:
+				if child not in index:
+					index[child] = lowlink[child] = len(index)
+					stack.append(child)
+					on_stack.add(child)
+					work.append((child, iter(successors.get(child, ()))))
+					break
+				if child in on_stack:
+					lowlink[node] = min(lowlink[node], index[child])
+			else:
+				work.pop()
+				if work:
+					parent = work[-1][0]
+					lowlink[parent] = min(lowlink[parent], lowlink[node])
+				if lowlink[node] == index[node]:
+					component = []
+					while True:
+						member = stack.pop()
+						on_stack.discard(member)
+						component.append(member)
+						if member == node:
+							break
+					yield component
+
+
+def transitive_closure(successors) -> dict:
+	"""
+	Return {node: set of nodes reachable from it in one or more steps} for
+	every node in *successors* (see strongly_connected_components).  A node
+	reaches itself only if it is on a cycle.  Nodes in the same component share
+	one set, so callers mustn't modify them.
+	"""
+	component_of = {}
+	members = []
+	reach = []
+	closure = {}
+	for component in strongly_connected_components(successors):
+		c = len(members)
+		for node in component:
+			component_of[node] = c
+		reachable = set()
+		cyclic = len(component) > 1
+		done = {c}
+		for node in component:
+			for child in successors.get(node, ()):
+				d = component_of[child]
+				if d == c:
+					cyclic = True
+				elif d not in done:
+					done.add(d)
+					reachable |= members[d]
+					reachable |= reach[d]
+		if cyclic:
+			reachable.update(component)
+		members.append(frozenset(component))
+		reach.append(reachable)
+		for node in component:
+			if node in successors:
+				closure[node] = reachable
+	return closure
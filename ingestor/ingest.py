@@ -2,15 +2,19 @@
 """
 Bulk ingests RDF from other systems and adds data to the triplestore and searchindex
 """
-import sys, os, time, random, hashlib
-from authorised_fetch import fetch_url
+import sys, os, time, random, hashlib, json
+from concurrent.futures import ThreadPoolExecutor
+from authorised_fetch import fetch_source
 from triplestore import (
     live_systems, ontology_cache, ONTOLOGIES_DIR, INFERRED_GRAPH, METADATA_GRAPH,
     replace_graph_in_triplestore, cleanup_triplestore, compute_inferences,
-    get_source_hash, set_source_hash, diff_graph_in_triplestore, execute_sparql_update,
+    get_source_metadata, set_source_hash, source_hash_update, source_validators_update, clear_source_hash,
+    parse_graph, diff_graph_in_triplestore, stage_large_fragment, drop_staging_graphs, execute_sparql_update,
     session as triplestore_session,
 )
 from searchindex import update_searchindex, cleanup_searchindex, update_person_docs_in_searchindex
+from runreport import RunReport, span, count
+from snapshot import SourceSnapshot
 from loganne import updateLoganne
 from schedule_tracker import updateScheduleTracker
 
@@ -19,8 +23,85 @@ try:
 except KeyError:
 	sys.exit("\033[91mAPP_ORIGIN environment variable not set\033[0m")
 
+DEFAULT_INGEST_WORKERS = 4
+
+# Full JSON report of the most recent run: per-source stage durations and counts
+RUN_REPORT_PATH = os.path.expanduser("~/last_ingest_report.json")
+
+
+def _ingest_workers() -> int:
+	"""Number of live sources fetched and diffed concurrently in Phase 1.
+
+	Read from INGEST_WORKERS on every call so the value can be tuned without a
+	rebuild; falls back to DEFAULT_INGEST_WORKERS when unset or not a positive integer.
+	"""
+	try:
+		workers = int(os.environ.get("INGEST_WORKERS", DEFAULT_INGEST_WORKERS))
+	except ValueError:
+		return DEFAULT_INGEST_WORKERS
+	return workers if workers > 0 else DEFAULT_INGEST_WORKERS
+
+
+def _prepare_live_source(system, url, stored_hash, stored_validators, source_report):
+	"""
+	Fetch a live source and compute its Phase 1 diff.  Runs in a worker thread.
+
+	*stored_hash* and *stored_validators* are the metadata recorded for url, as
+	loaded up front by get_source_metadata.  Stage timings and counts are
+	recorded on *source_report*.
+
+	Returns (graph, content_type, new_hash, validators, skip_reason, fragment, snapshot).
+	graph is the payload parsed once with parse_graph; the same Graph is used for
+	the diff here and for the search-index update after Phase 1, and is None when
+	the source is skipped.  The spooled body is closed before returning.
+	skip_reason is a short explanation when the source needs no further work —
+	the server answered 304 Not Modified, or the payload hash matches the stored
+	one — and None otherwise.  fragment is None when the diff is empty; large
+	diffs are written to a staging graph here and fragment only publishes them
+	(see stage_large_fragment).  snapshot is the source's SourceSnapshot, with
+	the new payload recorded as pending; the caller commits it once Phase 1 has
+	succeeded, or discards it.  It is None when the source is skipped.
+	Exceptions propagate to the caller, which does all logging and
+	schedule-tracker reporting so that per-system accounting happens in one
+	thread, in live_systems order.
+	"""
+	with source_report.active():
+		with span("fetch"):
+			fetched = fetch_source(system, url, stored_validators)
+		if fetched is None:
+			return (None, None, None, stored_validators, "not modified since last fetch (HTTP 304)", None, None)
+		(body, content_type, validators, new_hash) = fetched
+		try:
+			count("bytes", body.seek(0, os.SEEK_END))
+			if stored_hash == new_hash:
+				return (None, content_type, new_hash, validators, f"content unchanged (hash {new_hash})", None, None)
+			with span("parse"):
+				graph = parse_graph(body, content_type)
+			count("triples", len(graph))
+		finally:
+			body.close()
+		snapshot = SourceSnapshot(url, stored_hash, new_hash)
+		try:
+			fragment = stage_large_fragment(diff_graph_in_triplestore(url, graph, content_type, snapshot=snapshot))
+		except Exception:
+			snapshot.discard()
+			raise
+		return (graph, content_type, new_hash, validators, None, fragment, snapshot)
+
+
+def _commit_snapshots(snapshots):
+	"""Commit the snapshots of sources written by Phase 1.  A snapshot that
+	can't be saved only costs the next run a CONSTRUCT, so errors are logged."""
+	for snapshot in snapshots:
+		try:
+			snapshot.commit()
+		except OSError as e:
+			print(f"Couldn't save snapshot of <{snapshot.graph_uri}>: {e}", flush=True)
+			snapshot.discard()
+
 
 def run_ingest():
+	report = RunReport()
 	all_item_ids = set()
 	all_track_ids = set()
 	has_failures = False
@@ -31,48 +112,97 @@ def run_ingest():
 	# We compute a SPARQL Update fragment for each live source whose content has
 	# changed, then execute all fragments in a single HTTP request.  Fuseki runs
 	# multi-statement SPARQL Updates in one TDB2 transaction, so readers never
-	# see a partially-updated raw graph.
+	# see a partially-updated raw graph.  The new payload hashes and validators
+	# are appended to the same request, so data and hash always commit together.
 	#
 	# Ontologies keep the old replace_graph approach: they almost never change
 	# (the hash check means they're almost always skipped), so the atomicity
 	# benefit is negligible.
 
-	phase1_fragments: list[str] = []
-	# (system, url, content, content_type, new_hash) for sources that need
+	# Stored hashes and validators for every source, loaded in one query rather
+	# than one round trip per source.  If this fails, carry on as though nothing
+	# were recorded: every source is then fetched and diffed in full, which is
+	# slower but always correct.
+	try:
+		with report.run.span("load_metadata"):
+			(stored_hashes, stored_validators) = get_source_metadata(
+				list(live_systems.values())
+				+ [graph_uri for graph_uri, _, _ in ontology_cache.values()]
+			)
+	except Exception as e:
+		print(f"Failed to load stored source hashes, ingesting all sources in full: {e}", flush=True)
+		(stored_hashes, stored_validators) = ({}, {})
+
+	# UpdateFragments from diff_graph_in_triplestore
+	phase1_fragments: list = []
+	# Hash and validator writes, appended after the data fragments
+	phase1_metadata: list[str] = []
+	# (system, url, graph, content_type, new_hash, validators) for sources that need
 	# search-index + hash updates after Phase 1 completes
 	changed_live: list[tuple] = []
+	# SourceSnapshots of the changed sources, committed only if Phase 1 succeeds
+	phase1_snapshots: list = []
 
-	for system, url in live_systems.items():
-		try:
-			(content, content_type) = fetch_url(system, url)
-			new_hash = "sha256:" + hashlib.sha256((content + content_type).encode("utf-8")).hexdigest()
-			if get_source_hash(url) == new_hash:
-				print(f"Skipping {system}: content unchanged (hash {new_hash})", flush=True)
-				updateScheduleTracker(success=True, system="lucos_arachne", job_name=system)
-				continue
-			fragment = diff_graph_in_triplestore(url, content, content_type)
-			if fragment:
-				phase1_fragments.append(fragment)
-			changed_live.append((system, url, content, content_type, new_hash))
-		except Exception as e:
-			has_failures = True
-			error_message = f"Ingest of {system} failed: {e}"
-			print(error_message, flush=True)
-			updateScheduleTracker(success=False, system="lucos_arachne", job_name=system, message=error_message)
+	# Sources are fetched, hashed and diffed concurrently: each is a network-bound
+	# fetch followed by a CONSTRUCT round trip, so running them one at a time makes
+	# the phase take the sum of all of them.  Results are consumed in live_systems
+	# order so logging, failure accounting and fragment order stay deterministic.
+	with ThreadPoolExecutor(max_workers=_ingest_workers()) as executor:
+		futures = {
+			system: executor.submit(
+				_prepare_live_source, system, url,
+				stored_hashes.get(url), stored_validators.get(url, {}),
+				report.source(system),
+			)
+			for system, url in live_systems.items()
+		}
+		for system, url in live_systems.items():
+			try:
+				(graph, content_type, new_hash, validators, skip_reason, fragment, snapshot) = futures[system].result()
+				if skip_reason:
+					report.source(system).status = "unchanged"
+					print(f"Skipping {system}: {skip_reason}", flush=True)
+					# Record fresh validators (e.g. the first run after they were introduced, or
+					# a server that rotated its ETag) so the next run can short-circuit on a 304.
+					if validators != stored_validators.get(url, {}):
+						phase1_metadata.append(source_validators_update(url, validators))
+					updateScheduleTracker(success=True, system="lucos_arachne", job_name=system)
+					continue
+				if fragment:
+					phase1_fragments.append(fragment)
+				phase1_metadata.append(source_hash_update(url, new_hash, validators))
+				changed_live.append((system, url, graph, content_type, new_hash, validators))
+				phase1_snapshots.append(snapshot)
+			except Exception as e:
+				report.source(system).status = "failed"
+				has_failures = True
+				error_message = f"Ingest of {system} failed: {e}"
+				print(error_message, flush=True)
+				updateScheduleTracker(success=False, system="lucos_arachne", job_name=system, message=error_message)
 
 	# ── Execute Phase 1 atomically ────────────────────────────────────────────
-	if phase1_fragments:
-		combined_update = " ;\n".join(phase1_fragments)
+	# The fragments are serialised as the request body is streamed, so the
+	# combined update is never built up as one string.
+	if phase1_fragments or phase1_metadata:
 		try:
-			execute_sparql_update(combined_update)
-			print(f"Phase 1 complete: {len(phase1_fragments)} graph(s) updated atomically", flush=True)
-			any_changed = True
+			with report.run.span("phase1_update"):
+				execute_sparql_update(phase1_fragments + phase1_metadata)
+			_commit_snapshots(phase1_snapshots)
+			if phase1_fragments:
+				print(f"Phase 1 complete: {len(phase1_fragments)} graph(s) updated atomically", flush=True)
+				any_changed = True
 		except Exception as e:
 			has_failures = True
 			error_message = f"Phase 1 (atomic SPARQL Update) failed: {e}"
 			print(error_message, flush=True)
+			for snapshot in phase1_snapshots:
+				snapshot.discard()
+			# Staged data was never published; its staging graphs would
+			# otherwise sit in the union default graph until the next cleanup.
+			drop_staging_graphs(phase1_fragments)
 			# Don't proceed with hash/searchindex updates if Phase 1 failed
-			for system, url, _, _, _ in changed_live:
+			for system, url, _, _, _, _ in changed_live:
+				report.source(system).status = "failed"
 				updateScheduleTracker(
 					success=False,
 					system="lucos_arachne",
@@ -81,36 +211,50 @@ def run_ingest():
 				)
 			changed_live = []
 
-	# ── Post-Phase-1: update search indices and hashes ────────────────────────
-	for system, url, content, content_type, new_hash in changed_live:
+	# ── Post-Phase-1: update search indices ───────────────────────────────────
+	for system, url, graph, content_type, new_hash, validators in changed_live:
 		try:
-			(item_ids, track_ids) = update_searchindex(system, content, content_type)
+			with report.source(system).active():
+				(item_ids, track_ids) = update_searchindex(system, graph)
+				count("docs", len(item_ids) + len(track_ids))
 			all_item_ids |= item_ids
 			all_track_ids |= track_ids
-			set_source_hash(url, new_hash)
+			report.source(system).status = "updated"
 			updateScheduleTracker(success=True, system="lucos_arachne", job_name=system)
 		except Exception as e:
+			report.source(system).status = "failed"
 			has_failures = True
 			error_message = f"Post-ingest update for {system} failed: {e}"
 			print(error_message, flush=True)
 			updateScheduleTracker(success=False, system="lucos_arachne", job_name=system, message=error_message)
+			# The hash was committed with Phase 1; forget it so the next run
+			# re-processes this source and retries the search-index update.
+			try:
+				clear_source_hash(url)
+			except Exception as e:
+				print(f"Failed to clear stored hash for {system}: {e}", flush=True)
 
 	# ── Ontologies: existing replace_graph approach ───────────────────────────
 	for system, (graph_uri, local_file, content_type) in ontology_cache.items():
+		source_report = report.source(system)
 		try:
 			file_path = os.path.join(ONTOLOGIES_DIR, local_file)
 			with open(file_path, "r", encoding="utf-8") as f:
 				content = f.read()
 			new_hash = "sha256:" + hashlib.sha256((content + content_type).encode("utf-8")).hexdigest()
-			if get_source_hash(graph_uri) == new_hash:
+			if stored_hashes.get(graph_uri) == new_hash:
+				source_report.status = "unchanged"
 				print(f"Skipping {system}: content unchanged (hash {new_hash})", flush=True)
 				updateScheduleTracker(success=True, system="lucos_arachne", job_name=system)
 				continue
-			replace_graph_in_triplestore(graph_uri, content, content_type)
-			set_source_hash(graph_uri, new_hash)
+			with source_report.span("replace"):
+				replace_graph_in_triplestore(graph_uri, content, content_type)
+				set_source_hash(graph_uri, new_hash)
+			source_report.status = "updated"
 			any_changed = True
 			updateScheduleTracker(success=True, system="lucos_arachne", job_name=system)
 		except Exception as e:
+			source_report.status = "failed"
 			has_failures = True
 			error_message = f"Ingest of {system} failed: {e}"
 			print(error_message, flush=True)
@@ -119,7 +263,8 @@ def run_ingest():
 	# ── Phase 2: rebuild inferred graph if any source changed ─────────────────
 	if any_changed:
 		try:
-			compute_inferences()
+			with report.run.span("inference"):
+				compute_inferences()
 			updateScheduleTracker(success=True, system="lucos_arachne", job_name="inference")
 		except Exception as e:
 			has_failures = True
@@ -135,7 +280,8 @@ def run_ingest():
 	# (including any newly-added owl:sameAs / preferredIdentifier triples).
 	try:
 		contacts_graph_uri = live_systems.get("lucos_contacts", "")
-		person_ids = update_person_docs_in_searchindex(triplestore_session, contacts_graph_uri)
+		with report.run.span("person_merge"):
+			person_ids = update_person_docs_in_searchindex(triplestore_session, contacts_graph_uri)
 		all_item_ids |= person_ids
 	except Exception as e:
 		has_failures = True
@@ -150,8 +296,9 @@ def run_ingest():
 	if has_failures:
 		print("Skipping cleanup: one or more sources failed to ingest. Stale items will be cleaned up on the next successful run.", flush=True)
 	else:
-		cleanup_triplestore(all_graph_uris)
-		cleanup_searchindex(all_item_ids, all_track_ids)
+		with report.run.span("cleanup"):
+			cleanup_triplestore(all_graph_uris)
+			cleanup_searchindex(all_item_ids, all_track_ids)
 		# Touch the reconcile marker so server.py's health check knows the graph is
 		# fully healed. Only written here — in the clean, full-reconcile branch —
 		# never at the unconditional updateScheduleTracker(job_name="ingestor") call
@@ -170,7 +317,15 @@ def run_ingest():
 	else:
 		human_readable = "Knowledge graph checked — no changes"
 	level = "notable" if has_failures else "routine"
-	updateLoganne(type="knowledgeIngest", humanReadable=human_readable, level=level, url=BASE_URL)
+
+	report.finish()
+	summary = report.summary()
+	print(f"Run report: {json.dumps(summary)}", flush=True)
+	try:
+		report.write(RUN_REPORT_PATH)
+	except OSError as e:
+		print(f"Failed to write run report to {RUN_REPORT_PATH}: {e}", flush=True)
+	updateLoganne(type="knowledgeIngest", humanReadable=human_readable, level=level, url=BASE_URL, runReport=summary)
 	updateScheduleTracker(success=True, system="lucos_arachne", job_name="ingestor")
 
 
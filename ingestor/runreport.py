@@ -0,0 +1,140 @@
+"""
+Per-run instrumentation for the ingestor.
+
+A RunReport collects, for each source, how long was spent in each stage of the
+pipeline (fetch, parse, skolemise, construct, diff, typesense import,
+…) together with counters such as bytes fetched, triples parsed and triples
+inserted / deleted.  Run-wide stages that aren't tied to one source (the Phase 1
+update, inference, person merge) are recorded against the run itself.
+
+Code deep in the pipeline doesn't need a report passed to it: it calls
+``span(stage)`` and ``count(key, n)``, which record against whichever source is
+active in the current thread (see ``SourceReport.active``) and do nothing when
+none is — e.g. on the webhook path.
+"""
+import contextvars, json, threading, time
+from contextlib import contextmanager
+
+_active_source = contextvars.ContextVar("active_source", default=None)
+
+
+class SourceReport:
+	"""Durations and counters for a single source within a run."""
+
+	def __init__(self, name):
+		self.name = name
+		self.status = None
+		self.durations = {}
+		self.counts = {}
+		self._lock = threading.Lock()
+
+	def add_duration(self, stage, seconds):
+		with self._lock:
+			self.durations[stage] = self.durations.get(stage, 0.0) + seconds
+
+	def add_count(self, key, n):
+		with self._lock:
+			self.counts[key] = self.counts.get(key, 0) + n
+
+	@contextmanager
+	def span(self, stage):
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.add_duration(stage, time.perf_counter() - start)
+
+	@contextmanager
+	def active(self):
+		"""Make this the source that module-level span() and count() record against."""
+		token = _active_source.set(self)
+		try:
+			yield self
+		finally:
+			_active_source.reset(token)
+
+	def to_dict(self):
+		with self._lock:
+			return {
+				"status": self.status,
+				"durations": {stage: round(seconds, 4) for stage, seconds in self.durations.items()},
+				**self.counts,
+			}
+
+
+class RunReport:
+	"""Everything measured during one run_ingest() call."""
+
+	def __init__(self):
+		self.started_at = time.time()
+		self._start = time.perf_counter()
+		self.duration = None
+		self.run = SourceReport("run")
+		self.sources = {}
+		self._lock = threading.Lock()
+
+	def source(self, name):
+		"""Return the SourceReport for name, creating it on first use."""
+		with self._lock:
+			if name not in self.sources:
+				self.sources[name] = SourceReport(name)
+			return self.sources[name]
+
+	def finish(self):
+		self.duration = time.perf_counter() - self._start
+
+	def to_dict(self):
+		"""The full report, suitable for json.dumps()."""
+		return {
+			"startedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.started_at)),
+			"duration": round(self.duration, 4) if self.duration is not None else None,
+			"stages": self.stage_totals(),
+			"run": self.run.to_dict(),
+			"sources": {name: source.to_dict() for name, source in self.sources.items()},
+		}
+
+	def stage_totals(self):
+		"""Total seconds per stage, summed over the run and every source."""
+		totals = {}
+		for source in [self.run, *self.sources.values()]:
+			for stage, seconds in source.to_dict()["durations"].items():
+				totals[stage] = round(totals.get(stage, 0.0) + seconds, 4)
+		return totals
+
+	def summary(self):
+		"""A compact form of the report for the loganne event."""
+		sources = {}
+		for name, source in self.sources.items():
+			data = source.to_dict()
+			sources[name] = {
+				"status": data["status"],
+				"duration": round(sum(data["durations"].values()), 2),
+				**{key: data[key] for key in ("inserts", "deletes", "docs") if key in data},
+			}
+		return {
+			"duration": round(self.duration, 2) if self.duration is not None else None,
+			"stages": {stage: round(seconds, 2) for stage, seconds in self.stage_totals().items()},
+			"sources": sources,
+		}
+
+	def write(self, path):
+		with open(path, "w", encoding="utf-8") as f:
+			json.dump(self.to_dict(), f, indent="\t")
+
+
+@contextmanager
+def span(stage):
+	"""Time the enclosed block as *stage* against the active source, if any."""
+	source = _active_source.get()
+	if source is None:
+		yield
+		return
+	with source.span(stage):
+		yield
+
+
+def count(key, n):
+	"""Add n to counter *key* on the active source, if any."""
+	source = _active_source.get()
+	if source is not None:
+		source.add_count(key, n)
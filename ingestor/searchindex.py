@@ -1,8 +1,11 @@
-import json, os, sys, re
+import json, os, sys, re, time
+from collections import deque
 from rdflib import Graph, Namespace, RDF, RDFS, FOAF, SKOS, DC, Literal, URIRef
 from rdflib.namespace import DCTERMS, OWL
+import requests
 import typesense
 import urllib.parse
+from runreport import span
 
 # Namespace not included in rdflib
 MO = Namespace("http://purl.org/ontology/mo/")
@@ -66,7 +69,7 @@ def get_label(graph, uri):
 		f"See lucas42/lucos_arachne#371."
 	)
 
-def get_category(graph, type):
+def get_category(graph, type, get_label=get_label):
 	# Check local graph first
 	for category in graph.objects(type, EOLAS_NS.hasCategory):
 		return get_label(graph, category)
@@ -79,7 +82,7 @@ def get_category(graph, type):
 		f"See lucas42/lucos_arachne#371."
 	)
 
-def _collect_subclass_labels(graph: Graph, start_uri) -> list:
+def _collect_subclass_labels(graph: Graph, start_uri, get_label=get_label) -> list:
 	"""
 	BFS-walk rdfs:subClassOf from start_uri in the local graph, collecting the
 	prefLabel of each ancestor class (excluding meta-types). Returns a
@@ -88,9 +91,9 @@ def _collect_subclass_labels(graph: Graph, start_uri) -> list:
 	"""
 	labels = []
 	seen = set()
-	queue = list(graph.objects(start_uri, RDFS.subClassOf))
+	queue = deque(graph.objects(start_uri, RDFS.subClassOf))
 	while queue:
-		ancestor = queue.pop(0)
+		ancestor = queue.popleft()
 		uri_str = str(ancestor)
 		if is_meta_type(uri_str) or uri_str in seen:
 			continue
@@ -102,18 +105,98 @@ def _collect_subclass_labels(graph: Graph, start_uri) -> list:
 	return labels
 
 
+class SubjectIndex:
+	"""
+	Every triple of a graph bucketed by subject and then predicate, built with
+	one rdflib probe per subject.  It answers the Graph lookups the doc builders
+	make — objects(), subjects() and ``(s, p, o) in`` — from plain dicts rather
+	than with an rdflib index probe per lookup; get_label() and friends accept
+	it in place of the Graph.
+
+	Each bucket is filled from graph.predicate_objects(s), so objects come back
+	in the order graph.objects(s, p) gives them.  (Iterating the whole graph
+	would not do: its order is unrelated, and the builders take the first
+	rdf:type and skos:prefLabel they see.)
+	"""
+
+	def __init__(self, graph: Graph):
+		self._index = {}
+		for s in graph.subjects(unique=True):
+			predicates = self._index[s] = {}
+			for p, o in graph.predicate_objects(s):
+				predicates.setdefault(p, []).append(o)
+
+	def subjects(self):
+		return self._index.keys()
+
+	def objects(self, subject, predicate):
+		return self._index.get(subject, {}).get(predicate, ())
+
+	def __contains__(self, triple):
+		(s, p, o) = triple
+		return o in self.objects(s, p)
+
+
+def subject_index(graph) -> SubjectIndex:
+	"""*graph* as a SubjectIndex, building one unless it already is."""
+	return graph if isinstance(graph, SubjectIndex) else SubjectIndex(graph)
+
+
+class TypeMetadata:
+	"""
+	Memoised type metadata for one graph.  Thousands of subjects share a handful
+	of types, so each type's label, category and ancestor labels — and the label
+	of each category or eolas:containedIn target — are looked up once per URI.
+	Lookups which raise ValueError raise it again each time they're asked for.
+	"""
+
+	def __init__(self, graph: Graph):
+		self.graph = graph
+		self._labels = {}
+		self._categories = {}
+		self._ancestor_labels = {}
+
+	def _memo(self, cache, uri, compute):
+		try:
+			result = cache[uri]
+		except KeyError:
+			try:
+				result = compute(uri)
+			except ValueError as error:
+				result = error
+			cache[uri] = result
+		if isinstance(result, ValueError):
+			raise result
+		return result
+
+	def get_label(self, graph, uri):
+		"""get_label(), for this resolver's graph."""
+		return self._memo(self._labels, uri, lambda uri: get_label(self.graph, uri))
+
+	def label(self, uri):
+		return self.get_label(self.graph, uri)
+
+	def category(self, type_uri):
+		return self._memo(self._categories, type_uri, lambda uri: get_category(self.graph, uri, self.get_label))
+
+	def ancestor_labels(self, type_uri) -> list:
+		return self._memo(self._ancestor_labels, type_uri, lambda uri: _collect_subclass_labels(self.graph, uri, self.get_label))
+
+
 def graph_to_typesense_docs(graph: Graph):
 	"""
-	Convert an RDFLib Graph into a list of documents
+	Convert an RDFLib Graph (or a SubjectIndex of one) into a list of documents
 	ready for indexing in Typesense.
 	"""
+	index = subject_index(graph)
 	docs = {}
+	types = TypeMetadata(index)
 
-	for subj in set(graph.subjects()):
+	for subj in set(index.subjects()):
 		# foaf:Person instances are handled by the Person-merge step, not here.
 		# Indexing them individually would produce one doc per URI, conflicting with
 		# the merged closure doc (one doc per connected component).
-		if (subj, RDF.type, FOAF.Person) in graph:
+		if (subj, RDF.type, FOAF.Person) in index:
 			continue
 
 		doc = {
@@ -139,35 +222,35 @@ def graph_to_typesense_docs(graph: Graph):
 		# "Language Family" entities without requiring the LanguageFamily metaclass
 		# label to be present in the graph (it's provided by eolas's ontology export,
 		# but we don't want to depend on that for correctness).
-		if (subj, RDF.type, EOLAS_NS.LanguageFamily) in graph:
+		if (subj, RDF.type, EOLAS_NS.LanguageFamily) in index:
 			doc["type"] = "Language Family"
 			doc["category"] = "Anthropological"
 			is_language_family = True
 		else:
-			for o in graph.objects(subj, RDF.type):
+			for o in index.objects(subj, RDF.type):
 				if is_meta_type(str(o)):
 					continue
 
 				# If the type itself has a type of LanguageFamily, then the subject is a Language.
 				# Use rstrip('/') before split to handle eolas URIs with trailing slashes
 				# (e.g. https://eolas.l42.eu/metadata/languagefamily/roa/ → "roa").
-				if (o, RDF.type, EOLAS_NS.LanguageFamily) in graph:
+				if (o, RDF.type, EOLAS_NS.LanguageFamily) in index:
 					doc["type"] = "Language"
 					doc["category"] = "Anthropological"
 					doc["lang_family"] = str(o).rstrip('/').split('/')[-1]
 					is_language_special_case = True
 				else:
-					doc["type"] = get_label(graph, o)
+					doc["type"] = types.label(o)
 					type_uri = o
 					# Prefer subject-level eolas:hasCategory (e.g. PlaceType instances like Country
 					# carry their own per-instance category directly on the subject URI).  Fall back
 					# to type-level (e.g. Vehicle subjects inherit category from their TransportMode
 					# type, which has eolas:hasCategory on the type URI).
-					subject_cats = list(graph.objects(subj, EOLAS_NS.hasCategory))
+					subject_cats = list(index.objects(subj, EOLAS_NS.hasCategory))
 					if subject_cats:
-						doc["category"] = get_label(graph, subject_cats[0])
+						doc["category"] = types.label(subject_cats[0])
 					else:
-						doc["category"] = get_category(graph, o)
+						doc["category"] = types.category(o)
 				break
 
 		# types: leaf label + deduplicated ancestor labels via rdfs:subClassOf walk.
@@ -177,44 +260,44 @@ def graph_to_typesense_docs(graph: Graph):
 			if is_language_family or is_language_special_case:
 				doc["types"] = [doc["type"]]
 			else:
-				ancestor_labels = _collect_subclass_labels(graph, type_uri) if type_uri is not None else []
+				ancestor_labels = types.ancestor_labels(type_uri) if type_uri is not None else []
 				doc["types"] = [doc["type"]] + [l for l in ancestor_labels if l != doc["type"]]
 
 		# pref_label
-		for o in graph.objects(subj, SKOS.prefLabel):
+		for o in index.objects(subj, SKOS.prefLabel):
 			if isinstance(o, Literal):
 				doc["pref_label"] = str(o)
 				break
 
 		# labels (can be multiple)
 		for pred in [RDFS.label, FOAF.name]:
-			for obj in graph.objects(subj, pred):
+			for obj in index.objects(subj, pred):
 				if isinstance(obj, Literal):
 					doc["labels"].append(str(obj))
 
 		# description
-		for o in graph.objects(subj, DC.description):
+		for o in index.objects(subj, DC.description):
 			if isinstance(o, Literal):
 				doc["description"] = str(o)
 				break
 
 		# lyrics
-		for o in graph.objects(subj, MO.lyrics):
+		for o in index.objects(subj, MO.lyrics):
 			if isinstance(o, Literal):
 				doc["lyrics"] = str(o)
 				break
 
 		# contained_in: label of the eolas:containedIn target (for places).
 		# Only set when a containedIn triple exists and its target has a label.
-		for contained_in_uri in graph.objects(subj, EOLAS_NS.containedIn):
+		for contained_in_uri in index.objects(subj, EOLAS_NS.containedIn):
 			try:
-				doc["contained_in"] = get_label(graph, contained_in_uri)
+				doc["contained_in"] = types.label(contained_in_uri)
 			except ValueError:
 				pass
 			break  # use the first containedIn value only
 
 		# artist: first artist name from foaf:maker search URLs (for tracks, albums, etc.).
-		for maker_uri in graph.objects(subj, FOAF.maker):
+		for maker_uri in index.objects(subj, FOAF.maker):
 			artist = _extract_search_url_value(str(maker_uri))
 			if artist:
 				doc["artist"] = artist
@@ -227,6 +310,15 @@ def graph_to_typesense_docs(graph: Graph):
 	return list(docs.values())
 
 
+def graph_to_docs(graph: Graph):
+	"""
+	Return (item docs, track docs) for *graph*, as graph_to_typesense_docs and
+	graph_to_track_docs would, from a single SubjectIndex of its triples.
+	"""
+	index = subject_index(graph)
+	return (graph_to_typesense_docs(index), graph_to_track_docs(index))
+
+
 def _extract_search_url_value(uri_str):
 	"""Extract the decoded query parameter value from a search URL like
 	https://media-metadata.l42.eu/search?p.artist=The%20Beatles -> 'The Beatles'
@@ -252,21 +344,23 @@ def _parse_iso8601_duration(value_str):
 
 def graph_to_track_docs(graph: Graph):
 	"""
-	Convert an RDFLib Graph into a list of track documents
-	ready for indexing in the Typesense 'tracks' collection.
+	Convert an RDFLib Graph (or a SubjectIndex of one) into a list of track
+	documents ready for indexing in the Typesense 'tracks' collection.
 	Only includes subjects with rdf:type mo:Track.
 	"""
+	index = subject_index(graph)
 	docs = {}
+	labels = TypeMetadata(index)
 
-	for subj in set(graph.subjects()):
+	for subj in set(index.subjects()):
 		# Only include mo:Track subjects
-		if (subj, RDF.type, MO.Track) not in graph:
+		if (subj, RDF.type, MO.Track) not in index:
 			continue
 
 		doc = {"id": str(subj)}
 
 		# title (skos:prefLabel)
-		for o in graph.objects(subj, SKOS.prefLabel):
+		for o in index.objects(subj, SKOS.prefLabel):
 			if isinstance(o, Literal):
 				doc["title"] = str(o)
 				break
@@ -276,7 +370,7 @@ def graph_to_track_docs(graph: Graph):
 
 		# artist (foaf:maker) — search URL values
 		artists = []
-		for o in graph.objects(subj, FOAF.maker):
+		for o in index.objects(subj, FOAF.maker):
 			val = _extract_search_url_value(str(o))
 			if val:
 				artists.append(val)
@@ -285,9 +379,9 @@ def graph_to_track_docs(graph: Graph):
 
 		# album (onAlbum) — look up album's skos:prefLabel
 		albums = []
-		for album_uri in graph.objects(subj, MMM.onAlbum):
+		for album_uri in index.objects(subj, MMM.onAlbum):
 			try:
-				album_label = get_label(graph, album_uri)
+				album_label = labels.label(album_uri)
 				albums.append(album_label)
 			except ValueError:
 				# Album URI not found in graph, skip it
@@ -297,7 +391,7 @@ def graph_to_track_docs(graph: Graph):
 
 		# genre (mo:genre) — search URL values
 		genres = []
-		for o in graph.objects(subj, MO.genre):
+		for o in index.objects(subj, MO.genre):
 			val = _extract_search_url_value(str(o))
 			if val:
 				genres.append(val)
@@ -306,7 +400,7 @@ def graph_to_track_docs(graph: Graph):
 
 		# composer (mo:composer) — search URL values
 		composers = []
-		for o in graph.objects(subj, MO.composer):
+		for o in index.objects(subj, MO.composer):
 			val = _extract_search_url_value(str(o))
 			if val:
 				composers.append(val)
@@ -315,7 +409,7 @@ def graph_to_track_docs(graph: Graph):
 
 		# producer (mo:producer) — search URL values
 		producers = []
-		for o in graph.objects(subj, MO.producer):
+		for o in index.objects(subj, MO.producer):
 			val = _extract_search_url_value(str(o))
 			if val:
 				producers.append(val)
@@ -324,7 +418,7 @@ def graph_to_track_docs(graph: Graph):
 
 		# language (mmm:trackLanguage) — extract code from URI path
 		languages = []
-		for o in graph.objects(subj, MMM.trackLanguage):
+		for o in index.objects(subj, MMM.trackLanguage):
 			code = _extract_language_code(str(o))
 			if code:
 				languages.append(code)
@@ -332,13 +426,13 @@ def graph_to_track_docs(graph: Graph):
 			doc["language"] = languages
 
 		# year (dc:date)
-		for o in graph.objects(subj, DCTERMS.date):
+		for o in index.objects(subj, DCTERMS.date):
 			if isinstance(o, Literal):
 				doc["year"] = str(o)
 				break
 
 		# rating (schema:ratingValue)
-		for o in graph.objects(subj, SDO.ratingValue):
+		for o in index.objects(subj, SDO.ratingValue):
 			if isinstance(o, Literal):
 				try:
 					doc["rating"] = int(str(o))
@@ -347,20 +441,20 @@ def graph_to_track_docs(graph: Graph):
 				break
 
 		# lyrics (mo:lyrics)
-		for o in graph.objects(subj, MO.lyrics):
+		for o in index.objects(subj, MO.lyrics):
 			if isinstance(o, Literal):
 				doc["lyrics"] = str(o)
 				break
 
 		# provenance (dc:source) — search URL value
-		for o in graph.objects(subj, DCTERMS.source):
+		for o in index.objects(subj, DCTERMS.source):
 			val = _extract_search_url_value(str(o))
 			if val:
 				doc["provenance"] = val
 				break
 
 		# duration (mo:duration) — parse PT{n}S to integer seconds
-		for o in graph.objects(subj, MO.duration):
+		for o in index.objects(subj, MO.duration):
 			seconds = _parse_iso8601_duration(str(o))
 			if seconds is not None:
 				doc["duration"] = seconds
@@ -368,27 +462,25 @@ def graph_to_track_docs(graph: Graph):
 
 		# offence (custom trigger predicate) — search URL values
 		offences = []
-		for p, o in graph.predicate_objects(subj):
-			if str(p) == "https://media-api.l42.eu/ontology#trigger":
-				val = _extract_search_url_value(str(o))
-				if val:
-					offences.append(val)
+		for o in index.objects(subj, MMM.trigger):
+			val = _extract_search_url_value(str(o))
+			if val:
+				offences.append(val)
 		if offences:
 			doc["offence"] = offences
 
 		# comment (schema:comment)
-		for o in graph.objects(subj, SDO.comment):
+		for o in index.objects(subj, SDO.comment):
 			if isinstance(o, Literal):
 				doc["comment"] = str(o)
 				break
 
 		# soundtrack (custom soundtrack predicate) — search URL values
 		soundtracks = []
-		for p, o in graph.predicate_objects(subj):
-			if str(p) == "https://media-api.l42.eu/ontology#soundtrack":
-				val = _extract_search_url_value(str(o))
-				if val:
-					soundtracks.append(val)
+		for o in index.objects(subj, MMM.soundtrack):
+			val = _extract_search_url_value(str(o))
+			if val:
+				soundtracks.append(val)
 		if soundtracks:
 			doc["soundtrack"] = soundtracks
 
@@ -794,22 +886,22 @@ typesense_client = typesense.Client({
 })
 
 
-def update_searchindex(system, content, content_type):
+def update_searchindex(system, g):
 	"""
-	Upserts documents into the search index from the given system's RDF content.
+	Upserts documents into the search index from the given system's parsed RDF graph.
 	Returns a tuple of (item_ids, track_ids) that were upserted.
 	"""
 	if not system.startswith("lucos_"):
 		return (set(), set())
-	g = Graph()
-	g.parse(data=content, format=content_type)
 
 	item_ids = set()
-	docs = graph_to_typesense_docs(g)
+	with span("build_docs"):
+		(docs, track_docs) = graph_to_docs(g)
 	if len(docs) == 0:
 		print(f"No docs updated in search index, from {system}", flush=True)
 	else:
-		results = typesense_client.collections["items"].documents.import_(docs, {"action": "upsert"})
+		with span("typesense_import"):
+			results = typesense_client.collections["items"].documents.import_(docs, {"action": "upsert"})
 		for result in results:
 			if not result["success"]:
 				raise ValueError(f"Error returned from search index upsert: {result['error']}")
@@ -818,9 +910,9 @@ def update_searchindex(system, content, content_type):
 
 	# Upsert into tracks collection for track-type subjects
 	track_ids = set()
-	track_docs = graph_to_track_docs(g)
 	if len(track_docs) > 0:
-		track_results = typesense_client.collections["tracks"].documents.import_(track_docs, {"action": "upsert"})
+		with span("typesense_import"):
+			track_results = typesense_client.collections["tracks"].documents.import_(track_docs, {"action": "upsert"})
 		for result in track_results:
 			if not result["success"]:
 				raise ValueError(f"Error returned from tracks search index upsert: {result['error']}")
@@ -830,13 +922,46 @@ def update_searchindex(system, content, content_type):
 	return (item_ids, track_ids)
 
 def _get_all_doc_ids(collection_name):
-	"""Export all document IDs from a Typesense collection."""
-	ids = set()
-	jsonl = typesense_client.collections[collection_name].documents.export({"include_fields": "id"})
-	for line in jsonl.strip().split("\n"):
-		if line:
-			ids.add(json.loads(line)["id"])
-	return ids
+	"""
+	Export all document IDs from a Typesense collection.
+
+	The Typesense client returns an export as one string, so the JSONL is
+	streamed with requests instead and read line by line as it arrives.  Nodes
+	come from the client's own node manager, with its key, timeout and retry
+	settings: a connection error or a 5xx marks the node unhealthy and the
+	export starts again on the next one, up to num_retries times, as the
+	client's own requests would.
+	"""
+	api_call = typesense_client.api_call
+	config = api_call.config
+	headers = {**config.additional_headers, "X-TYPESENSE-API-KEY": config.api_key}
+	last_error = None
+	for attempt in range(config.num_retries + 1):
+		if attempt:
+			time.sleep(config.retry_interval_seconds)
+		node = api_call.node_manager.get_node()
+		try:
+			with requests.get(
+				f"{node.url()}/collections/{collection_name}/documents/export",
+				params={"include_fields": "id"},
+				headers=headers,
+				timeout=config.connection_timeout_seconds,
+				verify=config.verify,
+				stream=True,
+			) as resp:
+				if resp.status_code < 500:
+					resp.raise_for_status()
+					ids = set()
+					for line in resp.iter_lines():
+						if line:
+							ids.add(json.loads(line)["id"])
+					api_call.node_manager.set_node_health(node, is_healthy=True)
+					return ids
+				last_error = requests.HTTPError(f"{resp.status_code} exporting from {node.url()}", response=resp)
+		except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+			last_error = e
+		api_call.node_manager.set_node_health(node, is_healthy=False)
+	raise last_error
 
 
 def cleanup_searchindex(valid_item_ids, valid_track_ids):
@@ -3,7 +3,8 @@ import json, sys, os, time, traceback, threading
 from concurrent.futures import ThreadPoolExecutor
 from http.server import BaseHTTPRequestHandler, HTTPServer
 from authorised_fetch import fetch_url
-from triplestore import live_systems, replace_item_in_triplestore, delete_item_in_triplestore, merge_items_in_triplestore, session as triplestore_session
+from rdflib import URIRef
+from triplestore import live_systems, parse_graph, replace_item_in_triplestore, delete_item_in_triplestore, merge_items_in_triplestore, update_inferences_for_items, session as triplestore_session
 from searchindex import update_searchindex, delete_doc_in_searchindex, update_person_docs_in_searchindex
 
 if not os.environ.get("PORT"):
@@ -28,6 +29,11 @@ def _increment_failure():
 		_last_failure_at = time.time()
 
 
+def _changed_items(item_uri, graph):
+	"""The item, plus any other subjects its RDF wrote triples for."""
+	return {item_uri, *(str(s) for s in graph.subjects(unique=True) if isinstance(s, URIRef))}
+
+
 def _process_event(event):
 	"""Process a validated webhook event. Runs in a thread pool worker."""
 	try:
@@ -35,25 +41,34 @@ def _process_event(event):
 		if event_type.endswith("Created") or event_type.endswith("Added") or event_type.endswith("Updated") or event_type.endswith("Linked") or event_type.endswith("Unlinked"):
 			(content, content_type) = fetch_url(event["source"], event["url"])
 			replace_item_in_triplestore(event["url"], live_systems[event["source"]], content, content_type)
-			update_searchindex(event["source"], content, content_type)
+			graph = parse_graph(content, content_type)
+			update_searchindex(event["source"], graph)
 			# Re-compute foaf:Person closures so that e.g. a contactLinked event whose
 			# new RDF includes owl:sameAs produces a merged doc and removes any
 			# previously-standalone eolas Person doc.
 			contacts_graph_uri = live_systems.get("lucos_contacts", "")
 			update_person_docs_in_searchindex(triplestore_session, contacts_graph_uri)
+			# Inferences come last, so a failure there (or a fall back to a full
+			# recompute) can't hold up or skip the search-index work.
+			update_inferences_for_items(_changed_items(event["url"], graph))
 		elif event_type.endswith("Deleted"):
 			delete_item_in_triplestore(event["url"], live_systems[event["source"]])
 			delete_doc_in_searchindex(event["source"], event["url"])
+			update_inferences_for_items([event["url"]])
 		elif event_type.endswith("Merged"):
 			merge_items_in_triplestore(event["sourceUri"], event["targetUri"], live_systems[event["source"]])
 			delete_doc_in_searchindex(event["source"], event["sourceUri"])
 			(content, content_type) = fetch_url(event["source"], event["targetUri"])
 			replace_item_in_triplestore(event["targetUri"], live_systems[event["source"]], content, content_type)
-			update_searchindex(event["source"], content, content_type)
+			graph = parse_graph(content, content_type)
+			update_searchindex(event["source"], graph)
 			# Re-compute Person closures — merging two contacts changes the sameAs
 			# topology and can leave stale sourceUri entries in secondary_uris.
 			contacts_graph_uri = live_systems.get("lucos_contacts", "")
 			update_person_docs_in_searchindex(triplestore_session, contacts_graph_uri)
+			# Last, as above.  References to sourceUri were repointed to targetUri
+			# in every graph.
+			update_inferences_for_items(_changed_items(event["targetUri"], graph) | {event["sourceUri"]})
 	except Exception:
 		traceback.print_exc()
 		_increment_failure()
@@ -6,14 +6,18 @@ tree-shaped approximation:
 
   - Each blank node's canonical hash is computed as
     ``sha256(sorted([(predicate_uri, n3_string_of_object) for outgoing triples]))``
-    where child blank nodes are resolved recursively before hashing.
+    where child blank nodes are replaced by their own hashes.  Hashes are computed
+    bottom-up and memoised, so each blank node is hashed exactly once.
 
-  - Cycle detection: if the recursion visits the same blank node twice (indicating
-    a cycle), a ValueError is raised for that node.  Any blank node whose hash
-    computation raises ValueError is assigned a non-deterministic UUID-based Skolem
-    URI, and a warning is logged.  This keeps the store consistent but means all
-    triples involving cyclic blank nodes will be fully rewritten on every ingestion
-    cycle.
+  - Cycles: a blank node which is on a cycle, or whose outgoing edges lead to one,
+    has no well-defined tree hash.  These blank nodes are labelled together by
+    colour refinement instead: each starts from a hash of its edges to everything
+    outside the cyclic set, and is repeatedly re-hashed with the labels of its
+    cyclic neighbours (in both directions) until the partition stops splitting.
+    Blank nodes left sharing a label are told apart by individualising each of
+    them in turn, refining again, and keeping the lexicographically smallest
+    result, so labels are deterministic for unchanged input whatever blank node
+    IDs the parser assigned.
 
 Properties of deterministic Skolem URIs (per ADR-0002):
   - Stable across runs for unchanged data: same structural input → same URI.
@@ -23,7 +27,7 @@ Properties of deterministic Skolem URIs (per ADR-0002):
 """
 import hashlib
 import logging
-import uuid
+from collections import Counter
 
 from rdflib import BNode, Graph, URIRef
 
@@ -32,28 +36,56 @@ SKOLEM_PREFIX = "urn:lucos:skolem:"
 logger = logging.getLogger(__name__)
 
 
-def _compute_bnode_hash(bnode: BNode, graph: Graph, visited: frozenset) -> str:
+def _bnode_hashes(outgoing: dict, incoming: dict) -> dict:
     """
-    Recursively compute a deterministic hash for *bnode* based on its outgoing
-    triples.
+    Compute a deterministic hash for every blank node in *outgoing*, based on
+    its outgoing triples, bottom-up: each blank node is hashed once, after the
+    blank nodes it points to, so shared and deeply nested subtrees aren't
+    re-hashed from every ancestor.
 
-    *visited* is the set of blank nodes on the current recursion path — used to
-    detect cycles.  Raises ``ValueError`` on a cycle so the caller can fall back
-    to a non-deterministic URI.
+    *outgoing* maps each blank node to its ``(predicate, object)`` pairs and
+    *incoming* maps it to the ``(predicate, subject)`` pairs of edges from
+    non-blank-node subjects.  Returns ``{bnode: hex digest}``, with ``None``
+    for any blank node that is on, or leads to, a cycle.
     """
-    if bnode in visited:
-        raise ValueError(f"Blank-node cycle detected at {bnode!r}")
+    hashes: dict[BNode, str | None] = {}
+    on_path: set[BNode] = set()
+    for root in outgoing:
+        if root in hashes:
+            continue
+        # Iterative post-order walk, so deep chains can't hit the recursion limit
+        stack = [(root, iter(outgoing[root]))]
+        on_path.add(root)
+        while stack:
+            (node, edges) = stack[-1]
+            for (_, o) in edges:
+                if isinstance(o, BNode) and o not in hashes:
+                    if o in on_path:
+                        # Cycle: o's hash would depend on itself
+                        hashes[o] = None
+                    else:
+                        stack.append((o, iter(outgoing.get(o, ()))))
+                        on_path.add(o)
+                        break
+            else:
+                stack.pop()
+                on_path.discard(node)
+                hashes[node] = _hash_parts(node, outgoing, incoming, hashes)
+    return hashes
 
-    new_visited = visited | {bnode}
+
+def _hash_parts(bnode: BNode, outgoing: dict, incoming: dict, hashes: dict) -> str | None:
+    """Hash *bnode* from its edges, given the hashes of its child blank nodes (None if any is cyclic)."""
     parts: list[tuple[str, str]] = []
 
     # Outgoing triples (bnode as subject).  Prefixed with ">" to distinguish
     # direction from incoming edges below.
-    for (_, p, o) in graph.triples((bnode, None, None)):
+    for (p, o) in outgoing.get(bnode, ()):
         pred_str = "> " + str(p)
         if isinstance(o, BNode):
-            # Recurse — propagates ValueError upward on cycle
-            child_hash = _compute_bnode_hash(o, graph, new_visited)
+            child_hash = hashes.get(o)
+            if child_hash is None:
+                return None
             parts.append((pred_str, child_hash))
         else:
             # n3() gives a canonical string for URIRef and Literal
@@ -72,59 +104,301 @@ def _compute_bnode_hash(bnode: BNode, graph: Graph, visited: frozenset) -> str:
     # create a recursive dependency on the parent's not-yet-computed hash,
     # causing the cycle-detection path to fire incorrectly.  The distinctness
     # of deeper nesting is captured transitively through the outgoing-edge
-    # recursion at each level.
-    for (s, p, _) in graph.triples((None, None, bnode)):
-        if not isinstance(s, BNode):
-            parts.append(("< " + str(p), str(s)))
+    # hashes at each level.
+    for (p, s) in incoming.get(bnode, ()):
+        parts.append(("< " + str(p), str(s)))
 
     parts.sort()
     canonical = repr(parts)
     return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
 
 
-def skolemise_graph(graph: Graph) -> Graph:
+def _digest(value) -> str:
+    return hashlib.sha256(repr(value).encode("utf-8")).hexdigest()
+
+
+def _cyclic_bnode_hashes(cyclic: set, outgoing: dict, incoming: dict, hashes: dict) -> dict:
     """
-    Return a copy of *graph* with all blank nodes replaced by Skolem URIs.
+    Compute deterministic hashes for the blank nodes in *cyclic* — those
+    _bnode_hashes gave None — by colour refinement over the edges between
+    them; *hashes* supplies the hashes of the other blank nodes they point to.
+    Returns ``{bnode: hex digest}``, a distinct digest for each blank node.
+    """
+    out_edges: dict[BNode, list] = {node: [] for node in cyclic}
+    in_edges: dict[BNode, list] = {node: [] for node in cyclic}
+    colour: dict[BNode, str] = {}
+    for node in cyclic:
+        parts: list[tuple[str, str]] = []
+        for (p, o) in outgoing.get(node, ()):
+            if o in cyclic:
+                out_edges[node].append(("> " + str(p), o))
+                in_edges[o].append(("< " + str(p), node))
+            elif isinstance(o, BNode):
+                parts.append(("> " + str(p), hashes[o]))
+            else:
+                parts.append(("> " + str(p), o.n3()))
+        for (p, s) in incoming.get(node, ()):
+            parts.append(("< " + str(p), str(s)))
+        parts.sort()
+        colour[node] = _digest(("cyclic", parts))
+
+    colour = _refine(colour, out_edges, in_edges)
+    sizes = Counter(colour.values())
+    if len(sizes) == len(cyclic):
+        return colour
+
+    # Blank nodes still tied are told apart one connected component at a time,
+    # as components share no edges: each component holding a tied blank node
+    # is labelled canonically (see _canonical_colours).  Components which come
+    # out identical are interchangeable, so they're told apart by their rank
+    # among equals, which needn't say which is which.
+    tied_components = []
+    for component in _components(cyclic, out_edges, in_edges):
+        if any(sizes[colour[node]] > 1 for node in component):
+            tied_components.append(_canonical_colours({node: colour[node] for node in component}, out_edges, in_edges))
+    tied_components.sort(key=lambda labelled: labelled[0])
+    ranks = Counter()
+    for (key, labelled) in tied_components:
+        for (node, label) in labelled.items():
+            colour[node] = _digest((label, key, ranks[key]))
+        ranks[key] += 1
+    return colour
+
+
+def _components(nodes, out_edges: dict, in_edges: dict) -> list:
+    """The connected components of *nodes* over *out_edges* and *in_edges*, as lists."""
+    components = []
+    seen = set()
+    for root in nodes:
+        if root in seen:
+            continue
+        seen.add(root)
+        component = [root]
+        for node in component:
+            for (_, neighbour) in out_edges[node] + in_edges[node]:
+                if neighbour not in seen:
+                    seen.add(neighbour)
+                    component.append(neighbour)
+        components.append(component)
+    return components
+
+
+def _canonical_colours(colour: dict, out_edges: dict, in_edges: dict) -> tuple:
+    """
+    Break the ties left in *colour*, a refined colouring of one connected
+    component, canonically.  Returns ``(key, colour)``: a distinct colour for
+    each blank node, and a digest of the labelled component which is the same
+    for any two components that are isomorphic.
+
+    Each member of the smallest tied class is individualised in turn and
+    refined, and the labelling kept is the smallest by the sequence of colour
+    multisets along the way, then by its labelled edges.  Both are invariant
+    under renaming blank nodes, so the result doesn't depend on which blank
+    node IDs a parse handed out.  Two labellings with equal keys give an
+    automorphism: the rest of the subtree that found it maps onto one already
+    searched, so the search goes back to where the two diverged.  Members of a
+    tied class in the same orbit as one already tried are skipped, as are
+    branches whose colour multisets are already worse than the best found; so
+    interchangeable blank nodes don't multiply the search.
+    """
+    nodes = list(colour)
+    best = None
+    automorphisms: list[dict] = []
+    frames = []
+    pending = [(colour, (), ())]
+    while pending or frames:
+        if pending:
+            (colour, path, fixed) = pending.pop()
+            colour = _refine(colour, out_edges, in_edges)
+            path = path + (tuple(sorted(colour.values())),)
+            if best is not None and path > best[0][:len(path)]:
+                continue
+            sizes = Counter(colour.values())
+            if len(sizes) == len(nodes):
+                key = (path, sorted((colour[s], p, colour[o]) for s in nodes for (p, o) in out_edges[s]))
+                if best is None or key < best[:2]:
+                    best = (*key, colour, fixed)
+                elif key == best[:2]:
+                    node_for = {c: node for (node, c) in best[2].items()}
+                    automorphisms.append({node: node_for[c] for (node, c) in colour.items()})
+                    shared = next((i for (i, (a, b)) in enumerate(zip(fixed, best[3])) if a != b), len(fixed))
+                    del frames[shared + 1:]
+                continue
+            # Branch on the smallest tied class, lowest colour first among equals
+            tied = min((n, c) for (c, n) in sizes.items() if n > 1)[1]
+            members = [node for node in nodes if colour[node] == tied]
+            frames.append((colour, path, fixed, tied, members, []))
+            continue
+        (colour, path, fixed, tied, members, tried) = frames[-1]
+        orbit = _orbits(nodes, [g for g in automorphisms if all(g[node] == node for node in fixed)])
+        tried_orbits = {orbit(node) for node in tried}
+        node = next((node for node in members if orbit(node) not in tried_orbits), None)
+        if node is None:
+            frames.pop()
+            continue
+        tried.append(node)
+        pending.append(({**colour, node: _digest((tied, "individualised"))}, path, fixed + (node,)))
+    return (_digest(best[:2]), best[2])
+
+
+def _orbits(nodes, generators):
+    """Return a function giving a representative of each node's orbit under *generators*."""
+    parent = {node: node for node in nodes}
+
+    def find(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for g in generators:
+        for (node, image) in g.items():
+            (a, b) = (find(node), find(image))
+            if a != b:
+                parent[a] = b
+    return find
+
+
+def _refine(colour: dict, out_edges: dict, in_edges: dict) -> dict:
+    """
+    Re-hash each node's colour with its neighbours' until no colour class splits
+    any further.  Each new colour includes the old one, so classes only ever split.
+    """
+    classes = len(set(colour.values()))
+    while True:
+        colour = {
+            node: _digest((
+                colour[node],
+                sorted((p, colour[o]) for (p, o) in out_edges[node]),
+                sorted((p, colour[s]) for (p, s) in in_edges[node]),
+            ))
+            for node in colour
+        }
+        refined = len(set(colour.values()))
+        if refined == classes:
+            return colour
+        classes = refined
+
 
-    Blank nodes forming tree-shaped subgraphs receive stable, deterministic
-    ``urn:lucos:skolem:<hash>`` URIs.  Blank nodes involved in cycles receive
-    non-deterministic (UUID-based) Skolem URIs, and a warning is logged.
+def _skolem_uris(bnode_triples) -> dict:
     """
-    # Collect all blank nodes present in the graph
-    bnodes: set[BNode] = set()
-    for s, _, o in graph:
+    Return ``{bnode: Skolem URIRef}`` for every blank node in *bnode_triples* —
+    which must include every triple of the graph that has a blank node as its
+    subject or object, and needn't include any other.
+    """
+    outgoing: dict[BNode, list] = {}
+    incoming: dict[BNode, list] = {}
+    for (s, p, o) in bnode_triples:
         if isinstance(s, BNode):
-            bnodes.add(s)
+            outgoing.setdefault(s, []).append((p, o))
         if isinstance(o, BNode):
-            bnodes.add(o)
+            outgoing.setdefault(o, [])
+            if not isinstance(s, BNode):
+                incoming.setdefault(o, []).append((p, s))
 
-    if not bnodes:
-        return graph
+    hashes = _bnode_hashes(outgoing, incoming)
+    cyclic = {bnode for (bnode, h) in hashes.items() if h is None}
+    if cyclic:
+        logger.info(
+            "Blank-node cycles detected in graph — labelling %d blank node(s) by colour refinement",
+            len(cyclic),
+        )
+        hashes.update(_cyclic_bnode_hashes(cyclic, outgoing, incoming, hashes))
+    return {bnode: URIRef(SKOLEM_PREFIX + h) for (bnode, h) in hashes.items()}
+
+
+def _has_bnode(triple) -> bool:
+    return isinstance(triple[0], BNode) or isinstance(triple[2], BNode)
+
+
+class SkolemisingGraph(Graph):
+    """
+    A Graph which Skolemises blank nodes as it is filled, e.g. by a parser.
+
+    Triples without blank nodes are stored as they are added.  Triples with a
+    blank node are held back — they are all that hashing needs — until
+    skolemise() is called, which stores them with their blank nodes replaced
+    by the same Skolem URIs skolemise_graph would give.  The held-back triples
+    are kept as an ordered set, as the graph would keep them, so a triple the
+    payload repeats is hashed once.  So a payload parsed
+    into a SkolemisingGraph is never held twice, as a parsed graph and a
+    Skolemised copy.  Until skolemise() is called the held-back triples are
+    not in the graph.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._held_back: dict = {}
+        self._added = 0
+
+    def add(self, triple):
+        self._added += 1
+        if _has_bnode(triple):
+            self._held_back[triple] = None
+            return self
+        return super().add(triple)
+
+    def addN(self, quads):
+        super().addN(self._hold_back_bnodes(quads))
+        return self
 
-    bnode_to_uri: dict[BNode, URIRef] = {}
-    has_cycles = False
-
-    for bnode in bnodes:
-        try:
-            h = _compute_bnode_hash(bnode, graph, frozenset())
-            bnode_to_uri[bnode] = URIRef(SKOLEM_PREFIX + h)
-        except ValueError:
-            # Cycle detected — use a non-deterministic URI for this bnode
-            has_cycles = True
-            bnode_to_uri[bnode] = URIRef(SKOLEM_PREFIX + str(uuid.uuid4()))
-
-    if has_cycles:
-        logger.warning(
-            "Blank-node cycles detected in graph — cyclic blank nodes have been "
-            "assigned non-deterministic Skolem URIs.  These triples will be fully "
-            "rewritten on every ingestion cycle."
+    def _hold_back_bnodes(self, quads):
+        for quad in quads:
+            self._added += 1
+            if _has_bnode(quad[:3]):
+                self._held_back[quad[:3]] = None
+            else:
+                yield quad
+
+    def parse(self, *args, **kwargs):
+        (length, added) = (len(self), self._added)
+        super().parse(*args, **kwargs)
+        if self._added == added and len(self) > length:
+            # Some parsers (n3, json-ld) write to the store directly rather
+            # than through add(); pick their blank-node triples out afterwards.
+            stray = [triple for triple in self if _has_bnode(triple)]
+            for triple in stray:
+                self.remove(triple)
+            self._held_back.update(dict.fromkeys(stray))
+        return self
+
+    def skolemise(self):
+        """Store the held-back triples, with Skolem URIs in place of blank nodes."""
+        if not self._held_back:
+            return self
+        bnode_to_uri = _skolem_uris(self._held_back)
+        super().addN(
+            (bnode_to_uri.get(s, s), p, bnode_to_uri.get(o, o), self)
+            for (s, p, o) in self._held_back
         )
+        self._held_back = {}
+        return self
+
+
+def skolemise_graph(graph: Graph) -> Graph:
+    """
+    Return a copy of *graph* with all blank nodes replaced by Skolem URIs.
+
+    Every blank node receives a deterministic ``urn:lucos:skolem:<hash>`` URI:
+    tree-shaped ones from their tree hash, and those involved in cycles from
+    colour refinement (see _cyclic_bnode_hashes).
+
+    The graph is read once, into per-blank-node edge lists, rather than looked
+    up with ``graph.triples(...)`` for each blank node.  A SkolemisingGraph is
+    Skolemised in place instead of copied, and a graph without blank nodes is
+    returned as-is.
+    """
+    if isinstance(graph, SkolemisingGraph):
+        return graph.skolemise()
+    bnode_triples = [triple for triple in graph if _has_bnode(triple)]
+    if not bnode_triples:
+        return graph
+    bnode_to_uri = _skolem_uris(bnode_triples)
 
     # Build a new graph with Skolem URIs substituted in place of blank nodes
     new_graph = Graph()
-    for s, p, o in graph:
-        new_s = bnode_to_uri.get(s, s)
-        new_o = bnode_to_uri.get(o, o)
-        new_graph.add((new_s, p, new_o))
-
+    new_graph.addN(
+        (bnode_to_uri.get(s, s), p, bnode_to_uri.get(o, o), new_graph)
+        for (s, p, o) in graph
+    )
     return new_graph
@@ -0,0 +1,172 @@
+"""
+On-disk snapshots of each live source's last committed triples.
+
+A snapshot is the Skolemised graph of a source as last written to the
+triplestore, stored as sorted, de-duplicated N-Triples lines under a one-line
+header:
+
+	# lucos_arachne snapshot <graph_uri> <payload_hash> sha256:<checksum> <line_count>
+
+payload_hash is the source hash committed alongside that data, so a snapshot is
+only trusted when it matches the hash currently stored in the triplestore;
+checksum covers the lines that follow, and is verified as they are read.  With
+a valid snapshot, the next diff of that source is a merge-join over two sorted
+line sequences rather than a CONSTRUCT of the whole graph from Fuseki.
+
+Next to each snapshot is a fingerprint index, under the same kind of header:
+one ``<subject> <fingerprint>`` line per subject, the fingerprint being a hash
+of the subject's N-Triples lines.  Comparing fingerprints finds the subjects
+that changed without looking at any triples (see triplestore.py).
+
+Snapshots are written in two steps: record() during the diff writes pending
+files, and commit() moves them into place once Phase 1 has committed.  Anything
+else which writes to a source graph (the webhook handlers, via triplestore.py)
+calls invalidate(), which deletes the snapshot and marks it so that a run
+already in progress doesn't commit a snapshot that predates the change.
+"""
+import hashlib, os, time
+
+SNAPSHOT_DIR = os.environ.get("INGEST_SNAPSHOT_DIR") or os.path.expanduser("~/snapshots")
+HEADER_PREFIX = "# lucos_arachne snapshot "
+# File extensions of a snapshot's N-Triples lines and its fingerprint index
+LINES_EXT = ".nt"
+FINGERPRINTS_EXT = ".fp"
+
+
+def _path(graph_uri) -> str:
+	"""Path of graph_uri's snapshot, less its extension."""
+	return os.path.join(SNAPSHOT_DIR, hashlib.sha256(graph_uri.encode("utf-8")).hexdigest()[:32])
+
+
+def _remove(path):
+	try:
+		os.remove(path)
+	except FileNotFoundError:
+		pass
+
+
+def _write(path, graph_uri, payload_hash, lines):
+	"""Write *lines* (a list of newline-terminated strings) to *path* under a snapshot header."""
+	digest = hashlib.sha256()
+	for line in lines:
+		digest.update(line.encode("utf-8"))
+	with open(path, "w", encoding="utf-8") as f:
+		f.write(f"{HEADER_PREFIX}{graph_uri} {payload_hash} sha256:{digest.hexdigest()} {len(lines)}\n")
+		f.writelines(lines)
+
+
+def invalidate(graph_uri):
+	"""Forget the snapshot for graph_uri, e.g. because the graph was changed by a webhook."""
+	path = _path(graph_uri)
+	_remove(path + LINES_EXT)
+	_remove(path + FINGERPRINTS_EXT)
+	if os.path.isdir(SNAPSHOT_DIR):
+		with open(path + ".invalidated", "a"):
+			os.utime(path + ".invalidated", None)
+
+
+class SourceSnapshot:
+	"""
+	The snapshot of one source across one ingest run.
+
+	*committed_hash* is the payload hash currently stored for graph_uri and
+	*new_hash* the hash of the payload being diffed; the snapshot read by
+	previous_lines() and previous_fingerprints() must carry the former, and the
+	one written by record() carries the latter.
+	"""
+
+	def __init__(self, graph_uri, committed_hash, new_hash):
+		self.graph_uri = graph_uri
+		self.committed_hash = committed_hash
+		self.new_hash = new_hash
+		self.verified = False
+		self._started = time.time()
+		self._path = _path(graph_uri)
+		self._pending = f"{self._path}.{os.getpid()}.pending"
+
+	def _open(self, ext):
+		"""Open the committed file with extension *ext*; return (file, checksum, line_count), or None if unusable."""
+		if not self.committed_hash:
+			return None
+		try:
+			f = open(self._path + ext, encoding="utf-8")
+		except OSError:
+			return None
+		header = f.readline().rstrip("\n")
+		fields = header[len(HEADER_PREFIX):].split(" ") if header.startswith(HEADER_PREFIX) else []
+		if len(fields) != 4 or fields[0] != self.graph_uri or fields[1] != self.committed_hash:
+			f.close()
+			return None
+		return (f, fields[2], fields[3])
+
+	def previous_lines(self):
+		"""
+		Return an iterator over the committed snapshot's lines, or None if there is
+		no usable snapshot (missing, unreadable, or for a different payload hash).
+		Once the iterator is exhausted, self.verified says whether the lines
+		matched the header's checksum and count; if not, anything computed from
+		them must be thrown away.
+		"""
+		opened = self._open(LINES_EXT)
+		return self._verified_lines(*opened) if opened else None
+
+	def _verified_lines(self, f, checksum, line_count):
+		self.verified = False
+		digest = hashlib.sha256()
+		n = 0
+		with f:
+			for line in f:
+				digest.update(line.encode("utf-8"))
+				n += 1
+				yield line
+		self.verified = "sha256:" + digest.hexdigest() == checksum and str(n) == line_count
+
+	def previous_fingerprints(self):
+		"""
+		Return the committed {subject: fingerprint} index, or None if there is no
+		usable one (missing, unreadable, for a different payload hash, or failing
+		its checksum).
+		"""
+		opened = self._open(FINGERPRINTS_EXT)
+		if not opened:
+			return None
+		lines = self._verified_lines(*opened)
+		fingerprints = dict(line.rstrip("\n").rsplit(" ", 1) for line in lines)
+		return fingerprints if self.verified else None
+
+	def record(self, lines, fingerprints=None):
+		"""
+		Write *lines* (sorted N-Triples lines) and, if given, the *fingerprints*
+		index ({subject: fingerprint}) as the pending snapshot for new_hash.
+		"""
+		os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+		_write(self._pending + LINES_EXT, self.graph_uri, self.new_hash, lines)
+		if fingerprints is not None:
+			_write(
+				self._pending + FINGERPRINTS_EXT, self.graph_uri, self.new_hash,
+				[f"{subject} {fingerprint}\n" for subject, fingerprint in fingerprints.items()],
+			)
+
+	def commit(self):
+		"""
+		Make the pending snapshot current — unless the graph was invalidated after
+		this run started, in which case it no longer matches the triplestore.
+		"""
+		if not os.path.exists(self._pending + LINES_EXT):
+			return
+		try:
+			invalidated = os.path.getmtime(self._path + ".invalidated") >= self._started
+		except OSError:
+			invalidated = False
+		if invalidated:
+			print(f"Not saving snapshot of <{self.graph_uri}>: graph changed during this run", flush=True)
+			self.discard()
+			invalidate(self.graph_uri)
+			return
+		os.replace(self._pending + LINES_EXT, self._path + LINES_EXT)
+		if os.path.exists(self._pending + FINGERPRINTS_EXT):
+			os.replace(self._pending + FINGERPRINTS_EXT, self._path + FINGERPRINTS_EXT)
+
+	def discard(self):
+		_remove(self._pending + LINES_EXT)
+		_remove(self._pending + FINGERPRINTS_EXT)
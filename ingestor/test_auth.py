@@ -10,9 +10,11 @@ for mod_name in ("authorised_fetch", "triplestore", "searchindex"):
 	stub = types.ModuleType(mod_name)
 	stub.fetch_url = None
 	stub.live_systems = {}
+	stub.parse_graph = None
 	stub.replace_item_in_triplestore = None
 	stub.delete_item_in_triplestore = None
 	stub.merge_items_in_triplestore = None
+	stub.update_inferences_for_items = None
 	stub.session = None  # server.py now imports session from triplestore
 	stub.update_searchindex = None
 	stub.delete_doc_in_searchindex = None
@@ -55,10 +55,12 @@ class TestIsTrustedHost:
 # fetch_url — auth header allow-list behaviour
 # ---------------------------------------------------------------------------
 
-def _mock_response(content_type="text/turtle", text="<> a <> .", status=200, is_redirect=False, location=None):
+def _mock_response(content_type="text/turtle", text="<> a <> .", status=200, is_redirect=False, location=None, chunks=None):
     resp = MagicMock()
     resp.status_code = status
     resp.text = text
+    resp.iter_content.return_value = chunks if chunks is not None else [text.encode("utf-8")]
+    resp.content = b"".join(resp.iter_content.return_value)
     resp.is_redirect = is_redirect
     resp.is_permanent_redirect = False
     resp.raise_for_status = MagicMock()
@@ -158,3 +160,178 @@ class TestFetchUrlRedirectAuth:
 
         args1, kwargs1 = mock_session.get.call_args_list[1]
         assert kwargs1["headers"].get("Authorization") == "Bearer test-secret-key"
+
+
+class TestFetchSourceConditionalGet:
+
+    def test_validators_sent_as_conditional_headers(self):
+        """Stored validators are sent as If-None-Match / If-Modified-Since."""
+        mock_resp = _mock_response()
+        with patch.object(_af_module, "session") as mock_session:
+            mock_session.get.return_value = mock_resp
+            _af_module.fetch_source(
+                "lucos_eolas",
+                "https://eolas.l42.eu/metadata/all/data/",
+                {"etag": '"abc"', "last_modified": "Wed, 01 Jan 2025 00:00:00 GMT"},
+            )
+        args, kwargs = mock_session.get.call_args
+        assert kwargs["headers"]["If-None-Match"] == '"abc"'
+        assert kwargs["headers"]["If-Modified-Since"] == "Wed, 01 Jan 2025 00:00:00 GMT"
+        # Conditional headers are added to, not instead of, the auth header
+        assert kwargs["headers"]["Authorization"] == "Bearer test-secret-key"
+
+    def test_no_conditional_headers_without_validators(self):
+        mock_resp = _mock_response()
+        with patch.object(_af_module, "session") as mock_session:
+            mock_session.get.return_value = mock_resp
+            _af_module.fetch_source("lucos_eolas", "https://eolas.l42.eu/metadata/all/data/")
+        args, kwargs = mock_session.get.call_args
+        assert "If-None-Match" not in kwargs["headers"]
+        assert "If-Modified-Since" not in kwargs["headers"]
+
+    def test_not_modified_returns_none(self):
+        """A 304 response short-circuits before the body is read or validated."""
+        mock_resp = _mock_response(status=304, content_type="")
+        with patch.object(_af_module, "session") as mock_session:
+            mock_session.get.return_value = mock_resp
+            result = _af_module.fetch_source(
+                "lucos_eolas", "https://eolas.l42.eu/metadata/all/data/", {"etag": '"abc"'}
+            )
+        assert result is None
+        mock_resp.raise_for_status.assert_not_called()
+
+    def test_response_validators_returned(self):
+        mock_resp = _mock_response()
+        mock_resp.headers["ETag"] = 'W/"xyz"'
+        mock_resp.headers["Last-Modified"] = "Thu, 02 Jan 2025 00:00:00 GMT"
+        with patch.object(_af_module, "session") as mock_session:
+            mock_session.get.return_value = mock_resp
+            body, content_type, validators, payload_hash = _af_module.fetch_source(
+                "lucos_eolas", "https://eolas.l42.eu/metadata/all/data/"
+            )
+        assert validators == {"etag": 'W/"xyz"', "last_modified": "Thu, 02 Jan 2025 00:00:00 GMT"}
+
+    def test_response_without_validators_returns_empty_dict(self):
+        mock_resp = _mock_response()
+        with patch.object(_af_module, "session") as mock_session:
+            mock_session.get.return_value = mock_resp
+            body, content_type, validators, payload_hash = _af_module.fetch_source(
+                "lucos_eolas", "https://eolas.l42.eu/metadata/all/data/"
+            )
+        assert validators == {}
+
+    def test_fetch_url_returns_content_and_type_only(self):
+        mock_resp = _mock_response(text="<a> <b> <c> .")
+        mock_resp.headers["ETag"] = '"abc"'
+        with patch.object(_af_module, "session") as mock_session:
+            mock_session.get.return_value = mock_resp
+            result = fetch_url("lucos_eolas", "https://eolas.l42.eu/metadata/1")
+        assert result == ("<a> <b> <c> .", "text/turtle")
+
+
+@pytest.mark.parametrize("raw,content_type", [
+    ("<http://schema.org/name> \"Café\" .".encode("utf-8"), "text/turtle"),
+    ("<http://schema.org/name> \"Café\" .".encode("latin-1"), "text/turtle; charset=ISO-8859-1"),
+])
+def test_fetch_url_decodes_like_fetch_source(raw, content_type):
+    """A webhook fetch gives the same text as the bulk fetch, so neither keeps rewriting the other's literals."""
+    mock_resp = _mock_response(content_type=content_type, chunks=[raw])
+    mock_resp.text = raw.decode("latin-1")  # requests' default for text/* without a charset
+    with patch.object(_af_module, "session") as mock_session:
+        mock_session.get.return_value = mock_resp
+        (content, _) = fetch_url("lucos_eolas", "https://eolas.l42.eu/metadata/1")
+    (body, _, _, _), _, _ = _stream([raw], content_type=content_type)
+    assert content == "<https://schema.org/name> \"Café\" ."
+    assert body.read().decode("utf-8") == content
+
+
+# ---------------------------------------------------------------------------
+# fetch_source — streamed body, incremental hash and schema.org rewrite
+# ---------------------------------------------------------------------------
+
+def _stream(chunks, content_type="text/turtle"):
+    mock_resp = _mock_response(content_type=content_type, chunks=chunks)
+    with patch.object(_af_module, "session") as mock_session:
+        mock_session.get.return_value = mock_resp
+        result = _af_module.fetch_source("lucos_eolas", "https://eolas.l42.eu/metadata/all/data/")
+    return result, mock_session, mock_resp
+
+
+def _expected_hash(content, content_type):
+    import hashlib
+    return "sha256:" + hashlib.sha256((content + content_type).encode("utf-8")).hexdigest()
+
+
+class TestFetchSourceStreaming:
+
+    def test_requests_a_streamed_response(self):
+        _, mock_session, mock_resp = _stream([b"<a> <b> <c> ."])
+        args, kwargs = mock_session.get.call_args
+        assert kwargs["stream"] is True
+        mock_resp.close.assert_called()
+
+    def test_body_is_rewound_binary_file(self):
+        (body, content_type, _, _), _, _ = _stream([b"<a> <b> ", b"<c> ."])
+        assert body.read() == b"<a> <b> <c> ."
+        assert content_type == "text/turtle"
+
+    def test_payload_hash_matches_whole_document_hash(self):
+        """The incremental hash equals hashing the rewritten content + content type in one go."""
+        (body, content_type, _, payload_hash), _, _ = _stream([b"<a> <b> ", b"<c> ."])
+        assert payload_hash == _expected_hash("<a> <b> <c> .", "text/turtle")
+
+    def test_schema_org_rewritten_within_chunk(self):
+        (body, _, _, _), _, _ = _stream([b"<http://schema.org/name> ."])
+        assert body.read() == b"<https://schema.org/name> ."
+
+    @pytest.mark.parametrize("split", range(1, len("<http://schema.org/name>")))
+    def test_schema_org_rewritten_across_chunk_boundary(self, split):
+        raw = b"<http://schema.org/name> <http://schema.org/x> ."
+        (body, _, _, payload_hash), _, _ = _stream([raw[:split], raw[split:]])
+        expected = "<https://schema.org/name> <https://schema.org/x> ."
+        assert body.read().decode("utf-8") == expected
+        assert payload_hash == _expected_hash(expected, "text/turtle")
+
+    def test_near_miss_at_chunk_boundary_is_not_rewritten(self):
+        (body, _, _, _), _, _ = _stream([b"<http://schema.o", b"ther/> ."])
+        assert body.read() == b"<http://schema.other/> ."
+
+    def test_multibyte_character_split_across_chunks(self):
+        raw = "<a> <b> \"Café\" .".encode("utf-8")
+        split = raw.index("é".encode("utf-8")) + 1
+        (body, _, _, _), _, _ = _stream([raw[:split], raw[split:]])
+        assert body.read() == raw
+
+    def test_text_types_default_to_utf8(self):
+        """Without a charset parameter the body is decoded as UTF-8, not ISO-8859-1."""
+        raw = "<a> <b> \"Café\" .".encode("utf-8")
+        (body, _, _, payload_hash), _, _ = _stream([raw])
+        assert body.read() == raw
+        assert payload_hash == _expected_hash("<a> <b> \"Café\" .", "text/turtle")
+
+    def test_declared_charset_is_honoured(self):
+        raw = "<a> <b> \"Café\" .".encode("latin-1")
+        (body, content_type, _, _), _, _ = _stream([raw], content_type="text/turtle; charset=ISO-8859-1")
+        assert body.read() == "<a> <b> \"Café\" .".encode("utf-8")
+        assert content_type == "text/turtle"
+
+    def test_non_rdf_rejected_before_body_is_read(self):
+        mock_resp = _mock_response(content_type="text/html")
+        with patch.object(_af_module, "session") as mock_session:
+            mock_session.get.return_value = mock_resp
+            with pytest.raises(ValueError):
+                _af_module.fetch_source("lucos_eolas", "https://eolas.l42.eu/metadata/all/data/")
+        mock_resp.iter_content.assert_not_called()
+        mock_resp.close.assert_called()
+
+    def test_large_body_spills_to_disk(self, monkeypatch):
+        monkeypatch.setattr(_af_module, "SPOOL_MEMORY_LIMIT", 64)
+        chunks = [b"<http://schema.org/s> <http://schema.org/p> \"%d\" .\n" % i for i in range(50)]
+        (body, content_type, _, _), _, _ = _stream(chunks)
+        assert body._rolled
+        from rdflib import Graph
+        from rdflib.parser import InputSource
+        source = InputSource()
+        source.setByteStream(body)
+        g = Graph().parse(source=source, format="turtle")
+        assert len(g) == 50
@@ -0,0 +1,88 @@
+"""Tests for benchmark.py — synthetic data generation and the benchmark runner."""
+import json
+import os
+
+os.environ.setdefault("KEY_LUCOS_ARACHNE", "test")
+
+import pytest
+from rdflib import BNode, URIRef
+from rdflib.compare import isomorphic
+
+import benchmark
+from benchmark import (
+    BENCHMARKS, CONTACTS_GRAPH, EOLAS_GRAPH, MEDIA_GRAPH,
+    generate_sources, run_benchmark,
+)
+from skolemise import skolemise_graph
+
+
+@pytest.fixture(scope="module")
+def sources():
+    return generate_sources(2000, seed=1)
+
+
+# ---------------------------------------------------------------------------
+# Synthetic data
+# ---------------------------------------------------------------------------
+
+def test_generate_sources_reaches_requested_size(sources):
+    total = sum(len(g) for g in sources.values())
+    assert 2000 <= total < 2200
+
+
+def test_generate_sources_is_deterministic():
+    first = generate_sources(1000, seed=3)
+    second = generate_sources(1000, seed=3)
+    for graph_uri in first:
+        assert isomorphic(skolemise_graph(first[graph_uri]), skolemise_graph(second[graph_uri]))
+
+
+def test_generate_sources_includes_blank_nodes_and_links(sources):
+    eolas = sources[EOLAS_GRAPH]
+    assert any(isinstance(s, BNode) for s in eolas.subjects())
+    contacts = sources[CONTACTS_GRAPH]
+    same_as_targets = set(contacts.objects(None, URIRef("http://www.w3.org/2002/07/owl#sameAs")))
+    assert same_as_targets
+    assert same_as_targets <= set(eolas.subjects())
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks
+# ---------------------------------------------------------------------------
+
+@pytest.mark.parametrize("name", list(BENCHMARKS))
+def test_run_benchmark_reports_time_and_memory(sources, name):
+    result = run_benchmark(name, sources)
+    assert result["benchmark"] == name
+    assert result["triples"] > 0
+    assert result["seconds"] >= 0
+    assert result["peak_memory_bytes"] > 0
+
+
+def test_run_benchmark_can_skip_memory_pass(sources):
+    result = run_benchmark("skolemise_graph", sources, measure_memory=False)
+    assert result["peak_memory_bytes"] is None
+
+
+def test_compute_inferences_benchmark_leaves_real_session_alone(sources):
+    original = benchmark.triplestore.session
+    run_benchmark("compute_inferences", sources, measure_memory=False)
+    assert benchmark.triplestore.session is original
+
+
+def test_run_benchmark_over_http(sources):
+    original = benchmark.triplestore.session
+    result = run_benchmark("compute_person_closures", sources, measure_memory=False,
+        transport=benchmark.Transport(http=True))
+    assert result["triples"] > 0
+    assert benchmark.triplestore.session is original
+
+
+def test_main_writes_json_results(tmp_path, monkeypatch):
+    monkeypatch.setitem(benchmark.SCALES, "tiny", 500)
+    path = tmp_path / "results.json"
+    benchmark.main(["--scale", "tiny", "--only", "graph_to_track_docs", "--no-memory", "--json", str(path)])
+    results = json.loads(path.read_text())
+    assert len(results) == 1
+    assert results[0]["scale"] == "tiny"
+    assert results[0]["benchmark"] == "graph_to_track_docs"
@@ -0,0 +1,56 @@
+"""Tests for closure.py — SCC-condensed transitive closure."""
+import random
+
+from closure import strongly_connected_components, transitive_closure
+
+
+def _bfs_closure(successors):
+    """Reference implementation: a separate traversal from every node."""
+    closure = {}
+    for start in successors:
+        visited = set()
+        queue = list(successors[start])
+        while queue:
+            node = queue.pop()
+            if node in visited:
+                continue
+            visited.add(node)
+            queue.extend(successors.get(node, ()))
+        closure[start] = visited
+    return closure
+
+
+def test_chain():
+    assert transitive_closure({"a": {"b"}, "b": {"c"}}) == {"a": {"b", "c"}, "b": {"c"}}
+
+
+def test_node_reaches_itself_only_on_a_cycle():
+    closure = transitive_closure({"a": {"b"}, "b": {"a", "c"}, "d": {"d"}})
+    assert closure["a"] == {"a", "b", "c"}
+    assert closure["b"] == {"a", "b", "c"}
+    assert closure["d"] == {"d"}
+
+
+def test_components_come_after_everything_they_reach():
+    successors = {"a": {"b"}, "b": {"c"}, "c": {"b", "d"}, "d": set()}
+    order = list(strongly_connected_components(successors))
+    position = {node: i for i, component in enumerate(order) for node in component}
+    assert sorted(map(sorted, order)) == [["a"], ["b", "c"], ["d"]]
+    assert position["d"] < position["b"] < position["a"]
+
+
+def test_deep_hierarchy_does_not_recurse():
+    successors = {i: {i + 1} for i in range(3_000)}
+    closure = transitive_closure(successors)
+    assert len(closure[0]) == 3_000
+    assert closure[2_999] == {3_000}
+
+
+def test_matches_per_node_traversal_on_random_graphs():
+    rng = random.Random(1)
+    for _ in range(50):
+        n = rng.randrange(1, 40)
+        successors = {}
+        for _ in range(rng.randrange(0, 80)):
+            successors.setdefault(rng.randrange(n), set()).add(rng.randrange(n))
+        assert transitive_closure(successors) == _bfs_closure(successors)
@@ -1,4 +1,5 @@
 """Tests for ingest.py — hash-skip behaviour, Phase 1 atomicity, any_changed guard, allow-list."""
+import hashlib
 import os
 import sys
 import types
@@ -20,6 +21,19 @@ _GRAPH_URI = "https://eolas.l42.eu/metadata/all/data/"
 _CONTENT = "<rdf> example </rdf>"
 _CONTENT_TYPE = "application/rdf+xml"
 
+
+def _mock_body():
+    """A stand-in for the spooled file fetch_source returns."""
+    body = MagicMock(name="body")
+    body.seek.return_value = len(_CONTENT)
+    return body
+
+
+# fetch_source hands back the payload as a spooled file plus its precomputed hash
+_BODY = _mock_body()
+_PARSED_GRAPH = MagicMock(name="graph")
+_HASH = "sha256:" + hashlib.sha256((_CONTENT + _CONTENT_TYPE).encode("utf-8")).hexdigest()
+
 _live_systems_stub = {"lucos_eolas": _GRAPH_URI}
 _ontology_cache_stub = {}  # empty for most tests; overridden in specific ones
 _ONTOLOGIES_DIR_stub = "/tmp"
@@ -30,22 +44,42 @@ _DIFF_FRAGMENT_STUB = (
     f"INSERT DATA {{ GRAPH <{_GRAPH_URI}> {{ <http://ex.com/s> <http://ex.com/p> <http://ex.com/o> . }} }}"
 )
 
-_fetch_url_mock = MagicMock(return_value=(_CONTENT, _CONTENT_TYPE))
+_fetch_source_mock = MagicMock(return_value=(_BODY, _CONTENT_TYPE, {}, _HASH))
 _replace_graph_mock = MagicMock()
+_parse_graph_mock = MagicMock(return_value=_PARSED_GRAPH)
 _diff_graph_mock = MagicMock(return_value=_DIFF_FRAGMENT_STUB)
 _execute_sparql_update_mock = MagicMock()
+_stage_large_fragment_mock = MagicMock(side_effect=lambda fragment: fragment)
+_drop_staging_graphs_mock = MagicMock()
 _update_searchindex_mock = MagicMock(return_value=(set(), set()))
 _update_person_docs_mock = MagicMock(return_value=set())
 _cleanup_triplestore_mock = MagicMock()
 _cleanup_searchindex_mock = MagicMock()
 _compute_inferences_mock = MagicMock()
-_get_source_hash_mock = MagicMock(return_value=None)
+# Hash and validators that get_source_metadata reports for every source
+_stored = {"hash": None, "validators": {}}
+
+
+def _fake_get_source_metadata(graph_uris):
+    graph_uris = list(graph_uris)
+    hashes = {uri: _stored["hash"] for uri in graph_uris} if _stored["hash"] is not None else {}
+    return (hashes, {uri: dict(_stored["validators"]) for uri in graph_uris})
+
+
+_HASH_UPDATE_STUB = "HASH-UPDATE"
+_VALIDATORS_UPDATE_STUB = "VALIDATORS-UPDATE"
+
+_get_source_metadata_mock = MagicMock(side_effect=_fake_get_source_metadata)
 _set_source_hash_mock = MagicMock()
+_source_hash_update_mock = MagicMock(return_value=_HASH_UPDATE_STUB)
+_source_validators_update_mock = MagicMock(return_value=_VALIDATORS_UPDATE_STUB)
+_clear_source_hash_mock = MagicMock()
 _update_loganne_mock = MagicMock()
 _update_schedule_tracker_mock = MagicMock()
+_source_snapshot_mock = MagicMock()
 
 for mod_name, attrs in [
-    ("authorised_fetch", {"fetch_url": _fetch_url_mock}),
+    ("authorised_fetch", {"fetch_source": _fetch_source_mock}),
     (
         "triplestore",
         {
@@ -55,12 +89,18 @@ for mod_name, attrs in [
             "INFERRED_GRAPH": _INFERRED_GRAPH_stub,
             "METADATA_GRAPH": _METADATA_GRAPH_stub,
             "replace_graph_in_triplestore": _replace_graph_mock,
+            "parse_graph": _parse_graph_mock,
             "diff_graph_in_triplestore": _diff_graph_mock,
+            "stage_large_fragment": _stage_large_fragment_mock,
+            "drop_staging_graphs": _drop_staging_graphs_mock,
             "execute_sparql_update": _execute_sparql_update_mock,
             "cleanup_triplestore": _cleanup_triplestore_mock,
             "compute_inferences": _compute_inferences_mock,
-            "get_source_hash": _get_source_hash_mock,
+            "get_source_metadata": _get_source_metadata_mock,
             "set_source_hash": _set_source_hash_mock,
+            "source_hash_update": _source_hash_update_mock,
+            "source_validators_update": _source_validators_update_mock,
+            "clear_source_hash": _clear_source_hash_mock,
             "session": MagicMock(),  # triplestore_session imported by ingest.py
         },
     ),
@@ -74,13 +114,14 @@ for mod_name, attrs in [
     ),
     ("loganne", {"updateLoganne": _update_loganne_mock}),
     ("schedule_tracker", {"updateScheduleTracker": _update_schedule_tracker_mock}),
+    ("snapshot", {"SourceSnapshot": _source_snapshot_mock}),
 ]:
     stub = types.ModuleType(mod_name)
     for attr, val in attrs.items():
         setattr(stub, attr, val)
     sys.modules[mod_name] = stub
 
-_stub_mod_names = ["authorised_fetch", "triplestore", "searchindex", "loganne", "schedule_tracker"]
+_stub_mod_names = ["authorised_fetch", "triplestore", "searchindex", "loganne", "schedule_tracker", "snapshot"]
 
 import ingest
 
@@ -90,18 +131,25 @@ for _mod_name in _stub_mod_names:
 
 def _reset_mocks():
     for m in [
-        _fetch_url_mock, _replace_graph_mock, _diff_graph_mock,
-        _execute_sparql_update_mock, _update_searchindex_mock, _update_person_docs_mock,
-        _cleanup_triplestore_mock, _cleanup_searchindex_mock,
-        _compute_inferences_mock, _get_source_hash_mock, _set_source_hash_mock,
-        _update_loganne_mock, _update_schedule_tracker_mock,
+        _fetch_source_mock, _replace_graph_mock, _parse_graph_mock, _diff_graph_mock,
+        _execute_sparql_update_mock, _stage_large_fragment_mock, _drop_staging_graphs_mock,
+        _update_searchindex_mock, _update_person_docs_mock, _cleanup_triplestore_mock, _cleanup_searchindex_mock,
+        _compute_inferences_mock, _get_source_metadata_mock, _set_source_hash_mock,
+        _source_hash_update_mock, _source_validators_update_mock, _clear_source_hash_mock,
+        _update_loganne_mock, _update_schedule_tracker_mock, _source_snapshot_mock,
     ]:
         m.reset_mock(side_effect=True, return_value=True)
-    _fetch_url_mock.return_value = (_CONTENT, _CONTENT_TYPE)
+    _fetch_source_mock.return_value = (_BODY, _CONTENT_TYPE, {}, _HASH)
     _update_searchindex_mock.return_value = (set(), set())
     _update_person_docs_mock.return_value = set()
-    _get_source_hash_mock.return_value = None
+    _stored["hash"] = None
+    _stored["validators"] = {}
+    _get_source_metadata_mock.side_effect = _fake_get_source_metadata
+    _source_hash_update_mock.return_value = _HASH_UPDATE_STUB
+    _source_validators_update_mock.return_value = _VALIDATORS_UPDATE_STUB
+    _parse_graph_mock.return_value = _PARSED_GRAPH
     _diff_graph_mock.return_value = _DIFF_FRAGMENT_STUB
+    _stage_large_fragment_mock.side_effect = lambda fragment: fragment
 
 
 # ---------------------------------------------------------------------------
@@ -116,7 +164,7 @@ def _expected_hash(content, content_type):
 def test_hash_match_skips_diff_graph():
     """When stored hash matches, diff_graph_in_triplestore is not called."""
     _reset_mocks()
-    _get_source_hash_mock.return_value = _expected_hash(_CONTENT, _CONTENT_TYPE)
+    _stored["hash"] = _expected_hash(_CONTENT, _CONTENT_TYPE)
     ingest.run_ingest()
     _diff_graph_mock.assert_not_called()
 
@@ -124,7 +172,7 @@ def test_hash_match_skips_diff_graph():
 def test_hash_match_skips_execute_sparql_update():
     """When stored hash matches, execute_sparql_update is not called."""
     _reset_mocks()
-    _get_source_hash_mock.return_value = _expected_hash(_CONTENT, _CONTENT_TYPE)
+    _stored["hash"] = _expected_hash(_CONTENT, _CONTENT_TYPE)
     ingest.run_ingest()
     _execute_sparql_update_mock.assert_not_called()
 
@@ -132,17 +180,17 @@ def test_hash_match_skips_execute_sparql_update():
 def test_hash_match_skips_update_searchindex():
     """When stored hash matches, update_searchindex is not called."""
     _reset_mocks()
-    _get_source_hash_mock.return_value = _expected_hash(_CONTENT, _CONTENT_TYPE)
+    _stored["hash"] = _expected_hash(_CONTENT, _CONTENT_TYPE)
     ingest.run_ingest()
     _update_searchindex_mock.assert_not_called()
 
 
-def test_hash_match_skips_set_source_hash():
-    """When stored hash matches, set_source_hash is not called."""
+def test_hash_match_skips_hash_update():
+    """When stored hash matches, no hash update is built."""
     _reset_mocks()
-    _get_source_hash_mock.return_value = _expected_hash(_CONTENT, _CONTENT_TYPE)
+    _stored["hash"] = _expected_hash(_CONTENT, _CONTENT_TYPE)
     ingest.run_ingest()
-    _set_source_hash_mock.assert_not_called()
+    _source_hash_update_mock.assert_not_called()
 
 
 # ---------------------------------------------------------------------------
@@ -152,15 +200,15 @@ def test_hash_match_skips_set_source_hash():
 def test_hash_miss_calls_diff_graph():
     """When stored hash differs, diff_graph_in_triplestore is called with the correct args."""
     _reset_mocks()
-    _get_source_hash_mock.return_value = "sha256:old"
+    _stored["hash"] = "sha256:old"
     ingest.run_ingest()
-    _diff_graph_mock.assert_called_once_with(_GRAPH_URI, _CONTENT, _CONTENT_TYPE)
+    _diff_graph_mock.assert_called_once_with(_GRAPH_URI, _PARSED_GRAPH, _CONTENT_TYPE, snapshot=_source_snapshot_mock.return_value)
 
 
 def test_no_prior_hash_calls_diff_graph():
     """When no hash is stored (None), diff_graph_in_triplestore is called."""
     _reset_mocks()
-    _get_source_hash_mock.return_value = None
+    _stored["hash"] = None
     ingest.run_ingest()
     _diff_graph_mock.assert_called_once()
 
@@ -168,58 +216,79 @@ def test_no_prior_hash_calls_diff_graph():
 def test_diff_fragment_passed_to_execute_sparql_update():
     """The fragment returned by diff_graph_in_triplestore is passed to execute_sparql_update."""
     _reset_mocks()
-    _get_source_hash_mock.return_value = None
+    _stored["hash"] = None
     ingest.run_ingest()
     _execute_sparql_update_mock.assert_called_once()
     sparql = _execute_sparql_update_mock.call_args.args[0]
     assert _DIFF_FRAGMENT_STUB in sparql
 
 
-def test_hash_written_after_searchindex_update():
-    """set_source_hash is called only after update_searchindex succeeds."""
+def test_hash_written_in_phase1_update():
+    """The new hash is appended to the Phase 1 update, after the data fragment."""
     _reset_mocks()
-    _get_source_hash_mock.return_value = None
-    call_order = []
-    _update_searchindex_mock.side_effect = lambda *a, **kw: (call_order.append("searchindex"), (set(), set()))[1]
-    _set_source_hash_mock.side_effect = lambda *a, **kw: call_order.append("set_hash")
+    _stored["hash"] = None
     ingest.run_ingest()
-    assert call_order.index("searchindex") < call_order.index("set_hash")
+    _source_hash_update_mock.assert_called_once_with(_GRAPH_URI, _HASH, {})
+    _execute_sparql_update_mock.assert_called_once()
+    sparql = _execute_sparql_update_mock.call_args.args[0]
+    assert sparql.index(_DIFF_FRAGMENT_STUB) < sparql.index(_HASH_UPDATE_STUB)
+    _set_source_hash_mock.assert_not_called()
 
 
-def test_hash_not_written_when_searchindex_fails():
-    """If update_searchindex raises, set_source_hash is not called."""
+def test_hash_cleared_when_searchindex_fails():
+    """If update_searchindex raises, the committed hash is cleared so the next run retries."""
     _reset_mocks()
-    _get_source_hash_mock.return_value = None
+    _stored["hash"] = None
     _update_searchindex_mock.side_effect = Exception("search index down")
     ingest.run_ingest()
-    _set_source_hash_mock.assert_not_called()
+    _clear_source_hash_mock.assert_called_once_with(_GRAPH_URI)
+
+
+def test_hash_not_cleared_when_searchindex_succeeds():
+    _reset_mocks()
+    _stored["hash"] = None
+    ingest.run_ingest()
+    _clear_source_hash_mock.assert_not_called()
 
 
 # ---------------------------------------------------------------------------
 # Phase 1 atomicity — single execute_sparql_update call
 # ---------------------------------------------------------------------------
 
+def test_large_fragment_is_staged_and_publish_fragment_sent():
+    """Each diff goes through stage_large_fragment; Phase 1 sends what it returns."""
+    _reset_mocks()
+    _stored["hash"] = None
+    _stage_large_fragment_mock.side_effect = lambda fragment: "PUBLISH-STAGED"
+    ingest.run_ingest()
+    _stage_large_fragment_mock.assert_called_once_with(_DIFF_FRAGMENT_STUB)
+    sparql = _execute_sparql_update_mock.call_args.args[0]
+    assert "PUBLISH-STAGED" in sparql
+    assert _DIFF_FRAGMENT_STUB not in sparql
+
+
 def test_phase1_single_execute_call_for_one_source():
     """Phase 1 issues exactly one execute_sparql_update call even for one source."""
     _reset_mocks()
-    _get_source_hash_mock.return_value = None
+    _stored["hash"] = None
     ingest.run_ingest()
     _execute_sparql_update_mock.assert_called_once()
 
 
-def test_phase1_no_execute_when_diff_returns_none():
-    """When diff_graph_in_triplestore returns None, execute_sparql_update is not called."""
+def test_phase1_only_hash_when_diff_returns_none():
+    """When diff_graph_in_triplestore returns None, Phase 1 carries only the hash update."""
     _reset_mocks()
-    _get_source_hash_mock.return_value = None
+    _stored["hash"] = None
     _diff_graph_mock.return_value = None
     ingest.run_ingest()
-    _execute_sparql_update_mock.assert_not_called()
+    _execute_sparql_update_mock.assert_called_once_with([_HASH_UPDATE_STUB])
+    _compute_inferences_mock.assert_not_called()
 
 
 def test_phase1_execute_before_searchindex():
     """execute_sparql_update is called before update_searchindex."""
     _reset_mocks()
-    _get_source_hash_mock.return_value = None
+    _stored["hash"] = None
     call_order = []
     _execute_sparql_update_mock.side_effect = lambda *a, **kw: call_order.append("phase1")
     _update_searchindex_mock.side_effect = lambda *a, **kw: (call_order.append("searchindex"), (set(), set()))[1]
@@ -228,23 +297,305 @@ def test_phase1_execute_before_searchindex():
 
 
 def test_phase1_failure_prevents_hash_update():
-    """If execute_sparql_update raises, set_source_hash is not called."""
+    """The hash commits in the same transaction as the data, so a failed Phase 1 writes neither."""
     _reset_mocks()
-    _get_source_hash_mock.return_value = None
+    _stored["hash"] = None
     _execute_sparql_update_mock.side_effect = Exception("Fuseki error")
     ingest.run_ingest()
+    _execute_sparql_update_mock.assert_called_once()
+    assert _HASH_UPDATE_STUB in _execute_sparql_update_mock.call_args.args[0]
     _set_source_hash_mock.assert_not_called()
+    _clear_source_hash_mock.assert_not_called()
 
 
 def test_phase1_failure_prevents_searchindex_update():
     """If execute_sparql_update raises, update_searchindex is not called."""
     _reset_mocks()
-    _get_source_hash_mock.return_value = None
+    _stored["hash"] = None
     _execute_sparql_update_mock.side_effect = Exception("Fuseki error")
     ingest.run_ingest()
     _update_searchindex_mock.assert_not_called()
 
 
+def test_snapshot_committed_after_phase1():
+    """The source's snapshot is created with the stored and new hashes, and committed once Phase 1 succeeds."""
+    _reset_mocks()
+    _stored["hash"] = "sha256:old"
+    ingest.run_ingest()
+    _source_snapshot_mock.assert_called_once_with(_GRAPH_URI, "sha256:old", _HASH)
+    _source_snapshot_mock.return_value.commit.assert_called_once()
+    _source_snapshot_mock.return_value.discard.assert_not_called()
+
+
+def test_phase1_failure_discards_snapshot():
+    """A snapshot of data that never reached the triplestore is thrown away."""
+    _reset_mocks()
+    _stored["hash"] = None
+    _execute_sparql_update_mock.side_effect = Exception("Fuseki error")
+    ingest.run_ingest()
+    _source_snapshot_mock.return_value.commit.assert_not_called()
+    _source_snapshot_mock.return_value.discard.assert_called_once()
+
+
+def test_phase1_failure_drops_staging_graphs():
+    """Data staged for a Phase 1 that failed is dropped rather than left in the union graph."""
+    _reset_mocks()
+    _stored["hash"] = None
+    _stage_large_fragment_mock.side_effect = lambda fragment: "PUBLISH-STAGED"
+    _execute_sparql_update_mock.side_effect = Exception("Fuseki error")
+    ingest.run_ingest()
+    _drop_staging_graphs_mock.assert_called_once_with(["PUBLISH-STAGED"])
+
+
+def test_phase1_success_leaves_staging_graphs_to_publish():
+    _reset_mocks()
+    _stored["hash"] = None
+    ingest.run_ingest()
+    _drop_staging_graphs_mock.assert_not_called()
+
+
+def test_snapshot_not_created_for_unchanged_source():
+    """A skipped source keeps its existing snapshot untouched."""
+    _reset_mocks()
+    _stored["hash"] = _HASH
+    ingest.run_ingest()
+    _source_snapshot_mock.assert_not_called()
+
+
+# ---------------------------------------------------------------------------
+# Conditional GET — validators from the metadata graph
+# ---------------------------------------------------------------------------
+
+_VALIDATORS = {"etag": '"v1"', "last_modified": "Wed, 01 Jan 2025 00:00:00 GMT"}
+
+
+def test_stored_validators_passed_to_fetch():
+    """The validators stored for a source are sent with its fetch."""
+    _reset_mocks()
+    _stored["validators"] = _VALIDATORS
+    ingest.run_ingest()
+    _fetch_source_mock.assert_called_once_with("lucos_eolas", _GRAPH_URI, _VALIDATORS)
+
+
+def test_not_modified_skips_source():
+    """A 304 (fetch_source returns None) skips hashing, diffing and all writes."""
+    _reset_mocks()
+    _fetch_source_mock.return_value = None
+    ingest.run_ingest()
+    _diff_graph_mock.assert_not_called()
+    _execute_sparql_update_mock.assert_not_called()
+    _update_searchindex_mock.assert_not_called()
+    _source_hash_update_mock.assert_not_called()
+    _compute_inferences_mock.assert_not_called()
+    calls = _update_schedule_tracker_mock.call_args_list
+    assert any(
+        c.kwargs.get("job_name") == "lucos_eolas" and c.kwargs.get("success") is True
+        for c in calls
+    )
+
+
+def test_validators_stored_with_hash_after_ingest():
+    """Validators from the response are written alongside the new payload hash."""
+    _reset_mocks()
+    _fetch_source_mock.return_value = (_BODY, _CONTENT_TYPE, _VALIDATORS, _HASH)
+    ingest.run_ingest()
+    _source_hash_update_mock.assert_called_once_with(
+        _GRAPH_URI, _expected_hash(_CONTENT, _CONTENT_TYPE), _VALIDATORS
+    )
+
+
+def test_hash_match_records_new_validators():
+    """When content is unchanged but validators are new, only the validators are written."""
+    _reset_mocks()
+    _fetch_source_mock.return_value = (_BODY, _CONTENT_TYPE, _VALIDATORS, _HASH)
+    _stored["hash"] = _expected_hash(_CONTENT, _CONTENT_TYPE)
+    ingest.run_ingest()
+    _source_validators_update_mock.assert_called_once_with(_GRAPH_URI, _VALIDATORS)
+    _source_hash_update_mock.assert_not_called()
+    # Written through the Phase 1 update, but no graph changed
+    _execute_sparql_update_mock.assert_called_once_with([_VALIDATORS_UPDATE_STUB])
+    _compute_inferences_mock.assert_not_called()
+
+
+def test_hash_match_with_same_validators_writes_nothing():
+    """Unchanged content with unchanged validators makes no metadata writes."""
+    _reset_mocks()
+    _fetch_source_mock.return_value = (_BODY, _CONTENT_TYPE, _VALIDATORS, _HASH)
+    _stored["validators"] = dict(_VALIDATORS)
+    _stored["hash"] = _expected_hash(_CONTENT, _CONTENT_TYPE)
+    ingest.run_ingest()
+    _source_validators_update_mock.assert_not_called()
+    _execute_sparql_update_mock.assert_not_called()
+
+
+# ---------------------------------------------------------------------------
+# Batched metadata — all stored hashes and validators loaded in one query
+# ---------------------------------------------------------------------------
+
+def test_source_metadata_loaded_once_for_all_sources():
+    """One get_source_metadata call covers every live source and ontology."""
+    _reset_mocks()
+    ontologies = {"owl": ("http://www.w3.org/2002/07/owl#", "owl.ttl", "text/turtle")}
+    with patch.object(ingest, "live_systems", _two_live_systems()), \
+         patch.object(ingest, "ontology_cache", ontologies):
+        ingest.run_ingest()
+    _get_source_metadata_mock.assert_called_once()
+    uris = list(_get_source_metadata_mock.call_args.args[0])
+    assert uris == [_GRAPH_URI, _SECOND_GRAPH_URI, "http://www.w3.org/2002/07/owl#"]
+
+
+def test_ontology_hash_match_uses_batched_hash(tmp_path):
+    _reset_mocks()
+    content = "<a> <b> <c> ."
+    (tmp_path / "owl.ttl").write_text(content, encoding="utf-8")
+    _stored["hash"] = _expected_hash(content, "text/turtle")
+    ontologies = {"owl": ("http://www.w3.org/2002/07/owl#", "owl.ttl", "text/turtle")}
+    with patch.object(ingest, "ontology_cache", ontologies), \
+         patch.object(ingest, "ONTOLOGIES_DIR", str(tmp_path)):
+        ingest.run_ingest()
+    _replace_graph_mock.assert_not_called()
+    _set_source_hash_mock.assert_not_called()
+
+
+def test_metadata_load_failure_ingests_everything():
+    """If the stored hashes can't be loaded, every source is diffed in full rather than failing."""
+    _reset_mocks()
+    _get_source_metadata_mock.side_effect = Exception("triplestore timeout")
+    ingest.run_ingest()
+    _fetch_source_mock.assert_called_once_with("lucos_eolas", _GRAPH_URI, {})
+    _diff_graph_mock.assert_called_once()
+    _execute_sparql_update_mock.assert_called_once()
+
+
+# ---------------------------------------------------------------------------
+# Streamed payloads — fetch_source's hash is used as-is and the body is closed
+# ---------------------------------------------------------------------------
+
+def test_payload_hash_from_fetch_is_stored():
+    """The hash computed while streaming is stored without re-hashing the payload."""
+    _reset_mocks()
+    _fetch_source_mock.return_value = (_BODY, _CONTENT_TYPE, {}, "sha256:streamed")
+    ingest.run_ingest()
+    _source_hash_update_mock.assert_called_once_with(_GRAPH_URI, "sha256:streamed", {})
+
+
+def test_payload_parsed_once_and_shared():
+    """The body is parsed once; the same Graph feeds the diff and the search index."""
+    _reset_mocks()
+    body = _mock_body()
+    _fetch_source_mock.return_value = (body, _CONTENT_TYPE, {}, _HASH)
+    ingest.run_ingest()
+    _parse_graph_mock.assert_called_once_with(body, _CONTENT_TYPE)
+    _diff_graph_mock.assert_called_once_with(_GRAPH_URI, _PARSED_GRAPH, _CONTENT_TYPE, snapshot=_source_snapshot_mock.return_value)
+    _update_searchindex_mock.assert_called_once_with("lucos_eolas", _PARSED_GRAPH)
+
+
+def test_body_closed_after_parsing():
+    _reset_mocks()
+    body = _mock_body()
+    _fetch_source_mock.return_value = (body, _CONTENT_TYPE, {}, _HASH)
+    ingest.run_ingest()
+    body.close.assert_called()
+
+
+def test_body_closed_when_hash_matches():
+    _reset_mocks()
+    body = _mock_body()
+    _fetch_source_mock.return_value = (body, _CONTENT_TYPE, {}, _HASH)
+    _stored["hash"] = _HASH
+    ingest.run_ingest()
+    body.close.assert_called()
+    _parse_graph_mock.assert_not_called()
+
+
+def test_body_closed_when_parse_fails():
+    _reset_mocks()
+    body = _mock_body()
+    _fetch_source_mock.return_value = (body, _CONTENT_TYPE, {}, _HASH)
+    _parse_graph_mock.side_effect = Exception("bad turtle")
+    ingest.run_ingest()
+    body.close.assert_called()
+    _diff_graph_mock.assert_not_called()
+
+
+# ---------------------------------------------------------------------------
+# Concurrent Phase 1 — bounded worker pool, results consumed in source order
+# ---------------------------------------------------------------------------
+
+_SECOND_GRAPH_URI = "https://contacts.l42.eu/people/all"
+
+
+def _two_live_systems():
+    return {"lucos_eolas": _GRAPH_URI, "lucos_contacts": _SECOND_GRAPH_URI}
+
+
+def test_phase1_fragments_combined_in_live_systems_order():
+    """Fragments are joined in live_systems order, even when a later source finishes first."""
+    import threading
+    _reset_mocks()
+    _stored["hash"] = None
+    eolas_may_finish = threading.Event()
+
+    def fake_diff(graph_uri, content, content_type, snapshot=None):
+        if graph_uri == _GRAPH_URI:
+            # Hold the first source back until the second has been diffed
+            assert eolas_may_finish.wait(timeout=5)
+            return "FRAGMENT-EOLAS"
+        eolas_may_finish.set()
+        return "FRAGMENT-CONTACTS"
+
+    _diff_graph_mock.side_effect = fake_diff
+    with patch.object(ingest, "live_systems", _two_live_systems()), \
+         patch.dict(os.environ, {"INGEST_WORKERS": "2"}):
+        ingest.run_ingest()
+    _execute_sparql_update_mock.assert_called_once()
+    sparql = _execute_sparql_update_mock.call_args.args[0]
+    assert sparql.index("FRAGMENT-EOLAS") < sparql.index("FRAGMENT-CONTACTS")
+
+
+def test_phase1_failed_source_does_not_block_others():
+    """A fetch failure for one source is reported for that source only; others still commit."""
+    _reset_mocks()
+    _stored["hash"] = None
+
+    def fake_fetch(system, url, validators=None):
+        if system == "lucos_eolas":
+            raise Exception("network error")
+        return (_BODY, _CONTENT_TYPE, {}, _HASH)
+
+    _fetch_source_mock.side_effect = fake_fetch
+    with patch.object(ingest, "live_systems", _two_live_systems()):
+        ingest.run_ingest()
+    _diff_graph_mock.assert_called_once_with(_SECOND_GRAPH_URI, _PARSED_GRAPH, _CONTENT_TYPE, snapshot=_source_snapshot_mock.return_value)
+    _execute_sparql_update_mock.assert_called_once()
+    calls = _update_schedule_tracker_mock.call_args_list
+    assert any(
+        c.kwargs.get("job_name") == "lucos_eolas" and c.kwargs.get("success") is False
+        for c in calls
+    )
+    assert any(
+        c.kwargs.get("job_name") == "lucos_contacts" and c.kwargs.get("success") is True
+        for c in calls
+    )
+
+
+def test_ingest_workers_defaults_when_unset(monkeypatch):
+    monkeypatch.delenv("INGEST_WORKERS", raising=False)
+    assert ingest._ingest_workers() == ingest.DEFAULT_INGEST_WORKERS
+
+
+def test_ingest_workers_reads_environment(monkeypatch):
+    monkeypatch.setenv("INGEST_WORKERS", "7")
+    assert ingest._ingest_workers() == 7
+
+
+def test_ingest_workers_falls_back_on_invalid_value(monkeypatch):
+    monkeypatch.setenv("INGEST_WORKERS", "lots")
+    assert ingest._ingest_workers() == ingest.DEFAULT_INGEST_WORKERS
+    monkeypatch.setenv("INGEST_WORKERS", "0")
+    assert ingest._ingest_workers() == ingest.DEFAULT_INGEST_WORKERS
+
+
 # ---------------------------------------------------------------------------
 # any_changed guard on compute_inferences
 # ---------------------------------------------------------------------------
@@ -252,7 +603,7 @@ def test_phase1_failure_prevents_searchindex_update():
 def test_all_unchanged_skips_inference():
     """compute_inferences is not called when all sources hashed identically."""
     _reset_mocks()
-    _get_source_hash_mock.return_value = _expected_hash(_CONTENT, _CONTENT_TYPE)
+    _stored["hash"] = _expected_hash(_CONTENT, _CONTENT_TYPE)
     ingest.run_ingest()
     _compute_inferences_mock.assert_not_called()
 
@@ -260,7 +611,7 @@ def test_all_unchanged_skips_inference():
 def test_changed_source_triggers_inference():
     """compute_inferences is called when at least one source was re-ingested."""
     _reset_mocks()
-    _get_source_hash_mock.return_value = None
+    _stored["hash"] = None
     ingest.run_ingest()
     _compute_inferences_mock.assert_called_once()
 
@@ -271,7 +622,7 @@ def test_diff_none_but_hash_changed_skips_inference():
     no triplestore writes occur and inference is not triggered.
     """
     _reset_mocks()
-    _get_source_hash_mock.return_value = "sha256:old"
+    _stored["hash"] = "sha256:old"
     _diff_graph_mock.return_value = None
     ingest.run_ingest()
     _compute_inferences_mock.assert_not_called()
@@ -280,7 +631,7 @@ def test_diff_none_but_hash_changed_skips_inference():
 def test_phase1_failure_skips_inference():
     """If Phase 1 fails, compute_inferences is not triggered."""
     _reset_mocks()
-    _get_source_hash_mock.return_value = None
+    _stored["hash"] = None
     _execute_sparql_update_mock.side_effect = Exception("Fuseki error")
     ingest.run_ingest()
     _compute_inferences_mock.assert_not_called()
@@ -293,7 +644,7 @@ def test_phase1_failure_skips_inference():
 def test_person_merge_called_during_ingest():
     """update_person_docs_in_searchindex is called once per successful ingest run."""
     _reset_mocks()
-    _get_source_hash_mock.return_value = None
+    _stored["hash"] = None
     ingest.run_ingest()
     _update_person_docs_mock.assert_called_once()
 
@@ -302,7 +653,7 @@ def test_person_merge_still_called_when_no_sources_changed():
     """update_person_docs_in_searchindex is called even when all sources are hash-identical.
     Person topology can change via webhook events independently of bulk source data."""
     _reset_mocks()
-    _get_source_hash_mock.return_value = _expected_hash(_CONTENT, _CONTENT_TYPE)
+    _stored["hash"] = _expected_hash(_CONTENT, _CONTENT_TYPE)
     ingest.run_ingest()
     _update_person_docs_mock.assert_called_once()
 
@@ -314,7 +665,7 @@ def test_person_merge_still_called_when_no_sources_changed():
 def test_cleanup_allow_list_includes_metadata_graph():
     """cleanup_triplestore is called with METADATA_GRAPH in its allow-list."""
     _reset_mocks()
-    _get_source_hash_mock.return_value = None
+    _stored["hash"] = None
     ingest.run_ingest()
     allow_list = _cleanup_triplestore_mock.call_args.args[0]
     assert _METADATA_GRAPH_stub in allow_list
@@ -323,7 +674,7 @@ def test_cleanup_allow_list_includes_metadata_graph():
 def test_cleanup_allow_list_includes_inferred_graph():
     """cleanup_triplestore allow-list also contains the inferred graph."""
     _reset_mocks()
-    _get_source_hash_mock.return_value = None
+    _stored["hash"] = None
     ingest.run_ingest()
     allow_list = _cleanup_triplestore_mock.call_args.args[0]
     assert _INFERRED_GRAPH_stub in allow_list
@@ -348,7 +699,7 @@ def test_ontology_uses_replace_graph_not_diff():
         with open(ont_file, "w") as f:
             f.write("@prefix ex: <http://example.com/> . ex:s ex:p ex:o .")
         ingest.ONTOLOGIES_DIR = tmpdir
-        _get_source_hash_mock.return_value = None
+        _stored["hash"] = None
         ingest.run_ingest()
     _replace_graph_mock.assert_called_once()
     _diff_graph_mock.assert_not_called()
@@ -365,7 +716,7 @@ def test_ontology_uses_replace_graph_not_diff():
 def test_loganne_message_no_changes():
     """When nothing changed, loganne reports a no-op check at routine level."""
     _reset_mocks()
-    _get_source_hash_mock.return_value = _expected_hash(_CONTENT, _CONTENT_TYPE)
+    _stored["hash"] = _expected_hash(_CONTENT, _CONTENT_TYPE)
     ingest.run_ingest()
     _update_loganne_mock.assert_called_once()
     kwargs = _update_loganne_mock.call_args.kwargs
@@ -376,7 +727,7 @@ def test_loganne_message_no_changes():
 def test_loganne_message_updated():
     """When sources changed without failures, loganne reports an update at routine level."""
     _reset_mocks()
-    _get_source_hash_mock.return_value = None
+    _stored["hash"] = None
     ingest.run_ingest()
     _update_loganne_mock.assert_called_once()
     kwargs = _update_loganne_mock.call_args.kwargs
@@ -387,7 +738,7 @@ def test_loganne_message_updated():
 def test_loganne_message_failed_no_changes():
     """When fetch fails and nothing changed, loganne reports a total failure at notable level."""
     _reset_mocks()
-    _fetch_url_mock.side_effect = Exception("network error")
+    _fetch_source_mock.side_effect = Exception("network error")
     ingest.run_ingest()
     _update_loganne_mock.assert_called_once()
     kwargs = _update_loganne_mock.call_args.kwargs
@@ -398,7 +749,7 @@ def test_loganne_message_failed_no_changes():
 def test_loganne_message_partial_failure():
     """When some sources changed but post-ingest fails, loganne reports a partial update at notable level."""
     _reset_mocks()
-    _get_source_hash_mock.return_value = None
+    _stored["hash"] = None
     _update_searchindex_mock.side_effect = Exception("search index down")
     ingest.run_ingest()
     _update_loganne_mock.assert_called_once()
@@ -415,7 +766,7 @@ def test_schedule_tracker_uses_lucos_arachne_system_on_hash_skip():
     """When a source is hash-skipped, updateScheduleTracker uses system='lucos_arachne'
     and job_name equal to the source name."""
     _reset_mocks()
-    _get_source_hash_mock.return_value = _expected_hash(_CONTENT, _CONTENT_TYPE)
+    _stored["hash"] = _expected_hash(_CONTENT, _CONTENT_TYPE)
     ingest.run_ingest()
     # find the call for the skipped live source
     calls = _update_schedule_tracker_mock.call_args_list
@@ -428,7 +779,7 @@ def test_schedule_tracker_uses_lucos_arachne_system_on_hash_skip():
 def test_schedule_tracker_aggregate_ingestor_uses_v2():
     """The end-of-run aggregate call uses system='lucos_arachne', job_name='ingestor'."""
     _reset_mocks()
-    _get_source_hash_mock.return_value = _expected_hash(_CONTENT, _CONTENT_TYPE)
+    _stored["hash"] = _expected_hash(_CONTENT, _CONTENT_TYPE)
     ingest.run_ingest()
     calls = _update_schedule_tracker_mock.call_args_list
     assert any(
@@ -440,7 +791,7 @@ def test_schedule_tracker_aggregate_ingestor_uses_v2():
 def test_schedule_tracker_inference_uses_v2():
     """The inference job uses system='lucos_arachne', job_name='inference'."""
     _reset_mocks()
-    _get_source_hash_mock.return_value = _expected_hash(_CONTENT, _CONTENT_TYPE)
+    _stored["hash"] = _expected_hash(_CONTENT, _CONTENT_TYPE)
     ingest.run_ingest()
     calls = _update_schedule_tracker_mock.call_args_list
     assert any(
@@ -452,7 +803,7 @@ def test_schedule_tracker_inference_uses_v2():
 def test_schedule_tracker_no_synthetic_system_ids():
     """No updateScheduleTracker call should use a synthetic system ID (e.g. 'lucos_arachne_ingestor_*')."""
     _reset_mocks()
-    _get_source_hash_mock.return_value = None
+    _stored["hash"] = None
     ingest.run_ingest()
     calls = _update_schedule_tracker_mock.call_args_list
     for c in calls:
@@ -461,6 +812,58 @@ def test_schedule_tracker_no_synthetic_system_ids():
             f"Found synthetic system ID in schedule_tracker call: {system!r}"
 
 
+# ---------------------------------------------------------------------------
+# Run report — per-source stage timings and counts
+# ---------------------------------------------------------------------------
+
+def test_run_report_summary_sent_to_loganne():
+    _reset_mocks()
+    ingest.run_ingest()
+    summary = _update_loganne_mock.call_args.kwargs["runReport"]
+    source = summary["sources"]["lucos_eolas"]
+    assert source["status"] == "updated"
+    assert "fetch" in summary["stages"]
+    assert "parse" in summary["stages"]
+    assert "phase1_update" in summary["stages"]
+    assert summary["duration"] is not None
+
+
+def test_run_report_records_skipped_and_failed_sources():
+    _reset_mocks()
+
+    def fake_fetch(system, url, validators=None):
+        if system == "lucos_eolas":
+            raise Exception("network error")
+        return None
+
+    _fetch_source_mock.side_effect = fake_fetch
+    with patch.object(ingest, "live_systems", _two_live_systems()):
+        ingest.run_ingest()
+    sources = _update_loganne_mock.call_args.kwargs["runReport"]["sources"]
+    assert sources["lucos_eolas"]["status"] == "failed"
+    assert sources["lucos_contacts"]["status"] == "unchanged"
+
+
+def test_run_report_written_as_json(tmp_path):
+    _reset_mocks()
+    path = tmp_path / "report.json"
+    with patch.object(ingest, "RUN_REPORT_PATH", str(path)):
+        ingest.run_ingest()
+    import json
+    report = json.loads(path.read_text())
+    source = report["sources"]["lucos_eolas"]
+    assert source["bytes"] == len(_CONTENT)
+    assert source["docs"] == 0
+    assert "fetch" in source["durations"]
+
+
+def test_run_report_write_failure_does_not_fail_run(tmp_path):
+    _reset_mocks()
+    with patch.object(ingest, "RUN_REPORT_PATH", str(tmp_path / "missing" / "report.json")):
+        ingest.run_ingest()
+    _update_loganne_mock.assert_called_once()
+
+
 # ---------------------------------------------------------------------------
 # Real-transport loganne test (ADR-0011)
 # ---------------------------------------------------------------------------
@@ -489,7 +892,7 @@ def test_ingest_loganne_real_transport():
 
     _reset_mocks()
     # Hash-match scenario: nothing changed, simplest code path
-    _get_source_hash_mock.return_value = _expected_hash(_CONTENT, _CONTENT_TYPE)
+    _stored["hash"] = _expected_hash(_CONTENT, _CONTENT_TYPE)
 
     with patch.object(ingest, "updateLoganne", _real_loganne.updateLoganne), \
          patch.object(_real_loganne.session, "post", side_effect=_fake_loganne_post):
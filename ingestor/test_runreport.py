@@ -0,0 +1,90 @@
+"""Tests for runreport.py — per-source stage timings, counters and the run summary."""
+import json
+import threading
+
+from runreport import RunReport, span, count
+
+
+def test_span_without_active_source_is_noop():
+    """Pipeline code can call span()/count() when nothing is being reported (e.g. webhooks)."""
+    with span("parse"):
+        pass
+    count("triples", 3)
+
+
+def test_span_and_count_record_against_active_source():
+    report = RunReport()
+    with report.source("lucos_eolas").active():
+        with span("parse"):
+            pass
+        count("triples", 3)
+        count("triples", 2)
+    data = report.to_dict()["sources"]["lucos_eolas"]
+    assert "parse" in data["durations"]
+    assert data["triples"] == 5
+
+
+def test_active_source_is_per_thread():
+    """Worker threads each record against their own source."""
+    report = RunReport()
+
+    def work(name, n):
+        with report.source(name).active():
+            count("inserts", n)
+
+    threads = [threading.Thread(target=work, args=(name, n)) for name, n in [("a", 1), ("b", 2)]]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    sources = report.to_dict()["sources"]
+    assert sources["a"]["inserts"] == 1
+    assert sources["b"]["inserts"] == 2
+
+
+def test_active_source_restored_on_exit():
+    report = RunReport()
+    with report.source("outer").active():
+        with report.source("inner").active():
+            count("docs", 1)
+        count("docs", 10)
+    sources = report.to_dict()["sources"]
+    assert sources["inner"]["docs"] == 1
+    assert sources["outer"]["docs"] == 10
+
+
+def test_stage_totals_include_run_and_sources():
+    report = RunReport()
+    report.run.add_duration("inference", 1.5)
+    report.source("a").add_duration("fetch", 1.0)
+    report.source("b").add_duration("fetch", 2.0)
+    assert report.stage_totals() == {"inference": 1.5, "fetch": 3.0}
+
+
+def test_summary_is_compact_and_json_serialisable():
+    report = RunReport()
+    source = report.source("lucos_eolas")
+    source.status = "updated"
+    source.add_duration("fetch", 0.5)
+    source.add_duration("construct", 0.25)
+    source.add_count("inserts", 4)
+    source.add_count("deletes", 1)
+    source.add_count("bytes", 12345)
+    report.finish()
+    summary = json.loads(json.dumps(report.summary()))
+    assert summary["sources"]["lucos_eolas"] == {
+        "status": "updated", "duration": 0.75, "inserts": 4, "deletes": 1,
+    }
+    assert summary["stages"] == {"fetch": 0.5, "construct": 0.25}
+    assert summary["duration"] >= 0
+
+
+def test_write_produces_full_json_report(tmp_path):
+    report = RunReport()
+    report.source("lucos_eolas").add_count("bytes", 12345)
+    report.finish()
+    path = tmp_path / "report.json"
+    report.write(str(path))
+    data = json.loads(path.read_text())
+    assert data["sources"]["lucos_eolas"]["bytes"] == 12345
+    assert "startedAt" in data
@@ -8,6 +8,8 @@ import os
 os.environ.setdefault("KEY_LUCOS_ARACHNE", "test-key")
 
 import json
+import pytest
+import typesense
 from unittest.mock import MagicMock, patch, call
 from rdflib import Graph, Namespace, RDF, RDFS, Literal, URIRef
 from rdflib.namespace import SKOS, FOAF
@@ -806,6 +808,170 @@ def test_collect_subclass_labels_raises_on_missing_label():
         assert "source" in msg.lower()
 
 
+# ---------------------------------------------------------------------------
+# TypeMetadata — memoised per-graph type lookups
+# ---------------------------------------------------------------------------
+
+def _films_graph(n):
+    SDO = Namespace("https://schema.org/")
+    g = Graph()
+    film_type = URIRef("https://eolas.l42.eu/metadata/creativeworktype/1/")
+    category = URIRef("https://eolas.l42.eu/metadata/category/1/")
+    g.add((film_type, SKOS.prefLabel, Literal("Film")))
+    g.add((film_type, URIRef(searchindex.EOLAS_HAS_CATEGORY), category))
+    g.add((category, SKOS.prefLabel, Literal("Creative")))
+    g.add((film_type, RDFS.subClassOf, SDO.CreativeWork))
+    g.add((SDO.CreativeWork, SKOS.prefLabel, Literal("Creative Work")))
+    for i in range(n):
+        film = URIRef(f"https://eolas.l42.eu/metadata/creativework/{i}/")
+        g.add((film, RDF.type, film_type))
+        g.add((film, SKOS.prefLabel, Literal(f"Film {i}")))
+    return g
+
+
+def test_graph_to_typesense_docs_resolves_each_type_once():
+    """Subjects sharing a type share one label, category and subclass walk."""
+    g = _films_graph(50)
+    with (
+        patch.object(searchindex, "_collect_subclass_labels", wraps=searchindex._collect_subclass_labels) as walk,
+        patch.object(searchindex, "get_label", wraps=searchindex.get_label) as label,
+    ):
+        docs = graph_to_typesense_docs(g)
+    assert len(docs) == 50
+    assert all(d["type"] == "Film" and d["category"] == "Creative" and d["types"] == ["Film", "Creative Work"] for d in docs)
+    assert walk.call_count == 1
+    assert label.call_count == 3  # Film, Creative, Creative Work
+
+
+def test_type_metadata_repeats_missing_label_error():
+    """A lookup that failed raises the same ValueError every time it is asked for."""
+    types = searchindex.TypeMetadata(Graph())
+    uri = URIRef("https://example.com/unlabelled")
+    for _ in range(2):
+        try:
+            types.label(uri)
+            assert False, "Expected ValueError"
+        except ValueError as e:
+            assert str(uri) in str(e)
+
+
+# ---------------------------------------------------------------------------
+# graph_to_docs — items and tracks from one SubjectIndex
+# ---------------------------------------------------------------------------
+
+def _items_and_tracks_graph():
+    g = _films_graph(5)
+    category = URIRef("https://eolas.l42.eu/metadata/category/2/")
+    g.add((MO.Track, SKOS.prefLabel, Literal("Track")))
+    g.add((MO.Track, URIRef(searchindex.EOLAS_HAS_CATEGORY), category))
+    g.add((category, SKOS.prefLabel, Literal("Music")))
+    album = URIRef("https://media-api.l42.eu/albums/1")
+    g.add((album, SKOS.prefLabel, Literal("Album")))
+    for i in range(5):
+        g += _make_track_graph(f"http://example.com/track/{i}", f"Track {i}")
+        track = URIRef(f"http://example.com/track/{i}")
+        g.add((track, MMM.onAlbum, album))
+        g.add((track, MMM.trigger, URIRef(f"https://media-metadata.l42.eu/search?p.trigger=t{i}")))
+        g.add((track, MMM.soundtrack, URIRef(f"https://media-metadata.l42.eu/search?p.soundtrack=s{i}")))
+    return g
+
+
+def _several_values_graph():
+    """
+    An item and a track which each have several values for the predicates the
+    builders take the first of, or list in order.  Types and labels are added
+    out of lexical order, so only graph order gives the expected docs.
+    """
+    g = Graph()
+    category = URIRef("https://eolas.l42.eu/metadata/category/1/")
+    g.add((category, SKOS.prefLabel, Literal("Creative")))
+    item = URIRef("https://eolas.l42.eu/metadata/creativework/1/")
+    for name in "CAFBEDHG":
+        type_uri = BASE[f"type/{name}"]
+        g.add((type_uri, SKOS.prefLabel, Literal(name)))
+        g.add((type_uri, URIRef(searchindex.EOLAS_HAS_CATEGORY), category))
+        g.add((item, RDF.type, type_uri))
+    for label in ["x", "w", "z", "y"]:
+        g.add((item, SKOS.prefLabel, Literal(label)))
+    for label in ["l3", "l1", "l4", "l2"]:
+        g.add((item, RDFS.label, Literal(label)))
+    g.add((item, FOAF.name, Literal("n")))
+    g.add((MO.Track, SKOS.prefLabel, Literal("Track")))
+    g.add((MO.Track, URIRef(searchindex.EOLAS_HAS_CATEGORY), category))
+    track = URIRef("http://example.com/track/1")
+    g.add((track, RDF.type, MO.Track))
+    for title in ["t2", "t1", "t3"]:
+        g.add((track, SKOS.prefLabel, Literal(title)))
+    for artist in ["Zed", "Amy", "Mo"]:
+        g.add((track, FOAF.maker, URIRef(f"https://media-metadata.l42.eu/search?p.artist={artist}")))
+    for i, album in enumerate(["Second", "First"]):
+        album_uri = URIRef(f"https://media-api.l42.eu/albums/{i}")
+        g.add((album_uri, SKOS.prefLabel, Literal(album)))
+        g.add((track, MMM.onAlbum, album_uri))
+    return (g, item, track)
+
+
+def test_graph_to_docs_keeps_graph_order_for_repeated_values():
+    (g, item, track) = _several_values_graph()
+    (items, tracks) = searchindex.graph_to_docs(g)
+    assert [d for d in items if d["id"] == str(item)] == [{
+        "id": str(item),
+        "type": "C",
+        "category": "Creative",
+        "pref_label": "x",
+        "labels": ["l3", "l1", "l4", "l2", "n"],
+        "description": None,
+        "lyrics": None,
+        "lang_family": None,
+        "origin": "https://eolas.l42.eu",
+        "types": ["C"],
+    }]
+    assert tracks == [{
+        "id": str(track),
+        "title": "t2",
+        "artist": ["Zed", "Amy", "Mo"],
+        "album": ["Second", "First"],
+    }]
+
+
+def test_graph_to_docs_builds_items_and_tracks():
+    g = _items_and_tracks_graph()
+    (items, tracks) = searchindex.graph_to_docs(g)
+    assert len(items) == 10
+    assert {d["offence"][0] for d in tracks} == {f"t{i}" for i in range(5)}
+    assert {d["soundtrack"][0] for d in tracks} == {f"s{i}" for i in range(5)}
+    assert all(d["album"] == ["Album"] for d in tracks)
+
+
+def test_graph_to_docs_reads_the_graph_in_one_pass():
+    """Every lookup is answered from the SubjectIndex — the Graph is probed once per subject."""
+    class CountingGraph(Graph):
+        probes = 0
+
+        def triples(self, pattern):
+            CountingGraph.probes += 1
+            return super().triples(pattern)
+
+    g = CountingGraph()
+    g += _items_and_tracks_graph()
+    CountingGraph.probes = 0
+    (items, tracks) = searchindex.graph_to_docs(g)
+    assert (len(items), len(tracks)) == (10, 5)
+    assert CountingGraph.probes == 1 + len(set(g.subjects()))
+
+
+def test_subject_index_answers_graph_lookups():
+    g = _films_graph(2)
+    index = searchindex.SubjectIndex(g)
+    film = URIRef("https://eolas.l42.eu/metadata/creativework/0/")
+    assert set(index.subjects()) == set(g.subjects())
+    assert list(index.objects(film, SKOS.prefLabel)) == list(g.objects(film, SKOS.prefLabel))
+    assert list(index.objects(URIRef("https://example.com/absent"), RDF.type)) == []
+    assert (film, SKOS.prefLabel, Literal("Film 0")) in index
+    assert (film, SKOS.prefLabel, Literal("Film 1")) not in index
+    assert get_label(index, film) == "Film 0"
+
+
 # ---------------------------------------------------------------------------
 # graph_to_typesense_docs — types[] field population
 # ---------------------------------------------------------------------------
@@ -1582,3 +1748,67 @@ def test_query_person_type_category_returns_none_when_only_non_english():
     type_label, cat_label = _query_person_type_category(session)
     assert type_label is None
     assert cat_label is None
+
+
+# ---------------------------------------------------------------------------
+# cleanup_searchindex — streamed export
+# ---------------------------------------------------------------------------
+
+def _two_node_client():
+    return typesense.Client({
+        "nodes": [
+            {"host": "search1", "port": "8108", "protocol": "http"},
+            {"host": "search2", "port": "8108", "protocol": "http"},
+        ],
+        "api_key": "test-key",
+        "retry_interval_seconds": 0,
+    })
+
+
+def _export_response(lines, status_code=200):
+    resp = MagicMock(status_code=status_code)
+    resp.__enter__.return_value = resp
+    resp.iter_lines.return_value = iter(lines)
+    return resp
+
+
+def test_get_all_doc_ids_streams_export():
+    """Document IDs are read from the export line by line, never as one string."""
+    resp = _export_response([b'{"id": "a"}', b"", b'{"id": "b"}'])
+    with patch.object(searchindex.requests, "get", return_value=resp) as mock_get:
+        ids = searchindex._get_all_doc_ids("items")
+    assert ids == {"a", "b"}
+    assert mock_get.call_args.args[0] == "http://search:8108/collections/items/documents/export"
+    assert mock_get.call_args.kwargs["stream"] is True
+    assert mock_get.call_args.kwargs["params"] == {"include_fields": "id"}
+    assert mock_get.call_args.kwargs["headers"]["X-TYPESENSE-API-KEY"] == searchindex.KEY_LUCOS_ARACHNE
+    resp.__exit__.assert_called_once()
+
+
+def test_get_all_doc_ids_fails_over_to_next_node():
+    """A node that is down or answers 5xx is marked unhealthy and the export retried on the next node."""
+    import requests
+    client = _two_node_client()
+    responses = [requests.ConnectionError("down"), _export_response([], 503), _export_response([b'{"id": "a"}'])]
+    with patch.object(searchindex, "typesense_client", client), \
+         patch.object(searchindex.requests, "get", side_effect=responses) as mock_get:
+        assert searchindex._get_all_doc_ids("items") == {"a"}
+    hosts = [c.args[0].split("/")[2] for c in mock_get.call_args_list]
+    assert hosts == ["search1:8108", "search2:8108", "search1:8108"]
+
+
+def test_get_all_doc_ids_gives_up_after_client_retries():
+    import requests
+    client = _two_node_client()
+    with patch.object(searchindex, "typesense_client", client), \
+         patch.object(searchindex.requests, "get", side_effect=requests.ConnectionError("down")) as mock_get:
+        with pytest.raises(requests.ConnectionError):
+            searchindex._get_all_doc_ids("items")
+    assert mock_get.call_count == client.config.num_retries + 1
+
+
+def test_cleanup_searchindex_deletes_docs_missing_from_export():
+    with patch.object(searchindex, "_get_all_doc_ids", side_effect=[{"a", "stale"}, {"t"}]), \
+         patch.object(searchindex, "typesense_client") as client:
+        searchindex.cleanup_searchindex({"a"}, {"t"})
+    client.collections["items"].documents.__getitem__.assert_called_once_with("stale")
@@ -1,5 +1,4 @@
 """Tests for skolemise.py — blank-node Skolemisation."""
-import logging
 
 import pytest
 from rdflib import BNode, Graph, Literal, URIRef
@@ -241,14 +240,6 @@ def _make_cyclic_graph() -> Graph:
     return g
 
 
-def test_cycle_detection_logs_warning(caplog):
-    """Blank-node cycles log a warning."""
-    g = _make_cyclic_graph()
-    with caplog.at_level(logging.WARNING, logger="skolemise"):
-        skolemise_graph(g)
-    assert any("cycle" in msg.lower() for msg in caplog.messages)
-
-
 def test_cycle_detection_does_not_raise():
     """Blank-node cycles are handled gracefully — no exception is raised."""
     g = _make_cyclic_graph()
@@ -265,23 +256,140 @@ def test_cycle_detection_produces_skolem_uris():
         assert not isinstance(o, BNode), f"Expected no BNode, got {o!r}"
 
 
-def test_cycle_detection_non_deterministic(caplog):
+def test_cyclic_blank_nodes_are_deterministic():
     """
-    Cyclic blank nodes produce non-deterministic Skolem URIs — two calls over the
-    same cyclic graph yield different URIs (UUID-based, not hash-based).
+    Cyclic blank nodes get the same Skolem URIs on every run, including when the
+    graph is re-parsed with fresh blank-node identifiers, so unchanged data gives
+    an unchanged triple set.
+    """
+    g = _make_cyclic_graph()
+    lead = BNode()
+    g.add((ex("t"), ex("p"), lead))
+    g.add((lead, ex("into"), BNode("b0")))
+    g += _make_festival_graph()
+    reparsed = Graph().parse(data=g.serialize(format="nt"), format="nt")
+    assert set(skolemise_graph(g)) == set(skolemise_graph(g)) == set(skolemise_graph(reparsed))
+
+
+def test_cyclic_blank_nodes_get_distinct_uris():
+    """Each blank node in a cycle keeps its own URI, even where the cycle is symmetric."""
+    g = Graph()
+    b0, b1, b2 = BNode(), BNode(), BNode()
+    g.add((b0, ex("next"), b1))
+    g.add((b1, ex("next"), b2))
+    g.add((b2, ex("next"), b0))
+    result = skolemise_graph(g)
+    assert len(result) == 3
+    assert len(set(result.subjects())) == 3
+    assert set(skolemise_graph(g)) == set(result)
+
 
-    This is a probabilistic test: with 128 bits of randomness the probability of a
-    false pass is negligible.
+def test_indistinguishable_cycles_label_the_same_however_parsed():
     """
+    Rings which colour refinement can't tell apart get the same Skolem URIs
+    whatever order the triples arrive in, and so whatever blank node IDs the
+    parser hands out.
+    """
+    import random
+    lines = []
+    for (ring, size) in enumerate([4, 3, 6]):
+        for i in range(size):
+            lines.append(f'_:r{ring}n{i} <http://example.com/next> _:r{ring}n{(i + 1) % size} .')
+            lines.append(f'_:r{ring}n{i} <http://example.com/label> "x" .')
+    results = set()
+    for seed in range(20):
+        random.Random(seed).shuffle(lines)
+        parsed = Graph().parse(data="\n".join(lines) + "\n", format="nt")
+        results.add(frozenset(skolemise_graph(parsed)))
+    assert len(results) == 1
+    (result,) = results
+    assert len({term for triple in result for term in triple if str(term).startswith(SKOLEM_PREFIX)}) == 13
+
+
+def test_many_interchangeable_cycles_stay_distinct_and_stable():
+    """Identical cycles under the same parent each keep their own URIs, the same on every parse."""
+    import random
+    lines = []
+    for i in range(30):
+        lines.append(f'<{EX}x> <{EX}p> _:a{i} .')
+        lines.append(f'_:a{i} <{EX}next> _:b{i} .')
+        lines.append(f'_:b{i} <{EX}next> _:a{i} .')
+    results = set()
+    for seed in range(3):
+        random.Random(seed).shuffle(lines)
+        results.add(frozenset(skolemise_graph(Graph().parse(data="\n".join(lines) + "\n", format="nt"))))
+    assert len(results) == 1
+    (result,) = results
+    assert len(result) == 90
+    assert len({s for (s, _, _) in result}) == 61
+
+
+def test_identical_cycles_under_different_parents_stay_distinct():
+    """Two cycles of the same shape hanging off different URIs don't merge."""
+    g = Graph()
+    for parent in ("x", "y"):
+        b0, b1 = BNode(), BNode()
+        g.add((ex(parent), ex("p"), b0))
+        g.add((b0, ex("next"), b1))
+        g.add((b1, ex("next"), b0))
+    result = skolemise_graph(g)
+    assert len(result) == len(g)
+    assert set(result.objects(ex("x"), ex("p"))) != set(result.objects(ex("y"), ex("p")))
+
+
+def test_cycle_change_changes_skolem_uris():
     g = _make_cyclic_graph()
-    with caplog.at_level(logging.WARNING, logger="skolemise"):
-        r1 = skolemise_graph(g)
-        r2 = skolemise_graph(g)
-    # The triples are structurally the same but the Skolem URIs differ
-    # (because they're UUID-based)
-    uris_1 = frozenset(str(s) for s, _, _ in r1 if str(s).startswith(SKOLEM_PREFIX))
-    uris_2 = frozenset(str(s) for s, _, _ in r2 if str(s).startswith(SKOLEM_PREFIX))
-    assert uris_1 != uris_2
+    before = set(skolemise_graph(g))
+    g.add((BNode("b1"), ex("label"), Literal("changed")))
+    after = set(skolemise_graph(g))
+    assert before.isdisjoint(after)
+
+
+def test_blank_node_leading_to_cycle_keeps_tree_hashes_elsewhere():
+    """A cycle elsewhere in the graph doesn't change the Skolem URIs of unrelated trees."""
+    tree = _make_festival_graph()
+    g = _make_cyclic_graph()
+    g += tree
+    festival = {t for t in skolemise_graph(g) if t[0] == ex("Festival")}
+    assert festival == {t for t in skolemise_graph(tree) if t[0] == ex("Festival")}
+
+
+# ---------------------------------------------------------------------------
+# Deep and shared nesting
+# ---------------------------------------------------------------------------
+
+def _make_chain_graph(depth: int) -> Graph:
+    g = Graph()
+    parent = ex("root")
+    for i in range(depth):
+        b = BNode()
+        g.add((parent, ex("next"), b))
+        g.add((b, ex("value"), Literal(i)))
+        parent = b
+    return g
+
+
+def test_deep_blank_node_chain_does_not_hit_recursion_limit():
+    """Hashing is iterative, so nesting far deeper than the recursion limit still works."""
+    g = _make_chain_graph(5000)
+    result = skolemise_graph(g)
+    assert len(result) == len(g)
+    assert set(skolemise_graph(g)) == set(result)
+
+
+def test_shared_blank_node_child_gets_one_uri():
+    """A blank node reached from two parents is hashed once and gets one Skolem URI in both triples."""
+    g = Graph()
+    shared = BNode()
+    for name in ("a", "b"):
+        b = BNode()
+        g.add((ex(name), ex("p"), b))
+        g.add((b, ex("child"), shared))
+    g.add((shared, ex("value"), Literal("leaf")))
+    result = skolemise_graph(g)
+    children = set(result.objects(None, ex("child")))
+    assert len(children) == 1
+    assert str(next(iter(children))).startswith(SKOLEM_PREFIX)
 
 
 # ---------------------------------------------------------------------------
@@ -305,3 +413,51 @@ def test_triple_count_unchanged_nested():
     g.add((ex("s"), ex("q"), Literal("extra")))
     result = skolemise_graph(g)
     assert len(result) == len(g)
+
+
+# ---------------------------------------------------------------------------
+# SkolemisingGraph — Skolemisation while parsing
+# ---------------------------------------------------------------------------
+
+@pytest.mark.parametrize("fmt", ["turtle", "xml", "nt", "n3", "json-ld"])
+def test_skolemising_graph_matches_skolemise_graph(fmt):
+    """Parsing into a SkolemisingGraph gives the same triples as Skolemising a parsed copy."""
+    from skolemise import SkolemisingGraph
+    g = _make_festival_graph()
+    g.add((ex("Festival"), ex("name"), Literal("Fest")))
+    g += _make_cyclic_graph()
+    data = g.serialize(format=fmt)
+    parsed = SkolemisingGraph().parse(data=data, format=fmt)
+    assert skolemise_graph(parsed) is parsed
+    assert set(parsed) == set(skolemise_graph(Graph().parse(data=data, format=fmt)))
+
+
+def test_skolemising_graph_holds_back_only_blank_node_triples():
+    from skolemise import SkolemisingGraph
+    g = SkolemisingGraph()
+    b = BNode()
+    g.add((ex("s"), ex("p"), Literal("x")))
+    g.add((ex("s"), ex("q"), b))
+    g.add((b, ex("r"), Literal("y")))
+    assert set(g) == {(ex("s"), ex("p"), Literal("x"))}
+    g.skolemise()
+    assert len(g) == 3
+    assert not any(isinstance(term, BNode) for triple in g for term in triple)
+
+
+def test_skolemising_graph_hashes_a_repeated_triple_once():
+    """A payload which repeats a blank-node triple is Skolemised as the deduplicated graph is."""
+    from skolemise import SkolemisingGraph
+    data = "\n".join([
+        '<http://example.com/s> <http://example.com/q> _:a .',
+        '_:a <http://example.com/r> "y" .',
+        '_:a <http://example.com/r> "y" .',
+        '<http://example.com/s> <http://example.com/q> _:a .',
+        '_:a <http://example.com/next> _:b .',
+        '_:b <http://example.com/next> _:a .',
+        '_:b <http://example.com/next> _:a .',
+    ]) + "\n"
+    parsed = SkolemisingGraph().parse(data=data, format="nt")
+    skolemise_graph(parsed)
+    assert set(parsed) == set(skolemise_graph(Graph().parse(data=data, format="nt")))
+    assert len(parsed) == 4
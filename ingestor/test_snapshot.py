@@ -0,0 +1,118 @@
+"""Tests for snapshot.py — on-disk snapshots of committed source graphs."""
+import os
+
+import pytest
+
+import snapshot
+from snapshot import SourceSnapshot, invalidate
+
+GRAPH = "https://example.com/graph"
+LINES = [
+    "<https://example.com/a> <https://example.com/p> \"x\" .\n",
+    "<https://example.com/b> <https://example.com/p> <https://example.com/a> .\n",
+]
+
+
+@pytest.fixture(autouse=True)
+def snapshot_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "SNAPSHOT_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _committed(lines=LINES, new_hash="sha256:1"):
+    s = SourceSnapshot(GRAPH, None, new_hash)
+    s.record(lines)
+    s.commit()
+    return s
+
+
+def test_record_and_commit_roundtrip():
+    _committed()
+    s = SourceSnapshot(GRAPH, "sha256:1", "sha256:2")
+    assert list(s.previous_lines()) == LINES
+    assert s.verified
+
+
+def test_pending_snapshot_is_not_read_before_commit():
+    SourceSnapshot(GRAPH, None, "sha256:1").record(LINES)
+    assert SourceSnapshot(GRAPH, "sha256:1", "sha256:2").previous_lines() is None
+
+
+def test_snapshot_for_other_hash_is_ignored():
+    _committed()
+    assert SourceSnapshot(GRAPH, "sha256:other", "sha256:2").previous_lines() is None
+
+
+def test_no_committed_hash_means_no_snapshot():
+    _committed()
+    assert SourceSnapshot(GRAPH, None, "sha256:2").previous_lines() is None
+
+
+def test_corrupt_snapshot_fails_verification():
+    _committed()
+    path = snapshot._path(GRAPH) + snapshot.LINES_EXT
+    with open(path, encoding="utf-8") as f:
+        content = f.read()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content.replace('"x"', '"y"'))
+    s = SourceSnapshot(GRAPH, "sha256:1", "sha256:2")
+    list(s.previous_lines())
+    assert not s.verified
+
+
+def test_discard_removes_pending_file(snapshot_dir):
+    s = SourceSnapshot(GRAPH, None, "sha256:1")
+    s.record(LINES)
+    s.discard()
+    assert os.listdir(snapshot_dir) == []
+
+
+def test_invalidate_removes_snapshot():
+    _committed()
+    invalidate(GRAPH)
+    assert SourceSnapshot(GRAPH, "sha256:1", "sha256:2").previous_lines() is None
+
+
+def test_invalidation_during_run_blocks_commit():
+    _committed()
+    s = SourceSnapshot(GRAPH, "sha256:1", "sha256:2")
+    s.record(LINES[:1])
+    invalidate(GRAPH)
+    s.commit()
+    assert SourceSnapshot(GRAPH, "sha256:2", "sha256:3").previous_lines() is None
+
+
+def test_invalidation_before_run_does_not_block_commit():
+    invalidate(GRAPH)
+    os.utime(snapshot._path(GRAPH) + ".invalidated", (0, 0))
+    _committed()
+    assert list(SourceSnapshot(GRAPH, "sha256:1", "sha256:2").previous_lines()) == LINES
+
+
+def test_fingerprints_roundtrip():
+    s = SourceSnapshot(GRAPH, None, "sha256:1")
+    s.record(LINES, {"<https://example.com/a>": "f1", "<https://example.com/b>": "f2"})
+    s.commit()
+    assert SourceSnapshot(GRAPH, "sha256:1", "sha256:2").previous_fingerprints() == {
+        "<https://example.com/a>": "f1", "<https://example.com/b>": "f2"}
+    assert SourceSnapshot(GRAPH, "sha256:other", "sha256:2").previous_fingerprints() is None
+
+
+def test_corrupt_fingerprints_are_ignored():
+    s = SourceSnapshot(GRAPH, None, "sha256:1")
+    s.record(LINES, {"<https://example.com/a>": "f1"})
+    s.commit()
+    path = snapshot._path(GRAPH) + snapshot.FINGERPRINTS_EXT
+    with open(path, encoding="utf-8") as f:
+        content = f.read()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content.replace("f1", "f9"))
+    assert SourceSnapshot(GRAPH, "sha256:1", "sha256:2").previous_fingerprints() is None
+
+
+def test_invalidate_removes_fingerprints():
+    s = SourceSnapshot(GRAPH, None, "sha256:1")
+    s.record(LINES, {"<https://example.com/a>": "f1"})
+    s.commit()
+    invalidate(GRAPH)
+    assert SourceSnapshot(GRAPH, "sha256:1", "sha256:2").previous_fingerprints() is None
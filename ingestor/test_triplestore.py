@@ -3,6 +3,7 @@ import hashlib
 import os
 os.environ.setdefault("KEY_LUCOS_ARACHNE", "test-key")
 
+import pytest
 from unittest.mock import MagicMock, patch, call
 import triplestore
 
@@ -170,6 +171,82 @@ def test_set_source_hash_targets_update_endpoint():
     assert url == "http://triplestore:3030/raw_arachne/update"
 
 
+def test_set_source_hash_without_validators_leaves_them_alone():
+    """set_source_hash without validators does not touch the validator predicates."""
+    with patch.object(triplestore.session, "post", return_value=_mock_ok_response()) as mock_post:
+        triplestore.set_source_hash("https://example.com/graph", "sha256:deadbeef")
+    sparql = mock_post.call_args.kwargs["data"]
+    for pred in triplestore.VALIDATOR_PREDS.values():
+        assert pred not in sparql
+
+
+def test_set_source_hash_with_validators_writes_them_in_same_update():
+    """Validators are replaced in the same SPARQL Update as the hash."""
+    validators = {"etag": '"abc"', "last_modified": "Wed, 01 Jan 2025 00:00:00 GMT"}
+    with patch.object(triplestore.session, "post", return_value=_mock_ok_response()) as mock_post:
+        triplestore.set_source_hash("https://example.com/graph", "sha256:deadbeef", validators)
+    assert mock_post.call_count == 1
+    sparql = mock_post.call_args.kwargs["data"]
+    assert "sha256:deadbeef" in sparql
+    assert f'<{triplestore.VALIDATOR_PREDS["etag"]}> "\\"abc\\""' in sparql
+    assert "Wed, 01 Jan 2025 00:00:00 GMT" in sparql
+
+
+def test_set_source_hash_with_empty_validators_clears_them():
+    """An empty validators dict deletes stale validators without inserting any."""
+    with patch.object(triplestore.session, "post", return_value=_mock_ok_response()) as mock_post:
+        triplestore.set_source_hash("https://example.com/graph", "sha256:deadbeef", {})
+    sparql = mock_post.call_args.kwargs["data"]
+    assert triplestore.VALIDATOR_PREDS["etag"] in sparql
+    assert sparql.count("INSERT DATA") == 1
+
+
+def test_get_source_metadata_single_query_for_all_graphs():
+    """All hashes and validators are fetched with one VALUES-driven query."""
+    uris = ["https://example.com/a", "https://example.com/b", "https://example.com/c"]
+    bindings = [
+        {"g": {"value": uris[0]}, "pred": {"value": triplestore.LAST_PAYLOAD_HASH_PRED}, "value": {"value": "sha256:aaa"}},
+        {"g": {"value": uris[0]}, "pred": {"value": triplestore.VALIDATOR_PREDS["etag"]}, "value": {"value": '"abc"'}},
+        {"g": {"value": uris[1]}, "pred": {"value": triplestore.LAST_PAYLOAD_HASH_PRED}, "value": {"value": "sha256:bbb"}},
+    ]
+    with patch.object(triplestore.session, "post", return_value=_sparql_response(bindings)) as mock_post:
+        hashes, validators = triplestore.get_source_metadata(uris)
+    assert mock_post.call_count == 1
+    query = mock_post.call_args.kwargs["data"]["query"]
+    assert "VALUES ?g" in query
+    for uri in uris:
+        assert f"<{uri}>" in query
+    assert hashes == {uris[0]: "sha256:aaa", uris[1]: "sha256:bbb"}
+    assert validators == {uris[0]: {"etag": '"abc"'}, uris[1]: {}, uris[2]: {}}
+
+
+def test_get_source_metadata_no_query_for_empty_list():
+    with patch.object(triplestore.session, "post") as mock_post:
+        assert triplestore.get_source_metadata([]) == ({}, {})
+    mock_post.assert_not_called()
+
+
+def test_source_hash_update_matches_set_source_hash():
+    """source_hash_update builds the same update set_source_hash sends, without sending it."""
+    validators = {"etag": '"abc"'}
+    with patch.object(triplestore.session, "post", return_value=_mock_ok_response()) as mock_post:
+        update = triplestore.source_hash_update("https://example.com/graph", "sha256:deadbeef", validators)
+        mock_post.assert_not_called()
+        triplestore.set_source_hash("https://example.com/graph", "sha256:deadbeef", validators)
+    assert mock_post.call_args.kwargs["data"] == update
+
+
+def test_clear_source_hash_deletes_hash_and_validators():
+    with patch.object(triplestore.session, "post", return_value=_mock_ok_response()) as mock_post:
+        triplestore.clear_source_hash("https://example.com/graph")
+    assert mock_post.call_args.args[0] == "http://triplestore:3030/raw_arachne/update"
+    sparql = mock_post.call_args.kwargs["data"]
+    assert triplestore.LAST_PAYLOAD_HASH_PRED in sparql
+    for pred in triplestore.VALIDATOR_PREDS.values():
+        assert pred in sparql
+    assert "INSERT" not in sparql
+
+
 # ---------------------------------------------------------------------------
 # metadata graph allow-list
 # ---------------------------------------------------------------------------
@@ -226,17 +303,21 @@ def _mock_construct_response(nt_content: str):
     resp.ok = True
     resp.raise_for_status = MagicMock()
     resp.text = nt_content
+    resp.iter_lines.side_effect = lambda: iter(nt_content.encode("utf-8").splitlines())
     return resp
 
 
 def _call_diff(new_ttl: str, old_nt: str):
-    """Helper: call diff_graph_in_triplestore with Turtle new content and N-Triples old graph."""
+    """
+    Helper: call diff_graph_in_triplestore with Turtle new content and N-Triples
+    old graph, returning the fragment rendered as text (or None).
+    """
     responses = [_mock_construct_response(old_nt)]
     with patch.object(triplestore.session, "post", side_effect=responses) as mock_post:
         fragment = triplestore.diff_graph_in_triplestore(
             _GRAPH_URI, new_ttl, "text/turtle"
         )
-    return fragment, mock_post
+    return (str(fragment) if fragment is not None else None), mock_post
 
 
 # --- Unchanged graph → empty diff ---
@@ -257,6 +338,45 @@ def test_diff_unchanged_graph_sends_construct_query():
     assert _GRAPH_URI in query
 
 
+def test_diff_accepts_binary_file():
+    """A spooled binary body (as returned by fetch_source) diffs the same as a string."""
+    import io
+    nt = _to_nt(_TTL_B)
+    body = io.BytesIO(_TTL_A.encode("utf-8"))
+    body.read()  # leave the file positioned at the end; diff must rewind it
+    fragment_from_file, _ = _call_diff(body, nt)
+    fragment_from_str, _ = _call_diff(_TTL_A, nt)
+    assert sorted(fragment_from_file.splitlines()) == sorted(fragment_from_str.splitlines())
+    assert "o1" in fragment_from_file
+
+
+def test_diff_accepts_parsed_graph_without_modifying_it():
+    """A plain pre-parsed Graph diffs the same as its source text and is left un-Skolemised."""
+    from rdflib import Graph
+    graph = Graph().parse(data=_TTL_BNODE, format="turtle")
+    before = set(graph)
+    fragment_from_graph, _ = _call_diff(graph, "")
+    fragment_from_str, _ = _call_diff(_TTL_BNODE, "")
+    assert sorted(fragment_from_graph.splitlines()) == sorted(fragment_from_str.splitlines())
+    assert set(graph) == before
+
+
+def test_parse_graph_skolemises_while_parsing():
+    """parse_graph's Graph is already Skolemised, so the diff uses it rather than a copy."""
+    from rdflib import BNode
+    graph = triplestore.parse_graph(_TTL_BNODE, "text/turtle")
+    assert not any(isinstance(term, BNode) for triple in graph for term in triple)
+    assert triplestore.skolemise_graph(graph) is graph
+
+
+def test_parse_graph_json_ld():
+    graph = triplestore.parse_graph(
+        '{"@id": "https://example.com/s", "https://example.com/p": {"@id": "https://example.com/o"}}',
+        "application/ld+json",
+    )
+    assert len(graph) == 1
+
+
 # --- All-new graph (empty store) → INSERT only ---
 
 def test_diff_all_new_returns_insert_data():
@@ -373,6 +493,428 @@ def test_diff_multi_statement_separator():
     assert ";" in fragment
 
 
+def test_diff_fragment_matches_rdflib_ntriples_serialisation():
+    """UpdateFragment renders each triple exactly as rdflib's N-Triples serialiser does."""
+    from rdflib import Graph, Literal, URIRef
+    from rdflib.namespace import XSD
+    g = Graph()
+    s = URIRef("https://example.com/s")
+    p = URIRef("https://example.com/p")
+    g.add((s, p, Literal('line one\nline "two" \\ back\r')))
+    g.add((s, p, Literal("bonjour", lang="fr")))
+    g.add((s, p, Literal("2024-01-01", datatype=XSD.date)))
+    g.add((s, p, URIRef("https://example.com/o")))
+    fragment = triplestore.UpdateFragment([("INSERT DATA", _GRAPH_URI, g)])
+    body = str(fragment)
+    assert body.startswith(f"INSERT DATA {{\n  GRAPH <{_GRAPH_URI}> {{\n")
+    assert body.endswith("  }\n}")
+    lines = body.splitlines()[2:-2]
+    assert sorted(lines) == sorted(g.serialize(format="nt").strip().splitlines())
+
+
+def test_diff_fragment_holds_lines_rendered_once():
+    """Each triple is rendered to its N-Triples line once, by the diff; sending the fragment renders nothing more."""
+    responses = [_mock_construct_response("")]
+    with patch.object(triplestore.session, "post", side_effect=responses), \
+         patch.object(triplestore, "_nt_line", wraps=triplestore._nt_line) as nt_line:
+        fragment = triplestore.diff_graph_in_triplestore(_GRAPH_URI, _TTL_A, "text/turtle")
+        assert nt_line.call_count == 2
+        str(fragment)
+        assert nt_line.call_count == 2
+    assert all(isinstance(row, str) for row in fragment.parts[0][2])
+
+
+def test_diff_matches_old_lines_in_any_escaping():
+    """Old triples are compared by canonical line, so Fuseki's escaping of a literal doesn't matter."""
+    old = '<https://example.com/s> <https://example.com/p> "caf\\u00E9" .\n'
+    ttl = '<https://example.com/s> <https://example.com/p> "caf\u00e9" .'
+    with patch.object(triplestore.session, "post", side_effect=[_mock_construct_response(old)]):
+        assert triplestore.diff_graph_in_triplestore(_GRAPH_URI, ttl, "text/turtle") is None
+
+
+def test_construct_is_streamed_and_read_by_line():
+    """The CONSTRUCT is requested as a stream and read with iter_lines, never as one string."""
+    resp = _mock_construct_response('<https://example.com/s> <https://example.com/p> "old" .\n')
+    type(resp).text = property(lambda self: pytest.fail("response text read"))
+    with patch.object(triplestore.session, "post", return_value=resp) as mock_post:
+        fragment = triplestore.diff_graph_in_triplestore(_GRAPH_URI, _TTL_A, "text/turtle")
+    assert mock_post.call_args.kwargs["stream"] is True
+    resp.close.assert_called_once()
+    assert fragment.parts[1] == ("DELETE DATA", _GRAPH_URI, {'<https://example.com/s> <https://example.com/p> "old" .\n'})
+
+
+def test_construct_with_invalid_line_raises():
+    from rdflib.plugins.parsers.ntriples import ParseError
+    with patch.object(triplestore.session, "post", return_value=_mock_construct_response("<not n-triples\n")):
+        with pytest.raises(ParseError):
+            triplestore.diff_graph_in_triplestore(_GRAPH_URI, _TTL_A, "text/turtle")
+
+
+# ---------------------------------------------------------------------------
+# stage_large_fragment
+# ---------------------------------------------------------------------------
+
+def _triples(n, start=0):
+    from rdflib import Literal, URIRef
+    return [(URIRef(f"https://example.com/s{i}"), URIRef("https://example.com/p"), Literal(f"v{i}", lang="en"))
+            for i in range(start, start + n)]
+
+
+def test_stage_leaves_small_fragments_alone(monkeypatch):
+    """Fragments at or under the threshold are returned unchanged, with no writes."""
+    monkeypatch.setenv("INGEST_STAGED_COMMIT_THRESHOLD", "10")
+    fragment = triplestore.UpdateFragment([("INSERT DATA", _GRAPH_URI, _triples(10))])
+    with patch.object(triplestore, "execute_sparql_update") as mock_exec:
+        assert triplestore.stage_large_fragment(fragment) is fragment
+        assert triplestore.stage_large_fragment(None) is None
+    mock_exec.assert_not_called()
+
+
+def test_stage_writes_bounded_chunks_and_returns_publish_fragment(monkeypatch):
+    """Large fragments are written in STAGING_CHUNK_TRIPLES batches; the result only publishes."""
+    monkeypatch.setenv("INGEST_STAGED_COMMIT_THRESHOLD", "10")
+    monkeypatch.setattr(triplestore, "STAGING_CHUNK_TRIPLES", 4)
+    fragment = triplestore.UpdateFragment([("INSERT DATA", _GRAPH_URI, _triples(11))])
+    with patch.object(triplestore, "execute_sparql_update") as mock_exec:
+        staged = triplestore.stage_large_fragment(fragment)
+    assert mock_exec.call_count == 3
+    for c in mock_exec.call_args_list:
+        assert f"GRAPH <{triplestore.STAGING_GRAPH_PREFIX}" in c.args[0]
+    publish = str(staged)
+    assert staged.triple_count == 0
+    assert "v1" not in publish
+    assert f"INSERT {{ GRAPH <{_GRAPH_URI}> {{ ?s ?p ?o }} }}" in publish
+    assert publish.splitlines()[-1].startswith(f"DROP SILENT GRAPH <{triplestore.STAGING_GRAPH_PREFIX}")
+
+
+def test_staged_threshold_falls_back_on_bad_values(monkeypatch):
+    """Invalid or non-positive INGEST_STAGED_COMMIT_THRESHOLD values use the default."""
+    for value in ("lots", "0", "-5"):
+        monkeypatch.setenv("INGEST_STAGED_COMMIT_THRESHOLD", value)
+        assert triplestore.staged_commit_threshold() == triplestore.DEFAULT_STAGED_COMMIT_THRESHOLD
+
+
+def test_staged_publish_applies_diff_atomically_against_standin(monkeypatch):
+    """Staging then publishing gives the same graph as a direct update, and leaves no staging graph."""
+    from rdflib import Graph, Literal, URIRef
+    from rdflib.namespace import XSD
+    from triplestore_standin import TriplestoreStandin
+    standin = TriplestoreStandin()
+    old = Graph()
+    for triple in _triples(6):
+        old.add(triple)
+    standin.load(_GRAPH_URI, old)
+    new = Graph()
+    for triple in _triples(6, start=3):
+        new.add(triple)
+    new.add((URIRef("https://example.com/d"), URIRef("https://example.com/p"), Literal("2024-01-01", datatype=XSD.date)))
+    new.add((URIRef("https://example.com/q"), URIRef("https://example.com/p"), Literal('say "hi"\nthere')))
+
+    monkeypatch.setattr(triplestore, "session", standin)
+    monkeypatch.setenv("INGEST_STAGED_COMMIT_THRESHOLD", "2")
+    monkeypatch.setattr(triplestore, "STAGING_CHUNK_TRIPLES", 2)
+    fragment = triplestore.diff_graph_in_triplestore(_GRAPH_URI, new, "text/turtle")
+    staged = triplestore.stage_large_fragment(fragment)
+    assert staged is not fragment
+    # Before publishing, the live graph is untouched and nothing new shows in the union
+    assert set(standin.graph(_GRAPH_URI)) == set(old)
+    union = standin.post("http://triplestore:3030/arachne/sparql",
+        data={"query": "ASK { <https://example.com/d> ?p ?o }"}).json()["boolean"]
+    assert union is False
+
+    triplestore.execute_sparql_update([staged, "INSERT DATA { GRAPH <urn:meta> { <urn:a> <urn:b> <urn:c> } }"])
+    assert set(standin.graph(_GRAPH_URI)) == set(new)
+    assert [g for g in standin.dataset.graphs() if str(g.identifier).startswith(triplestore.STAGING_GRAPH_PREFIX) and len(g)] == []
+
+
+def test_staged_migration_keeps_delete_where_before_insert(monkeypatch):
+    """On the blank-node migration path, the DELETE WHERE still runs before the staged INSERT."""
+    from rdflib import BNode, Graph, Literal, URIRef
+    from triplestore_standin import TriplestoreStandin
+    standin = TriplestoreStandin()
+    old = Graph()
+    old.add((URIRef("https://example.com/s"), URIRef("https://example.com/p"), BNode()))
+    standin.load(_GRAPH_URI, old)
+    monkeypatch.setattr(triplestore, "session", standin)
+    monkeypatch.setenv("INGEST_STAGED_COMMIT_THRESHOLD", "1")
+    staged = triplestore.stage_large_fragment(triplestore.diff_graph_in_triplestore(_GRAPH_URI, _TTL_A, "text/turtle"))
+    assert str(staged).startswith("DELETE WHERE")
+    triplestore.execute_sparql_update(staged)
+    objects = {str(o) for o in standin.graph(_GRAPH_URI).objects()}
+    assert objects == {"https://example.com/o1", "https://example.com/o2"}
+
+
+def _staging_graphs(standin):
+    return [g for g in standin.dataset.graphs() if str(g.identifier).startswith(triplestore.STAGING_GRAPH_PREFIX) and len(g)]
+
+
+def test_drop_staging_graphs_removes_unpublished_staging(monkeypatch):
+    """A staged fragment that is never applied can have its staging graph dropped; other fragments are ignored."""
+    from triplestore_standin import TriplestoreStandin
+    standin = TriplestoreStandin()
+    monkeypatch.setattr(triplestore, "session", standin)
+    monkeypatch.setenv("INGEST_STAGED_COMMIT_THRESHOLD", "2")
+    staged = triplestore.stage_large_fragment(triplestore.UpdateFragment([("INSERT DATA", _GRAPH_URI, _triples(3))]))
+    assert len(_staging_graphs(standin)) == 1
+    triplestore.drop_staging_graphs([staged, "DROP GRAPH <urn:other>", None])
+    assert _staging_graphs(standin) == []
+    assert len(standin.graph(_GRAPH_URI)) == 0
+
+
+def test_stage_drops_staging_graph_when_staging_fails(monkeypatch):
+    from triplestore_standin import TriplestoreStandin
+    standin = TriplestoreStandin()
+    monkeypatch.setattr(triplestore, "session", standin)
+    monkeypatch.setenv("INGEST_STAGED_COMMIT_THRESHOLD", "2")
+    monkeypatch.setattr(triplestore, "STAGING_CHUNK_TRIPLES", 2)
+    execute = triplestore.execute_sparql_update
+    calls = []
+    def fail_second_chunk(update):
+        calls.append(update)
+        if len(calls) == 2:
+            raise Exception("Fuseki error")
+        execute(update)
+    monkeypatch.setattr(triplestore, "execute_sparql_update", fail_second_chunk)
+    with pytest.raises(Exception):
+        triplestore.stage_large_fragment(triplestore.UpdateFragment([("INSERT DATA", _GRAPH_URI, _triples(5))]))
+    assert calls[-1].startswith("DROP SILENT GRAPH")
+    assert _staging_graphs(standin) == []
+
+
+def test_server_side_diff_drops_staging_graph_when_upload_fails(monkeypatch):
+    standin = _server_diff_standin(monkeypatch, [])
+    standin.fail_next(500, endpoint="data")
+    with patch.object(triplestore, "execute_sparql_update") as mock_exec:
+        with pytest.raises(Exception):
+            triplestore.diff_graph_in_triplestore(_GRAPH_URI, _TTL_A, "text/turtle")
+    assert mock_exec.call_args.args[0].startswith(f"DROP SILENT GRAPH <{triplestore.STAGING_GRAPH_PREFIX}")
+
+
+# ---------------------------------------------------------------------------
+# Server-side diff engine
+# ---------------------------------------------------------------------------
+
+def test_diff_engine_defaults_to_local(monkeypatch):
+    monkeypatch.delenv("INGEST_DIFF_ENGINE", raising=False)
+    assert triplestore.diff_engine() == "local"
+    monkeypatch.setenv("INGEST_DIFF_ENGINE", "Server")
+    assert triplestore.diff_engine() == "server"
+    monkeypatch.setenv("INGEST_DIFF_ENGINE", "quantum")
+    assert triplestore.diff_engine() == "local"
+
+
+def _server_diff_standin(monkeypatch, old_triples):
+    from rdflib import Graph
+    from triplestore_standin import TriplestoreStandin
+    standin = TriplestoreStandin()
+    old = Graph()
+    for triple in old_triples:
+        old.add(triple)
+    standin.load(_GRAPH_URI, old)
+    monkeypatch.setattr(triplestore, "session", standin)
+    monkeypatch.setenv("INGEST_DIFF_ENGINE", "server")
+    return standin
+
+
+def test_server_side_diff_never_downloads_old_graph(monkeypatch):
+    """The server engine uploads the new content and asks whether it differs, without fetching the old graph."""
+    standin = _server_diff_standin(monkeypatch, _triples(5))
+    fragment = triplestore.diff_graph_in_triplestore(_GRAPH_URI, _TTL_A, "text/turtle")
+    assert standin.calls == {"raw_arachne/data": 1, "raw_arachne/sparql": 1}
+    assert fragment.triple_count == 0
+    # Staged statements are reified, so nothing new appears in the union yet
+    ask = standin.post("http://triplestore:3030/arachne/sparql",
+        data={"query": "ASK { <https://example.com/s> ?p ?o }"}).json()["boolean"]
+    assert ask is False
+
+
+def test_server_side_diff_brings_graph_in_line_with_new_content(monkeypatch):
+    """Publishing the fragment leaves exactly the new triples, and drops the staging graph."""
+    from rdflib import Graph, Literal, URIRef
+    from rdflib.namespace import XSD
+    standin = _server_diff_standin(monkeypatch, _triples(6))
+    new = Graph()
+    for triple in _triples(6, start=3):
+        new.add(triple)
+    new.add((URIRef("https://example.com/d"), URIRef("https://example.com/p"), Literal("2024-01-01", datatype=XSD.date)))
+    new.add((URIRef("https://example.com/q"), URIRef("https://example.com/p"), Literal('say "hi"\nthere')))
+    fragment = triplestore.diff_graph_in_triplestore(_GRAPH_URI, new, "text/turtle")
+    triplestore.execute_sparql_update(fragment)
+    assert set(standin.graph(_GRAPH_URI)) == set(new)
+    assert [g for g in standin.dataset.graphs() if str(g.identifier).startswith(triplestore.STAGING_GRAPH_PREFIX) and len(g)] == []
+
+
+@pytest.mark.parametrize("new_triples", [_triples(3), _triples(4), _triples(2), _triples(3, start=1)])
+def test_server_side_diff_reports_whether_anything_changed(monkeypatch, new_triples):
+    """An unchanged graph gives None and leaves no staging graph; any difference gives a fragment."""
+    from rdflib import Graph
+    standin = _server_diff_standin(monkeypatch, _triples(3))
+    new = Graph()
+    for triple in new_triples:
+        new.add(triple)
+    fragment = triplestore.diff_graph_in_triplestore(_GRAPH_URI, new, "text/turtle")
+    staged = [g for g in standin.dataset.graphs() if str(g.identifier).startswith(triplestore.STAGING_GRAPH_PREFIX) and len(g)]
+    if new_triples == _triples(3):
+        assert fragment is None
+        assert staged == []
+    else:
+        assert fragment is not None
+        assert len(staged) == 1
+
+
+def test_server_side_diff_drops_staging_graph_when_comparison_fails(monkeypatch):
+    standin = _server_diff_standin(monkeypatch, [])
+    standin.fail_next(500, endpoint="sparql")
+    with pytest.raises(Exception):
+        triplestore.diff_graph_in_triplestore(_GRAPH_URI, _TTL_A, "text/turtle")
+    assert [g for g in standin.dataset.graphs() if str(g.identifier).startswith(triplestore.STAGING_GRAPH_PREFIX) and len(g)] == []
+
+
+def test_server_side_diff_migrates_blank_nodes(monkeypatch):
+    """Old blank-node triples never match staged Skolemised ones, so they are deleted."""
+    from rdflib import BNode, URIRef
+    old = [(URIRef("https://example.com/s"), URIRef("https://example.com/p"), BNode())]
+    standin = _server_diff_standin(monkeypatch, old)
+    triplestore.execute_sparql_update(triplestore.diff_graph_in_triplestore(_GRAPH_URI, _TTL_BNODE, "text/turtle"))
+    graph = standin.graph(_GRAPH_URI)
+    assert len(graph) == 3
+    assert not any(isinstance(term, BNode) for triple in graph for term in triple)
+
+
+def test_server_side_diff_raises_when_upload_fails(monkeypatch):
+    standin = _server_diff_standin(monkeypatch, [])
+    standin.fail_next(500, endpoint="data")
+    with pytest.raises(Exception):
+        triplestore.diff_graph_in_triplestore(_GRAPH_URI, _TTL_A, "text/turtle")
+
+
+# ---------------------------------------------------------------------------
+# Diffing against a local snapshot
+# ---------------------------------------------------------------------------
+
+def test_merge_diff_of_sorted_lines():
+    (to_insert, to_delete) = triplestore._merge_diff(["a\n", "c\n", "e\n"], ["b\n", "c\n", "f\n", "g\n"])
+    assert to_insert == ["b\n", "f\n", "g\n"]
+    assert to_delete == ["a\n", "e\n"]
+
+
+def _snapshot_standin(monkeypatch, tmp_path, old_triples):
+    from rdflib import Graph
+    import snapshot
+    from triplestore_standin import TriplestoreStandin
+    monkeypatch.setattr(snapshot, "SNAPSHOT_DIR", str(tmp_path))
+    standin = TriplestoreStandin()
+    standin.load(_GRAPH_URI, Graph())
+    monkeypatch.setattr(triplestore, "session", standin)
+    # First run: no snapshot yet, so the diff goes through a CONSTRUCT
+    first = snapshot.SourceSnapshot(_GRAPH_URI, None, "sha256:1")
+    old = Graph()
+    for triple in old_triples:
+        old.add(triple)
+    triplestore.execute_sparql_update(triplestore.diff_graph_in_triplestore(_GRAPH_URI, old, "text/turtle", snapshot=first))
+    first.commit()
+    standin.calls.clear()
+    return standin
+
+
+def test_snapshot_diff_skips_construct(monkeypatch, tmp_path):
+    """With a committed snapshot, the diff needs no query, and applying it gives the new graph."""
+    from rdflib import Graph
+    import snapshot
+    standin = _snapshot_standin(monkeypatch, tmp_path, _triples(6))
+    new = Graph()
+    for triple in _triples(6, start=3):
+        new.add(triple)
+    fragment = triplestore.diff_graph_in_triplestore(
+        _GRAPH_URI, new, "text/turtle", snapshot=snapshot.SourceSnapshot(_GRAPH_URI, "sha256:1", "sha256:2"))
+    assert standin.calls == {}
+    assert fragment.triple_count == 6
+    triplestore.execute_sparql_update(fragment)
+    assert set(standin.graph(_GRAPH_URI)) == set(new)
+
+
+def test_snapshot_with_stale_hash_falls_back_to_construct(monkeypatch, tmp_path):
+    from rdflib import Graph
+    import snapshot
+    standin = _snapshot_standin(monkeypatch, tmp_path, _triples(3))
+    fragment = triplestore.diff_graph_in_triplestore(
+        _GRAPH_URI, Graph(), "text/turtle", snapshot=snapshot.SourceSnapshot(_GRAPH_URI, "sha256:other", "sha256:2"))
+    assert standin.calls == {"raw_arachne/sparql": 1}
+    assert fragment.triple_count == 3
+
+
+def test_corrupt_snapshot_falls_back_to_construct(monkeypatch, tmp_path):
+    from rdflib import Graph
+    import snapshot
+    standin = _snapshot_standin(monkeypatch, tmp_path, _triples(3))
+    path = snapshot._path(_GRAPH_URI) + snapshot.LINES_EXT
+    with open(path, encoding="utf-8") as f:
+        content = f.read()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content.replace("s1", "s9"))
+    fragment = triplestore.diff_graph_in_triplestore(
+        _GRAPH_URI, Graph(), "text/turtle", snapshot=snapshot.SourceSnapshot(_GRAPH_URI, "sha256:1", "sha256:2"))
+    assert standin.calls == {"raw_arachne/sparql": 1}
+    assert fragment.triple_count == 3
+
+
+def test_subject_fingerprints_group_sorted_lines():
+    lines = sorted(triplestore._nt_line(t) for t in _triples(2) + _triples(1, start=10))
+    fingerprints = triplestore._subject_fingerprints(lines)
+    assert set(fingerprints) == {"<https://example.com/s0>", "<https://example.com/s1>", "<https://example.com/s10>"}
+    assert fingerprints == triplestore._subject_fingerprints(lines)
+
+
+def test_fingerprint_diff_fetches_only_changed_subjects(monkeypatch, tmp_path):
+    """With one subject of many changed, only that subject's triples are fetched and diffed."""
+    from rdflib import Graph, Literal, URIRef
+    import snapshot
+    standin = _snapshot_standin(monkeypatch, tmp_path, _triples(30))
+    new = Graph()
+    for triple in _triples(30):
+        new.add(triple)
+    changed = URIRef("https://example.com/s7")
+    new.set((changed, URIRef("https://example.com/p"), Literal("changed")))
+    with patch.object(standin, "post", wraps=standin.post) as post:
+        fragment = triplestore.diff_graph_in_triplestore(
+            _GRAPH_URI, new, "text/turtle", snapshot=snapshot.SourceSnapshot(_GRAPH_URI, "sha256:1", "sha256:2"))
+    assert post.call_count == 1
+    assert "VALUES ?s { <https://example.com/s7> }" in post.call_args.kwargs["data"]["query"]
+    assert fragment.triple_count == 2
+    triplestore.execute_sparql_update(fragment)
+    assert set(standin.graph(_GRAPH_URI)) == set(new)
+
+
+def test_fingerprint_diff_of_unchanged_graph_makes_no_requests(monkeypatch, tmp_path):
+    from rdflib import Graph
+    import snapshot
+    standin = _snapshot_standin(monkeypatch, tmp_path, _triples(5))
+    new = Graph()
+    for triple in _triples(5):
+        new.add(triple)
+    fragment = triplestore.diff_graph_in_triplestore(
+        _GRAPH_URI, new, "text/turtle", snapshot=snapshot.SourceSnapshot(_GRAPH_URI, "sha256:1", "sha256:2"))
+    assert fragment is None
+    assert standin.calls == {}
+
+
+def test_webhook_write_invalidates_snapshot(monkeypatch, tmp_path):
+    from rdflib import Graph
+    import snapshot
+    standin = _snapshot_standin(monkeypatch, tmp_path, _triples(3))
+    triplestore.delete_item_in_triplestore("https://example.com/s1", _GRAPH_URI)
+    fragment = triplestore.diff_graph_in_triplestore(
+        _GRAPH_URI, Graph(), "text/turtle", snapshot=snapshot.SourceSnapshot(_GRAPH_URI, "sha256:1", "sha256:2"))
+    assert standin.calls["raw_arachne/sparql"] == 1
+    assert fragment.triple_count == 2
+
+
+def test_staged_statement_accepts_lines():
+    """Snapshot diffs hold N-Triples lines; they stage the same as the triples they came from."""
+    (triple,) = _triples(1)
+    assert triplestore._staged_statement("urn:x", triplestore._nt_line(triple)) == triplestore._staged_statement("urn:x", triple)
+
+
 # ---------------------------------------------------------------------------
 # execute_sparql_update
 # ---------------------------------------------------------------------------
@@ -393,6 +935,35 @@ def test_execute_sparql_update_sets_content_type():
     assert ct == "application/sparql-update"
 
 
+def test_execute_sparql_update_streams_list_joined_with_semicolons():
+    """A list of updates is sent as one streamed body, joined with ' ;'."""
+    from rdflib import URIRef
+    triple = (URIRef("https://example.com/s"), URIRef("https://example.com/p"), URIRef("https://example.com/o"))
+    fragment = triplestore.UpdateFragment([
+        "DELETE WHERE { ?s ?p ?o }",
+        ("INSERT DATA", _GRAPH_URI, [triple]),
+    ])
+    with patch.object(triplestore.session, "post", return_value=_mock_ok_response()) as mock_post:
+        triplestore.execute_sparql_update([fragment, "HASH-UPDATE"])
+    data = mock_post.call_args.kwargs["data"]
+    assert not isinstance(data, (str, bytes))
+    assert b"".join(data).decode("utf-8") == f"{fragment} ;\nHASH-UPDATE"
+
+
+def test_execute_sparql_update_streams_in_bounded_chunks():
+    """Large updates are sent in pieces of about UPDATE_CHUNK_SIZE, not as one block."""
+    from rdflib import Literal, URIRef
+    triples = [(URIRef(f"https://example.com/s{i}"), URIRef("https://example.com/p"), Literal("x" * 50)) for i in range(200)]
+    fragment = triplestore.UpdateFragment([("INSERT DATA", _GRAPH_URI, triples)])
+    with patch.object(triplestore, "UPDATE_CHUNK_SIZE", 1000), \
+         patch.object(triplestore.session, "post", return_value=_mock_ok_response()) as mock_post:
+        triplestore.execute_sparql_update(fragment)
+        chunks = list(mock_post.call_args.kwargs["data"])
+    assert len(chunks) > 10
+    assert all(len(chunk) < 1200 for chunk in chunks)
+    assert b"".join(chunks).decode("utf-8") == str(fragment)
+
+
 def test_execute_sparql_update_raises_on_error():
     """execute_sparql_update propagates triplestore errors."""
     mock_resp = MagicMock()
@@ -419,7 +990,7 @@ def _no_bindings_response():
 
 
 def _empty_inferred_hash():
-    """SHA-256 hash of the empty turtle content produced when there are no inferred triples."""
+    """SHA-256 hash of the empty set of lines produced when there are no inferred triples."""
     return "sha256:" + hashlib.sha256("".encode("utf-8")).hexdigest()
 
 
@@ -434,7 +1005,7 @@ def test_compute_inferences_skips_all_writes_when_hash_matches():
     with (
         patch.object(triplestore.session, "post", return_value=_no_bindings_response()),
         patch.object(triplestore, "get_source_hash", return_value=_empty_inferred_hash()),
-        patch.object(triplestore, "diff_graph_in_triplestore") as mock_diff,
+        patch.object(triplestore, "diff_lines_in_triplestore") as mock_diff,
         patch.object(triplestore, "execute_sparql_update") as mock_exec,
         patch.object(triplestore, "set_source_hash") as mock_set,
     ):
@@ -449,32 +1020,32 @@ def test_compute_inferences_skips_all_writes_when_hash_matches():
 def test_compute_inferences_calls_diff_on_hash_mismatch():
     """
     When the stored hash does not match the computed hash, compute_inferences
-    calls diff_graph_in_triplestore with the inferred graph URI and turtle content.
+    calls diff_lines_in_triplestore with the inferred graph URI and its N-Triples lines.
 
     This is Approach 1: the diff narrows writes to the minimal change set.
     """
     with (
         patch.object(triplestore.session, "post", return_value=_no_bindings_response()),
         patch.object(triplestore, "get_source_hash", return_value="sha256:stale"),
-        patch.object(triplestore, "diff_graph_in_triplestore", return_value=None) as mock_diff,
+        patch.object(triplestore, "diff_lines_in_triplestore", return_value=None) as mock_diff,
         patch.object(triplestore, "execute_sparql_update"),
         patch.object(triplestore, "set_source_hash"),
     ):
         triplestore.compute_inferences()
 
-    mock_diff.assert_called_once_with(triplestore.INFERRED_GRAPH, "", "text/turtle")
+    mock_diff.assert_called_once_with(triplestore.INFERRED_GRAPH, set())
 
 
 def test_compute_inferences_executes_fragment_when_diff_has_changes():
     """
-    When diff_graph_in_triplestore returns a non-None fragment, compute_inferences
+    When diff_lines_in_triplestore returns a non-None fragment, compute_inferences
     calls execute_sparql_update with that fragment.
     """
     fragment = "INSERT DATA { GRAPH <urn:lucos:inferred> { <ex:s> <ex:p> <ex:o> . } }"
     with (
         patch.object(triplestore.session, "post", return_value=_no_bindings_response()),
         patch.object(triplestore, "get_source_hash", return_value="sha256:stale"),
-        patch.object(triplestore, "diff_graph_in_triplestore", return_value=fragment),
+        patch.object(triplestore, "diff_lines_in_triplestore", return_value=fragment),
         patch.object(triplestore, "execute_sparql_update") as mock_exec,
         patch.object(triplestore, "set_source_hash"),
     ):
@@ -485,13 +1056,13 @@ def test_compute_inferences_executes_fragment_when_diff_has_changes():
 
 def test_compute_inferences_skips_execute_when_diff_is_none():
     """
-    When diff_graph_in_triplestore returns None (triples already in sync),
+    When diff_lines_in_triplestore returns None (triples already in sync),
     compute_inferences does NOT call execute_sparql_update.
     """
     with (
         patch.object(triplestore.session, "post", return_value=_no_bindings_response()),
         patch.object(triplestore, "get_source_hash", return_value="sha256:stale"),
-        patch.object(triplestore, "diff_graph_in_triplestore", return_value=None),
+        patch.object(triplestore, "diff_lines_in_triplestore", return_value=None),
         patch.object(triplestore, "execute_sparql_update") as mock_exec,
         patch.object(triplestore, "set_source_hash"),
     ):
@@ -502,13 +1073,13 @@ def test_compute_inferences_skips_execute_when_diff_is_none():
 
 def test_compute_inferences_updates_hash_after_diff():
     """
-    After calling diff_graph_in_triplestore (whether fragment is None or not),
+    After calling diff_lines_in_triplestore (whether fragment is None or not),
     compute_inferences stores the new content hash via set_source_hash.
     """
     with (
         patch.object(triplestore.session, "post", return_value=_no_bindings_response()),
         patch.object(triplestore, "get_source_hash", return_value="sha256:stale"),
-        patch.object(triplestore, "diff_graph_in_triplestore", return_value=None),
+        patch.object(triplestore, "diff_lines_in_triplestore", return_value=None),
         patch.object(triplestore, "execute_sparql_update"),
         patch.object(triplestore, "set_source_hash") as mock_set,
     ):
@@ -523,7 +1094,7 @@ def test_compute_inferences_returns_true_when_diff_has_changes():
     with (
         patch.object(triplestore.session, "post", return_value=_no_bindings_response()),
         patch.object(triplestore, "get_source_hash", return_value="sha256:stale"),
-        patch.object(triplestore, "diff_graph_in_triplestore", return_value=fragment),
+        patch.object(triplestore, "diff_lines_in_triplestore", return_value=fragment),
         patch.object(triplestore, "execute_sparql_update"),
         patch.object(triplestore, "set_source_hash"),
     ):
@@ -537,7 +1108,7 @@ def test_compute_inferences_returns_false_when_diff_is_none():
     with (
         patch.object(triplestore.session, "post", return_value=_no_bindings_response()),
         patch.object(triplestore, "get_source_hash", return_value="sha256:stale"),
-        patch.object(triplestore, "diff_graph_in_triplestore", return_value=None),
+        patch.object(triplestore, "diff_lines_in_triplestore", return_value=None),
         patch.object(triplestore, "execute_sparql_update"),
         patch.object(triplestore, "set_source_hash"),
     ):
@@ -556,52 +1127,46 @@ _URI_A    = "https://example.com/agent/alice"
 _URI_B    = "https://example.com/agent/bob"
 
 
-def _sym_prop_response(prop_uris):
-    """Mock SPARQL SELECT response listing symmetric property URIs."""
+def _schema_response(transitive=(), inverse=(), symmetric=()):
+    """Mock response to the schema query in compute_inferences()."""
+    bindings = (
+        [{"kind": {"value": triplestore.OWL_TRANSITIVE}, "p": {"value": p}} for p in transitive]
+        + [{"kind": {"value": triplestore.OWL_INVERSE_OF}, "p": {"value": p1}, "p2": {"value": p2}} for p1, p2 in inverse]
+        + [{"kind": {"value": triplestore.OWL_SYMMETRIC}, "p": {"value": p}} for p in symmetric]
+    )
     resp = MagicMock()
     resp.ok = True
     resp.raise_for_status = MagicMock()
-    resp.json.return_value = {"results": {"bindings": [{"p": {"value": p}} for p in prop_uris]}}
+    resp.json.return_value = {"results": {"bindings": bindings}}
     return resp
 
 
-def _pairs_response(pairs):
-    """Mock SPARQL SELECT response for (s, o) pairs."""
+def _edges_response(edges):
+    """Mock response to the edges query, from {prop: [(s, o), …]}."""
     resp = MagicMock()
     resp.ok = True
     resp.raise_for_status = MagicMock()
-    resp.json.return_value = {
-        "results": {"bindings": [{"s": {"value": s}, "o": {"value": o}} for s, o in pairs]}
-    }
+    resp.json.return_value = {"results": {"bindings": [
+        {"s": {"value": s}, "p": {"value": p}, "o": {"value": o}}
+        for p, pairs in edges.items() for s, o in pairs
+    ]}}
     return resp
 
 
 def _side_effects_for_symmetric(sym_props, prop_pairs, sameAs_pairs=None):
     """
     Return the session.post side_effect list for compute_inferences() when
-    transitive and inverse passes find nothing, there is one declared symmetric
-    property (sym_props), and owl:sameAs has sameAs_pairs (default empty).
+    there are no transitive or inverse properties, the declared symmetric
+    properties are sym_props with pairs prop_pairs (one list per property), and
+    owl:sameAs has sameAs_pairs (default empty).
 
     Call sequence inside compute_inferences():
-      [0] transitive props SELECT      → no bindings
-      [1] inverse prop pairs SELECT    → no bindings
-      [2] symmetric props SELECT       → sym_props list
-      [3..] pair queries per prop (declared props first, then OWL_SAME_AS if not declared)
+      [0] schema SELECT  → sym_props
+      [1] edges SELECT   → the pairs of every symmetric property, owl:sameAs included
     """
-    if sameAs_pairs is None:
-        sameAs_pairs = []
-    responses = [
-        _no_bindings_response(),   # transitive props
-        _no_bindings_response(),   # inverse prop pairs
-        _sym_prop_response(sym_props),
-    ]
-    # pair query for each declared symmetric prop
-    for pairs in prop_pairs:
-        responses.append(_pairs_response(pairs))
-    # pair query for OWL_SAME_AS (always appended unless already declared)
-    if triplestore.OWL_SAME_AS not in sym_props:
-        responses.append(_pairs_response(sameAs_pairs))
-    return responses
+    edges = dict(zip(sym_props, prop_pairs))
+    edges.setdefault(triplestore.OWL_SAME_AS, sameAs_pairs or [])
+    return [_schema_response(symmetric=sym_props), _edges_response(edges)]
 
 
 def test_compute_inferences_symmetric_property_generates_reverse_triple():
@@ -617,8 +1182,8 @@ def test_compute_inferences_symmetric_property_generates_reverse_triple():
     with (
         patch.object(triplestore.session, "post", side_effect=side_effects),
         patch.object(triplestore, "get_source_hash", return_value="sha256:stale"),
-        patch.object(triplestore, "diff_graph_in_triplestore",
-                     side_effect=lambda g, content, ct: captured.update({"content": content}) or None),
+        patch.object(triplestore, "diff_lines_in_triplestore",
+                     side_effect=lambda g, lines: captured.update({"content": "".join(sorted(lines))}) or None),
         patch.object(triplestore, "execute_sparql_update"),
         patch.object(triplestore, "set_source_hash"),
     ):
@@ -644,8 +1209,8 @@ def test_compute_inferences_sameAs_always_treated_as_symmetric():
     with (
         patch.object(triplestore.session, "post", side_effect=side_effects),
         patch.object(triplestore, "get_source_hash", return_value="sha256:stale"),
-        patch.object(triplestore, "diff_graph_in_triplestore",
-                     side_effect=lambda g, content, ct: captured.update({"content": content}) or None),
+        patch.object(triplestore, "diff_lines_in_triplestore",
+                     side_effect=lambda g, lines: captured.update({"content": "".join(sorted(lines))}) or None),
         patch.object(triplestore, "execute_sparql_update"),
         patch.object(triplestore, "set_source_hash"),
     ):
@@ -668,8 +1233,8 @@ def test_compute_inferences_symmetric_idempotent():
     with (
         patch.object(triplestore.session, "post", side_effect=side_effects),
         patch.object(triplestore, "get_source_hash", return_value="sha256:stale"),
-        patch.object(triplestore, "diff_graph_in_triplestore",
-                     side_effect=lambda g, content, ct: captured.update({"content": content}) or None),
+        patch.object(triplestore, "diff_lines_in_triplestore",
+                     side_effect=lambda g, lines: captured.update({"content": "".join(sorted(lines))}) or None),
         patch.object(triplestore, "execute_sparql_update"),
         patch.object(triplestore, "set_source_hash"),
     ):
@@ -701,7 +1266,7 @@ def test_compute_inferences_symmetric_skips_literals_via_filter():
     with (
         patch.object(triplestore.session, "post", side_effect=capturing_post),
         patch.object(triplestore, "get_source_hash", return_value="sha256:stale"),
-        patch.object(triplestore, "diff_graph_in_triplestore", return_value=None),
+        patch.object(triplestore, "diff_lines_in_triplestore", return_value=None),
         patch.object(triplestore, "execute_sparql_update"),
         patch.object(triplestore, "set_source_hash"),
     ):
@@ -719,3 +1284,269 @@ def test_compute_inferences_owl_symmetric_and_sameAs_constants_defined():
     """OWL_SYMMETRIC and OWL_SAME_AS constants are defined with the correct URIs."""
     assert triplestore.OWL_SYMMETRIC == "http://www.w3.org/2002/07/owl#SymmetricProperty"
     assert triplestore.OWL_SAME_AS   == "http://www.w3.org/2002/07/owl#sameAs"
+
+
+# ---------------------------------------------------------------------------
+# compute_inferences — inputs fetched in two queries
+# ---------------------------------------------------------------------------
+
+_CONTAINED_IN = "https://example.com/prop/containedIn"
+_HAS_PART     = "https://example.com/prop/hasPart"
+_PART_OF      = "https://example.com/prop/partOf"
+
+
+def _run_inferences(responses):
+    """Run compute_inferences() against *responses*; return (queries sent, inferred content)."""
+    queries = []
+    captured = {}
+
+    def post(*args, **kwargs):
+        queries.append(kwargs["data"]["query"])
+        return responses.pop(0)
+
+    with (
+        patch.object(triplestore.session, "post", side_effect=post),
+        patch.object(triplestore, "get_source_hash", return_value="sha256:stale"),
+        patch.object(triplestore, "diff_lines_in_triplestore",
+                     side_effect=lambda g, lines: captured.update({"content": "".join(sorted(lines))}) or None),
+        patch.object(triplestore, "set_source_hash"),
+    ):
+        triplestore.compute_inferences()
+    return (queries, captured["content"])
+
+
+def test_compute_inferences_fetches_all_inputs_in_two_queries():
+    """One schema query and one edges query cover transitive, inverse and symmetric properties."""
+    responses = [
+        _schema_response(transitive=[_CONTAINED_IN], inverse=[(_HAS_PART, _PART_OF), (_PART_OF, _HAS_PART)],
+                         symmetric=[_SYM_PROP]),
+        _edges_response({
+            _CONTAINED_IN: [(_URI_A, _URI_B), (_URI_B, "https://example.com/c")],
+            _HAS_PART: [(_URI_A, _URI_B)],
+            _SYM_PROP: [(_URI_A, _URI_B)],
+        }),
+    ]
+    (queries, content) = _run_inferences(responses)
+    assert len(queries) == 2
+    for prop in (_CONTAINED_IN, _HAS_PART, _PART_OF, _SYM_PROP, triplestore.OWL_SAME_AS):
+        assert f"<{prop}>" in queries[1]
+    assert "VALUES ?p" in queries[1]
+    assert f"<{_URI_A}> <{_CONTAINED_IN}> <https://example.com/c> ." in content
+    assert f"<{_URI_B}> <{_PART_OF}> <{_URI_A}> ." in content
+    assert f"<{_URI_B}> <{_SYM_PROP}> <{_URI_A}> ." in content
+    assert content.count(f"<{_PART_OF}>") == 1
+
+
+def test_compute_inferences_partitions_edges_by_predicate():
+    """Pairs of one property don't leak into another's inferences."""
+    responses = [
+        _schema_response(transitive=[_CONTAINED_IN], symmetric=[_SYM_PROP]),
+        _edges_response({_CONTAINED_IN: [(_URI_A, _URI_B)], _SYM_PROP: [(_URI_B, "https://example.com/c")]}),
+    ]
+    (_, content) = _run_inferences(responses)
+    assert content == f"<https://example.com/c> <{_SYM_PROP}> <{_URI_B}> .\n"
+
+
+# ---------------------------------------------------------------------------
+# Incremental inference maintenance
+# ---------------------------------------------------------------------------
+
+_SCHEMA_GRAPH = "urn:example:schema"
+
+
+def _inference_standin(monkeypatch, direct, transitive=(), inverse=(), symmetric=()):
+    """A stand-in holding *direct* (a list of (s, p, o) URIs) plus a schema, with full inferences computed."""
+    from rdflib import Graph, URIRef
+    from rdflib.namespace import RDF
+    from triplestore_standin import TriplestoreStandin
+    standin = TriplestoreStandin()
+    schema = Graph()
+    for prop in transitive:
+        schema.add((URIRef(prop), RDF.type, URIRef(triplestore.OWL_TRANSITIVE)))
+    for prop in symmetric:
+        schema.add((URIRef(prop), RDF.type, URIRef(triplestore.OWL_SYMMETRIC)))
+    for p1, p2 in inverse:
+        schema.add((URIRef(p1), URIRef(triplestore.OWL_INVERSE_OF), URIRef(p2)))
+    standin.load(_SCHEMA_GRAPH, schema)
+    data = Graph()
+    for s, p, o in direct:
+        data.add((URIRef(s), URIRef(p), URIRef(o)))
+    standin.load(_GRAPH_URI, data)
+    monkeypatch.setattr(triplestore, "session", standin)
+    triplestore.compute_inferences()
+    return standin
+
+
+def _replace_direct(standin, remove=(), add=()):
+    from rdflib import URIRef
+    graph = standin.graph(_GRAPH_URI)
+    for s, p, o in remove:
+        graph.remove((URIRef(s), URIRef(p), URIRef(o)))
+    for s, p, o in add:
+        graph.add((URIRef(s), URIRef(p), URIRef(o)))
+
+
+def _assert_matches_full_recompute(standin):
+    """A full compute_inferences() after the incremental update finds nothing to change."""
+    inferred = set(standin.graph(triplestore.INFERRED_GRAPH))
+    assert triplestore.compute_inferences() is False
+    assert set(standin.graph(triplestore.INFERRED_GRAPH)) == inferred
+
+
+def test_update_inferences_for_items_transitive_matches_full_recompute(monkeypatch):
+    """Re-parenting one node updates the closure of it and everything below it, nothing else."""
+    c = lambda n: f"https://example.com/place/{n}"
+    standin = _inference_standin(monkeypatch, [
+        (c("street"), _CONTAINED_IN, c("town")),
+        (c("town"), _CONTAINED_IN, c("county")),
+        (c("county"), _CONTAINED_IN, c("country")),
+        (c("other"), _CONTAINED_IN, c("county")),
+        (c("village"), _CONTAINED_IN, c("elsewhere")),
+    ], transitive=[_CONTAINED_IN])
+    _replace_direct(standin,
+        remove=[(c("town"), _CONTAINED_IN, c("county"))],
+        add=[(c("town"), _CONTAINED_IN, c("elsewhere"))])
+    assert triplestore.update_inferences_for_items([c("town")]) is True
+    _assert_matches_full_recompute(standin)
+
+
+def test_update_inferences_for_items_reads_only_edges_near_the_items(monkeypatch):
+    """Transitive and subclass edges are walked out from the items in batches, never fetched store-wide."""
+    c = lambda n: f"https://example.com/place/{n}"
+    far = lambda n: f"https://example.com/far/{n}"
+    standin = _inference_standin(monkeypatch, [
+        (c("street"), _CONTAINED_IN, c("town")),
+        (c("lane"), _CONTAINED_IN, c("town")),
+        (c("town"), _CONTAINED_IN, c("county")),
+        (c("county"), _CONTAINED_IN, c("country")),
+        (far("1"), _CONTAINED_IN, far("2")),
+        (far("2"), _CONTAINED_IN, far("3")),
+        (far("film"), triplestore.RDF_TYPE, far("type")),
+        (far("type"), triplestore.RDFS_SUBCLASS_OF, far("supertype")),
+    ], transitive=[_CONTAINED_IN])
+    _replace_direct(standin,
+        remove=[(c("town"), _CONTAINED_IN, c("county"))],
+        add=[(c("town"), _CONTAINED_IN, c("country"))])
+    monkeypatch.setattr(triplestore, "INFERENCE_QUERY_BATCH", 1)
+    responses = []
+    post = standin.post
+    def recording_post(url, **kwargs):
+        resp = post(url, **kwargs)
+        responses.append(resp.text)
+        return resp
+    monkeypatch.setattr(standin, "post", recording_post)
+    assert triplestore.update_inferences_for_items([c("town")]) is True
+    assert not any(far("") in text for text in responses)
+    monkeypatch.setattr(standin, "post", post)
+    _assert_matches_full_recompute(standin)
+
+
+def test_update_inferences_for_items_inverse_and_symmetric_match_full_recompute(monkeypatch):
+    standin = _inference_standin(monkeypatch, [
+        (_URI_A, _HAS_PART, _URI_B),
+        (_URI_A, _SYM_PROP, _URI_B),
+        ("https://example.com/c", _HAS_PART, "https://example.com/d"),
+    ], inverse=[(_HAS_PART, _PART_OF)], symmetric=[_SYM_PROP])
+    _replace_direct(standin,
+        remove=[(_URI_A, _HAS_PART, _URI_B), (_URI_A, _SYM_PROP, _URI_B)],
+        add=[(_URI_A, _HAS_PART, "https://example.com/c"), (_URI_A, triplestore.OWL_SAME_AS, _URI_B)])
+    assert triplestore.update_inferences_for_items([_URI_A]) is True
+    _assert_matches_full_recompute(standin)
+
+
+def test_update_inferences_for_items_clears_inferred_hash(monkeypatch):
+    """The stored hash no longer describes the inferred graph, so the next full run must not skip its writes."""
+    standin = _inference_standin(monkeypatch, [(_URI_A, _SYM_PROP, _URI_B)], symmetric=[_SYM_PROP])
+    assert triplestore.get_source_hash(triplestore.INFERRED_GRAPH) is not None
+    _replace_direct(standin, remove=[(_URI_A, _SYM_PROP, _URI_B)])
+    triplestore.update_inferences_for_items([_URI_A])
+    assert triplestore.get_source_hash(triplestore.INFERRED_GRAPH) is None
+
+
+def test_update_inferences_for_items_makes_no_writes_when_unchanged(monkeypatch):
+    standin = _inference_standin(monkeypatch, [(_URI_A, _SYM_PROP, _URI_B)], symmetric=[_SYM_PROP])
+    standin.calls.clear()
+    assert triplestore.update_inferences_for_items([_URI_A]) is False
+    assert "raw_arachne/update" not in standin.calls
+
+
+def test_update_inferences_for_items_falls_back_when_scopes_overlap(monkeypatch):
+    """A property that is both transitive and symmetric can't be scoped locally; recompute everything."""
+    _inference_standin(monkeypatch, [(_URI_A, _SYM_PROP, _URI_B)], transitive=[_SYM_PROP], symmetric=[_SYM_PROP])
+    with patch.object(triplestore, "compute_inferences", return_value=True) as full:
+        assert triplestore.update_inferences_for_items([_URI_A]) is True
+    full.assert_called_once_with()
+
+
+def test_compute_inferences_diffs_lines_without_parsing(monkeypatch):
+    """The inferred edges are diffed as N-Triples lines: no Turtle is serialised or parsed back."""
+    from rdflib import URIRef
+    with patch.object(triplestore, "parse_graph", side_effect=AssertionError("parsed")):
+        standin = _inference_standin(monkeypatch, [(_URI_A, _SYM_PROP, _URI_B)], symmetric=[_SYM_PROP])
+    assert set(standin.graph(triplestore.INFERRED_GRAPH)) == {(URIRef(_URI_B), URIRef(_SYM_PROP), URIRef(_URI_A))}
+
+
+# ---------------------------------------------------------------------------
+# rdf:type over the rdfs:subClassOf hierarchy
+# ---------------------------------------------------------------------------
+
+_FILM_TYPE     = "https://eolas.l42.eu/metadata/creativeworktype/5/"
+_CREATIVE_WORK = "https://schema.org/CreativeWork"
+_THING         = "https://schema.org/Thing"
+_FILM          = "https://eolas.l42.eu/metadata/creativework/1/"
+
+
+def _inferred_types(standin):
+    from rdflib import URIRef
+    return {(str(s), str(o)) for s, o in standin.graph(triplestore.INFERRED_GRAPH).subject_objects(URIRef(triplestore.RDF_TYPE))}
+
+
+def test_compute_inferences_materialises_types_of_superclasses(monkeypatch):
+    standin = _inference_standin(monkeypatch, [
+        (_FILM, triplestore.RDF_TYPE, _FILM_TYPE),
+        (_FILM, triplestore.RDF_TYPE, _THING),
+        (_FILM_TYPE, triplestore.RDFS_SUBCLASS_OF, _CREATIVE_WORK),
+        (_CREATIVE_WORK, triplestore.RDFS_SUBCLASS_OF, _THING),
+        (_CREATIVE_WORK, triplestore.RDFS_SUBCLASS_OF, "urn:lucos:skolem:restriction"),
+    ])
+    # Asserted types aren't repeated, and anonymous restrictions aren't types
+    assert _inferred_types(standin) == {(_FILM, _CREATIVE_WORK)}
+
+
+def test_superclasses_handles_subclass_cycles():
+    superclasses = triplestore._superclasses([("urn:a", "urn:b"), ("urn:b", "urn:a"), ("urn:b", "urn:c")])
+    assert superclasses == {"urn:a": {"urn:b", "urn:c"}, "urn:b": {"urn:a", "urn:c"}}
+
+
+def test_update_inferences_for_items_retypes_instances_when_hierarchy_changes(monkeypatch):
+    """Moving a class in the hierarchy updates the inferred types of its instances and its subclasses' instances."""
+    short_film_type = "https://eolas.l42.eu/metadata/creativeworktype/6/"
+    short_film = "https://eolas.l42.eu/metadata/creativework/2/"
+    standin = _inference_standin(monkeypatch, [
+        (_FILM, triplestore.RDF_TYPE, _FILM_TYPE),
+        (short_film, triplestore.RDF_TYPE, short_film_type),
+        (short_film_type, triplestore.RDFS_SUBCLASS_OF, _FILM_TYPE),
+        (_FILM_TYPE, triplestore.RDFS_SUBCLASS_OF, _CREATIVE_WORK),
+    ])
+    assert (short_film, _CREATIVE_WORK) in _inferred_types(standin)
+    _replace_direct(standin,
+        remove=[(_FILM_TYPE, triplestore.RDFS_SUBCLASS_OF, _CREATIVE_WORK)],
+        add=[(_FILM_TYPE, triplestore.RDFS_SUBCLASS_OF, _THING)])
+    assert triplestore.update_inferences_for_items([_FILM_TYPE]) is True
+    assert _inferred_types(standin) == {(_FILM, _THING), (short_film, _FILM_TYPE), (short_film, _THING)}
+    _assert_matches_full_recompute(standin)
+
+
+def test_update_inferences_for_items_retypes_changed_item(monkeypatch):
+    other = "https://eolas.l42.eu/metadata/creativework/3/"
+    standin = _inference_standin(monkeypatch, [
+        (_FILM, triplestore.RDF_TYPE, _FILM_TYPE),
+        (other, triplestore.RDF_TYPE, _FILM_TYPE),
+        (_FILM_TYPE, triplestore.RDFS_SUBCLASS_OF, _CREATIVE_WORK),
+    ])
+    _replace_direct(standin,
+        remove=[(_FILM, triplestore.RDF_TYPE, _FILM_TYPE)],
+        add=[(_FILM, triplestore.RDF_TYPE, _CREATIVE_WORK)])
+    assert triplestore.update_inferences_for_items([_FILM]) is True
+    assert _inferred_types(standin) == {(other, _CREATIVE_WORK)}
+    _assert_matches_full_recompute(standin)
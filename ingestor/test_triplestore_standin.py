@@ -0,0 +1,249 @@
+"""Tests for triplestore_standin.py — the in-memory Fuseki stand-in."""
+import os
+import time
+
+os.environ.setdefault("KEY_LUCOS_ARACHNE", "test")
+
+import pytest
+import requests
+from rdflib import Graph, Literal, URIRef
+
+import triplestore
+from triplestore_standin import StandinServer, TriplestoreStandin
+
+EX = "https://example.com/"
+RAW = "http://triplestore:3030/raw_arachne"
+
+
+def _graph(*triples) -> Graph:
+    g = Graph()
+    for (s, p, o) in triples:
+        g.add((URIRef(EX + s), URIRef(EX + p), o if isinstance(o, Literal) else URIRef(EX + o)))
+    return g
+
+
+@pytest.fixture
+def standin():
+    s = TriplestoreStandin()
+    s.load(EX + "graph1", _graph(("a", "p", Literal("x"))))
+    s.load(EX + "graph2", _graph(("b", "p", "a")))
+    return s
+
+
+@pytest.fixture
+def server(standin):
+    with StandinServer(standin) as srv:
+        yield srv
+
+
+@pytest.fixture
+def session(server):
+    return server.mount(requests.Session())
+
+
+# ---------------------------------------------------------------------------
+# Query and update
+# ---------------------------------------------------------------------------
+
+def test_select_without_graph_sees_union_of_named_graphs(standin):
+    resp = standin.post(f"{RAW}/sparql", data={"query": "SELECT ?s WHERE { ?s ?p ?o }"})
+    assert resp.ok
+    assert {b["s"]["value"] for b in resp.json()["results"]["bindings"]} == {EX + "a", EX + "b"}
+
+
+def test_select_with_graph_is_restricted_to_that_graph(standin):
+    resp = standin.post(f"{RAW}/sparql", data={"query": f"SELECT ?s WHERE {{ GRAPH <{EX}graph2> {{ ?s ?p ?o }} }}"})
+    assert [b["s"]["value"] for b in resp.json()["results"]["bindings"]] == [EX + "b"]
+
+
+def test_construct_returns_ntriples_when_asked(standin):
+    resp = standin.post(f"{RAW}/sparql", headers={"Accept": "application/n-triples"},
+        data={"query": f"CONSTRUCT {{ ?s ?p ?o }} WHERE {{ GRAPH <{EX}graph2> {{ ?s ?p ?o }} }}"})
+    assert resp.headers["Content-Type"] == "application/n-triples"
+    assert resp.text.strip() == f"<{EX}b> <{EX}p> <{EX}a> ."
+
+
+def test_update_applies_to_named_graph(standin):
+    resp = standin.post(f"{RAW}/update", headers={"Content-Type": "application/sparql-update"},
+        data=f"DROP GRAPH <{EX}graph1>")
+    assert resp.status_code == 204
+    assert len(standin.graph(EX + "graph1")) == 0
+    assert len(standin.graph(EX + "graph2")) == 1
+
+
+def test_update_is_not_offered_on_read_endpoint(standin):
+    resp = standin.post("http://triplestore:3030/arachne/update", data=f"DROP GRAPH <{EX}graph1>")
+    assert resp.status_code == 404
+    assert len(standin.graph(EX + "graph1")) == 1
+
+
+def test_data_blocks_apply_in_order_without_sparql_translation(standin, monkeypatch):
+    """UpdateFragment data blocks are parsed as N-Triples; the SPARQL around them still runs, in order."""
+    sparql = []
+    update = standin.dataset.update
+    monkeypatch.setattr(standin.dataset, "update", lambda text: (sparql.append(text), update(text)))
+    fragment = triplestore.UpdateFragment([
+        f"DROP GRAPH <{EX}graph2>",
+        ("DELETE DATA", EX + "graph1", _graph(("a", "p", Literal("x")))),
+        ("INSERT DATA", EX + "graph1", _graph(("a", "p", Literal("y\n  }\n}")), ("a", "q", "b"))),
+        ("INSERT DATA", EX + "graph2", Graph()),
+        f"INSERT DATA {{ GRAPH <{EX}graph2> {{ <{EX}b> <{EX}p> \"z\" }} }}",
+    ])
+    resp = standin.post(f"{RAW}/update", headers={"Content-Type": "application/sparql-update"}, data=str(fragment))
+    assert resp.status_code == 204
+    assert set(standin.graph(EX + "graph1")) == set(_graph(("a", "p", Literal("y\n  }\n}")), ("a", "q", "b")))
+    assert set(standin.graph(EX + "graph2")) == set(_graph(("b", "p", Literal("z"))))
+    assert sparql == [f"DROP GRAPH <{EX}graph2>", f"INSERT DATA {{ GRAPH <{EX}graph2> {{ <{EX}b> <{EX}p> \"z\" }} }}"]
+
+
+@pytest.mark.parametrize("update", [
+    f"DELETE DATA {{ GRAPH <{EX}graph1> {{ _:b <{EX}p> \"x\" }} }}",
+    f"INSERT DATA {{ GRAPH <{EX}graph1> <{EX}a> <{EX}q> <{EX}b> . }}",
+    f"PREFIX ex <{EX}> INSERT DATA {{ GRAPH <{EX}graph1> {{ <{EX}a> <{EX}q> <{EX}b> . }} }}",
+])
+def test_invalid_update_is_rejected_and_not_applied(standin, update):
+    """Updates Fuseki would refuse are a 400 here too, even when laid out like a data block."""
+    fragment = triplestore.UpdateFragment([
+        ("INSERT DATA", EX + "graph2", _graph(("c", "p", "a"))),
+        update,
+    ])
+    resp = standin.post(f"{RAW}/update", headers={"Content-Type": "application/sparql-update"}, data=str(fragment))
+    assert resp.status_code == 400
+    assert set(standin.graph(EX + "graph1")) == set(_graph(("a", "p", Literal("x"))))
+    assert set(standin.graph(EX + "graph2")) == set(_graph(("b", "p", "a")))
+
+
+def test_fast_updates_skip_validation():
+    standin = TriplestoreStandin(fast_updates=True)
+    standin.load(EX + "graph1", _graph(("a", "p", Literal("x"))))
+    fragment = triplestore.UpdateFragment([("DELETE DATA", EX + "graph1", _graph(("a", "p", Literal("x"))))])
+    resp = standin.post(f"{RAW}/update", headers={"Content-Type": "application/sparql-update"},
+        data=str(fragment).replace(f"<{EX}a>", "_:a"))
+    assert resp.status_code == 204
+
+
+def test_bad_query_is_a_400(standin):
+    resp = standin.post(f"{RAW}/sparql", data={"query": "NOT SPARQL"})
+    assert resp.status_code == 400
+    with pytest.raises(requests.HTTPError):
+        resp.raise_for_status()
+
+
+# ---------------------------------------------------------------------------
+# Graph store protocol
+# ---------------------------------------------------------------------------
+
+def test_gsp_post_adds_and_put_replaces(standin):
+    turtle = f"<{EX}c> <{EX}p> <{EX}d> ."
+    resp = standin.post(f"{RAW}/data", params={"graph": EX + "graph1"},
+        headers={"Content-Type": "text/turtle"}, data=turtle)
+    assert resp.json()["tripleCount"] == 1
+    assert len(standin.graph(EX + "graph1")) == 2
+
+    resp = standin.request("PUT", f"{RAW}/data", params={"graph": EX + "graph1"},
+        headers={"Content-Type": "text/turtle"}, data=turtle)
+    assert resp.ok
+    assert len(standin.graph(EX + "graph1")) == 1
+
+
+def test_gsp_get_and_delete(standin):
+    resp = standin.get("http://triplestore:3030/arachne/get", params={"graph": EX + "graph2"},
+        headers={"Accept": "application/n-triples"})
+    assert resp.text.strip() == f"<{EX}b> <{EX}p> <{EX}a> ."
+
+    assert standin.request("DELETE", f"{RAW}/data", params={"graph": EX + "graph2"}).status_code == 204
+    assert standin.request("DELETE", f"{RAW}/data", params={"graph": EX + "graph2"}).status_code == 404
+
+
+def test_gsp_is_read_only_on_arachne(standin):
+    resp = standin.request("PUT", "http://triplestore:3030/arachne/get", params={"graph": EX + "graph1"},
+        headers={"Content-Type": "text/turtle"}, data="")
+    assert resp.status_code == 405
+
+
+# ---------------------------------------------------------------------------
+# Injected latency and failures
+# ---------------------------------------------------------------------------
+
+def test_fail_next_is_scoped_to_endpoint_and_count(standin):
+    standin.fail_next(503, times=2, endpoint="update")
+    query = {"query": "ASK {}"}
+    assert standin.post(f"{RAW}/sparql", data=query).ok
+    assert standin.post(f"{RAW}/update", data="CLEAR ALL").status_code == 503
+    assert standin.post(f"{RAW}/update", data="CLEAR ALL").status_code == 503
+    assert standin.post(f"{RAW}/update", data="CLEAR ALL").status_code == 204
+
+
+def test_dropped_connection_raises_connection_error(standin):
+    standin.fail_next(None)
+    with pytest.raises(requests.ConnectionError):
+        standin.post(f"{RAW}/sparql", data={"query": "ASK {}"})
+
+
+def test_failure_rate_is_reproducible_with_seed():
+    def statuses():
+        s = TriplestoreStandin(failure_rate=0.5, seed=7)
+        return [s.post(f"{RAW}/sparql", data={"query": "ASK {}"}).status_code for _ in range(20)]
+    first = statuses()
+    assert first == statuses()
+    assert 503 in first and 200 in first
+
+
+def test_latency_delays_each_request(standin):
+    standin.latency = 0.05
+    start = time.perf_counter()
+    standin.post(f"{RAW}/sparql", data={"query": "ASK {}"})
+    assert time.perf_counter() - start >= 0.05
+
+
+def test_calls_are_counted_per_endpoint(standin):
+    standin.post(f"{RAW}/sparql", data={"query": "ASK {}"})
+    standin.post(f"{RAW}/sparql", data={"query": "ASK {}"})
+    standin.post(f"{RAW}/update", data="CLEAR ALL")
+    assert standin.calls == {"raw_arachne/sparql": 2, "raw_arachne/update": 1}
+
+
+# ---------------------------------------------------------------------------
+# Over HTTP
+# ---------------------------------------------------------------------------
+
+def test_mounted_session_reaches_server_for_fuseki_urls(session, standin):
+    resp = session.post(f"{RAW}/sparql", headers={"Accept": "application/json"},
+        data={"query": f"SELECT ?o WHERE {{ <{EX}a> <{EX}p> ?o }}"})
+    assert resp.json()["results"]["bindings"][0]["o"]["value"] == "x"
+    assert standin.calls["raw_arachne/sparql"] == 1
+
+
+def test_get_query_with_format_param_over_http(server):
+    resp = requests.get(f"{server.url}/arachne/sparql", params={"query": "ASK { ?s ?p ?o }", "format": "json"})
+    assert resp.json()["boolean"] is True
+
+
+def test_injected_failures_over_http(server, standin):
+    standin.fail_next(503)
+    assert requests.get(f"{server.url}/arachne/sparql", params={"query": "ASK {}"}).status_code == 503
+    standin.fail_next(None)
+    with pytest.raises(requests.ConnectionError):
+        requests.get(f"{server.url}/arachne/sparql", params={"query": "ASK {}"})
+
+
+def test_latency_over_http_trips_client_timeout(server, standin):
+    standin.latency = 0.5
+    with pytest.raises(requests.Timeout):
+        requests.get(f"{server.url}/arachne/sparql", params={"query": "ASK {}"}, timeout=0.1)
+
+
+def test_ingestor_diff_runs_against_server(session, standin, monkeypatch):
+    monkeypatch.setattr(triplestore, "session", session)
+    new = _graph(("a", "p", Literal("y")))
+    fragment = triplestore.diff_graph_in_triplestore(EX + "graph1", new.serialize(format="turtle"), "text/turtle")
+    triplestore.execute_sparql_update(fragment)
+    assert set(standin.graph(EX + "graph1")) == set(new)
+
+
+def test_streamed_update_is_applied_over_http(session, standin, monkeypatch):
+    monkeypatch.setattr(triplestore, "session", session)
+    fragment = triplestore.UpdateFragment([("INSERT DATA", EX + "graph3", _graph(("c", "p", "d")))])
+    triplestore.execute_sparql_update([fragment, f"DROP GRAPH <{EX}graph1>"])
+    assert len(standin.graph(EX + "graph3")) == 1
+    assert len(standin.graph(EX + "graph1")) == 0
@@ -20,9 +20,11 @@ _replace_item_mock = MagicMock()
 _delete_item_mock = MagicMock()
 _merge_items_mock = MagicMock()
 _update_searchindex_mock = MagicMock()
+_parse_graph_mock = MagicMock()
 _delete_doc_mock = MagicMock()
 
 _update_person_docs_mock = MagicMock()
+_update_inferences_mock = MagicMock()
 
 _live_systems = {
     "lucos_eolas": "https://eolas.l42.eu/metadata/all/data/",
@@ -35,9 +37,11 @@ for mod_name, attrs in [
         "triplestore",
         {
             "live_systems": _live_systems,
+            "parse_graph": _parse_graph_mock,
             "replace_item_in_triplestore": _replace_item_mock,
             "delete_item_in_triplestore": _delete_item_mock,
             "merge_items_in_triplestore": _merge_items_mock,
+            "update_inferences_for_items": _update_inferences_mock,
             "session": MagicMock(),
         },
     ),
@@ -126,8 +130,10 @@ def _make_request(body: dict, path: str = "/webhook", auth: str | None = "Bearer
     _delete_item_mock.reset_mock()
     _merge_items_mock.reset_mock()
     _update_searchindex_mock.reset_mock()
+    _parse_graph_mock.reset_mock()
     _delete_doc_mock.reset_mock()
     _update_person_docs_mock.reset_mock()
+    _update_inferences_mock.reset_mock()
 
     handler.webhookController()
 
@@ -266,7 +272,8 @@ def test_merged_event_refreshes_target_in_searchindex():
         "<rdf/>",
         "application/rdf+xml",
     )
-    _update_searchindex_mock.assert_called_once_with("lucos_eolas", "<rdf/>", "application/rdf+xml")
+    _parse_graph_mock.assert_called_once_with("<rdf/>", "application/rdf+xml")
+    _update_searchindex_mock.assert_called_once_with("lucos_eolas", _parse_graph_mock.return_value)
 
 
 def test_merged_event_generic_suffix():
@@ -552,3 +559,60 @@ def test_merged_event_triggers_person_merge():
         "targetUri": "https://contacts.l42.eu/people/new",
     })
     _update_person_docs_mock.assert_called_once()
+
+
+# ---------------------------------------------------------------------------
+# Incremental inference maintenance
+# ---------------------------------------------------------------------------
+
+
+def test_created_event_updates_inferences_for_item():
+    _fetch_url_mock.return_value = ("<rdf/>", "application/rdf+xml")
+    _make_request({
+        "type": "placeCreated",
+        "source": "lucos_eolas",
+        "url": "https://eolas.l42.eu/metadata/place/1/",
+    })
+    _update_inferences_mock.assert_called_once()
+    (items,) = _update_inferences_mock.call_args.args
+    assert "https://eolas.l42.eu/metadata/place/1/" in items
+
+
+def test_deleted_event_updates_inferences_for_item():
+    _make_request({
+        "type": "placeDeleted",
+        "source": "lucos_eolas",
+        "url": "https://eolas.l42.eu/metadata/place/1/",
+    })
+    _update_inferences_mock.assert_called_once_with(["https://eolas.l42.eu/metadata/place/1/"])
+
+
+def test_merged_event_updates_inferences_for_both_items():
+    _fetch_url_mock.return_value = ("<rdf/>", "application/rdf+xml")
+    _make_request({
+        "type": "placeMerged",
+        "source": "lucos_eolas",
+        "sourceUri": "https://eolas.l42.eu/metadata/place/old/",
+        "targetUri": "https://eolas.l42.eu/metadata/place/new/",
+    })
+    _update_inferences_mock.assert_called_once()
+    (items,) = _update_inferences_mock.call_args.args
+    assert {"https://eolas.l42.eu/metadata/place/old/", "https://eolas.l42.eu/metadata/place/new/"} <= items
+
+
+@pytest.mark.parametrize("event", [
+    {"type": "contactLinked", "source": "lucos_contacts", "url": "https://contacts.l42.eu/people/42"},
+    {"type": "contactMerged", "source": "lucos_contacts",
+     "sourceUri": "https://contacts.l42.eu/people/old", "targetUri": "https://contacts.l42.eu/people/new"},
+])
+def test_inference_failure_does_not_skip_person_merge(event):
+    """Inferences are updated after the Person-merge step, so their failure is counted without skipping it."""
+    _fetch_url_mock.return_value = ("<rdf/>", "application/rdf+xml")
+    _update_inferences_mock.side_effect = RuntimeError("SPARQL error")
+    try:
+        _make_request(event)
+    finally:
+        _update_inferences_mock.side_effect = None
+    _update_person_docs_mock.assert_called_once()
+    _update_inferences_mock.assert_called_once()
+    assert _server_module._failed_ingestion_count == 1
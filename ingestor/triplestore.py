@@ -1,8 +1,13 @@
-import hashlib
+import hashlib, itertools, uuid
 import os, sys
 import requests
-from rdflib import BNode, Graph
-from skolemise import skolemise_graph
+from rdflib import BNode, Graph, Literal
+from rdflib.parser import InputSource
+from rdflib.plugins.parsers.ntriples import ParseError, W3CNTriplesParser
+from skolemise import SKOLEM_PREFIX, SkolemisingGraph, skolemise_graph
+from closure import transitive_closure
+from snapshot import invalidate as invalidate_snapshot
+from runreport import span, count
 
 KEY_LUCOS_ARACHNE = os.environ.get("KEY_LUCOS_ARACHNE")
 
@@ -70,24 +75,43 @@ def replace_graph_in_triplestore(graph_uri, content, content_type):
 	drop_resp.raise_for_status()
 	add_triples(graph_uri, content, content_type)
 
+# The item-level functions below are used by the webhook handlers, which change
+# source graphs between ingest runs; each invalidates the affected graphs' local
+# snapshots (see snapshot.py) once the write has been attempted.
+
 # Drop triples where the given item is the subject
 def delete_item_in_triplestore(item_uri, graph_uri):
-	drop_resp = session.post(
-		"http://triplestore:3030/raw_arachne/update",
-		headers={"Content-Type": "application/sparql-update"},
-		data=f"DELETE WHERE {{ GRAPH <{graph_uri}> {{ <{item_uri}> ?p ?o }} }}",
-	)
-	drop_resp.raise_for_status()
+	try:
+		drop_resp = session.post(
+			"http://triplestore:3030/raw_arachne/update",
+			headers={"Content-Type": "application/sparql-update"},
+			data=f"DELETE WHERE {{ GRAPH <{graph_uri}> {{ <{item_uri}> ?p ?o }} }}",
+		)
+		drop_resp.raise_for_status()
+	finally:
+		invalidate_snapshot(graph_uri)
 
 
 def replace_item_in_triplestore(item_uri, graph_uri, content, content_type):
-	delete_item_in_triplestore(item_uri, graph_uri)
-	add_triples(graph_uri, content, content_type)
+	try:
+		delete_item_in_triplestore(item_uri, graph_uri)
+		add_triples(graph_uri, content, content_type)
+	finally:
+		invalidate_snapshot(graph_uri)
 
 
 def merge_items_in_triplestore(source_uri, target_uri, graph_uri):
 	"""Move subject-position triples from source_uri to target_uri within graph_uri,
 	delete source_uri, and repoint any object-position references across all graphs."""
+	try:
+		_merge_items(source_uri, target_uri, graph_uri)
+	finally:
+		# Object-position references may have been repointed in any source graph
+		for live_graph_uri in live_systems.values():
+			invalidate_snapshot(live_graph_uri)
+
+
+def _merge_items(source_uri, target_uri, graph_uri):
 	update_resp = session.post(
 		"http://triplestore:3030/raw_arachne/update",
 		headers={"Content-Type": "application/sparql-update"},
@@ -110,10 +134,20 @@ def merge_items_in_triplestore(source_uri, target_uri, graph_uri):
 INFERRED_GRAPH = "urn:lucos:inferred"
 METADATA_GRAPH = "urn:lucos:ingestor-metadata"
 LAST_PAYLOAD_HASH_PRED = "urn:lucos:ingestor:lastPayloadHash"
+# HTTP cache validators from the last successful fetch, keyed like the dicts
+# returned by authorised_fetch.fetch_source()
+VALIDATOR_PREDS = {
+	"etag": "urn:lucos:ingestor:lastETag",
+	"last_modified": "urn:lucos:ingestor:lastModified",
+}
 OWL_TRANSITIVE = "http://www.w3.org/2002/07/owl#TransitiveProperty"
 OWL_INVERSE_OF  = "http://www.w3.org/2002/07/owl#inverseOf"
 OWL_SYMMETRIC   = "http://www.w3.org/2002/07/owl#SymmetricProperty"
 OWL_SAME_AS     = "http://www.w3.org/2002/07/owl#sameAs"
+RDF_TYPE         = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+RDFS_SUBCLASS_OF = "http://www.w3.org/2000/01/rdf-schema#subClassOf"
+# Nodes named in each VALUES clause of the inference queries scoped to a set of nodes
+INFERENCE_QUERY_BATCH = 500
 
 def get_source_hash(graph_uri):
 	"""Return the stored SHA-256 hash for graph_uri, or None if not recorded."""
@@ -132,106 +166,357 @@ def get_source_hash(graph_uri):
 	return bindings[0]["hash"]["value"] if bindings else None
 
 
-def set_source_hash(graph_uri, hash_str):
-	"""Write (or replace) the hash for graph_uri in the metadata graph."""
+def get_source_metadata(graph_uris):
+	"""
+	Return the stored payload hashes and HTTP cache validators for every URI in
+	*graph_uris*, using a single VALUES-driven query.
+
+	Returns (hashes, validators): hashes maps graph URI → stored hash, and
+	validators maps graph URI → validators dict, keyed as in VALIDATOR_PREDS.
+	URIs with nothing recorded are absent from hashes and map to {} in
+	validators.
+	"""
+	graph_uris = list(graph_uris)
+	hashes = {}
+	validators = {graph_uri: {} for graph_uri in graph_uris}
+	if not graph_uris:
+		return (hashes, validators)
+	keys_by_pred = {pred: key for key, pred in VALIDATOR_PREDS.items()}
+	graph_values = " ".join(f"<{graph_uri}>" for graph_uri in graph_uris)
+	pred_values = " ".join(f"<{pred}>" for pred in [LAST_PAYLOAD_HASH_PRED, *VALIDATOR_PREDS.values()])
+	resp = session.post(
+		"http://triplestore:3030/raw_arachne/sparql",
+		headers={"Accept": "application/json"},
+		data={"query": (
+			f"SELECT ?g ?pred ?value WHERE {{"
+			f" VALUES ?g {{ {graph_values} }}"
+			f" VALUES ?pred {{ {pred_values} }}"
+			f" GRAPH <{METADATA_GRAPH}> {{"
+			f" ?g ?pred ?value"
+			f" }} }}"
+		)},
+	)
+	resp.raise_for_status()
+	for b in resp.json()["results"]["bindings"]:
+		graph_uri = b["g"]["value"]
+		pred = b["pred"]["value"]
+		if pred == LAST_PAYLOAD_HASH_PRED:
+			hashes[graph_uri] = b["value"]["value"]
+		else:
+			validators.setdefault(graph_uri, {})[keys_by_pred[pred]] = b["value"]["value"]
+	return (hashes, validators)
+
+
+def source_hash_update(graph_uri, hash_str, validators=None):
+	"""
+	Return a SPARQL Update writing (or replacing) the hash for graph_uri in the
+	metadata graph, so it can be appended to a larger update.
+
+	If *validators* is given, the stored HTTP cache validators are replaced as
+	well, so a conditional GET can only ever be answered against the payload
+	whose hash is recorded.
+	"""
+	update = (
+		f'DELETE WHERE {{'
+		f' GRAPH <{METADATA_GRAPH}> {{'
+		f' <{graph_uri}> <{LAST_PAYLOAD_HASH_PRED}> ?old'
+		f' }} }} ;\n'
+		f'INSERT DATA {{'
+		f' GRAPH <{METADATA_GRAPH}> {{'
+		f' <{graph_uri}> <{LAST_PAYLOAD_HASH_PRED}> "{hash_str}"'
+		f' }} }}'
+	)
+	if validators is not None:
+		update += " ;\n" + source_validators_update(graph_uri, validators)
+	return update
+
+
+def set_source_hash(graph_uri, hash_str, validators=None):
+	"""Write (or replace) the hash, and optionally the validators, for graph_uri."""
 	resp = session.post(
 		"http://triplestore:3030/raw_arachne/update",
 		headers={"Content-Type": "application/sparql-update"},
-		data=(
-			f'DELETE WHERE {{'
-			f' GRAPH <{METADATA_GRAPH}> {{'
-			f' <{graph_uri}> <{LAST_PAYLOAD_HASH_PRED}> ?old'
-			f' }} }} ;\n'
-			f'INSERT DATA {{'
-			f' GRAPH <{METADATA_GRAPH}> {{'
-			f' <{graph_uri}> <{LAST_PAYLOAD_HASH_PRED}> "{hash_str}"'
-			f' }} }}'
-		),
+		data=source_hash_update(graph_uri, hash_str, validators),
+	)
+	resp.raise_for_status()
+
+
+def source_hash_clear_update(graph_uri):
+	"""
+	Return a SPARQL Update removing the stored hash and validators for
+	graph_uri, so it can be appended to a larger update.
+	"""
+	return " ;\n".join(
+		f'DELETE WHERE {{'
+		f' GRAPH <{METADATA_GRAPH}> {{'
+		f' <{graph_uri}> <{pred}> ?old'
+		f' }} }}'
+		for pred in [LAST_PAYLOAD_HASH_PRED, *VALIDATOR_PREDS.values()]
+	)
+
+
+def clear_source_hash(graph_uri):
+	"""
+	Remove the stored hash and validators for graph_uri, so that the next run
+	fetches and processes the source in full.
+	"""
+	resp = session.post(
+		"http://triplestore:3030/raw_arachne/update",
+		headers={"Content-Type": "application/sparql-update"},
+		data=source_hash_clear_update(graph_uri),
 	)
 	resp.raise_for_status()
 
 
-def _sparql_pairs(prop):
-	"""Return a set of (subject, object) pairs for prop, excluding the inferred graph."""
+def _sparql_string(value):
+	"""Return value as a double-quoted SPARQL string literal."""
+	return '"' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n").replace("\r", "\\r") + '"'
+
+
+def source_validators_update(graph_uri, validators):
+	"""Return a SPARQL Update replacing the stored HTTP cache validators for graph_uri."""
+	parts = [
+		f'DELETE WHERE {{'
+		f' GRAPH <{METADATA_GRAPH}> {{'
+		f' <{graph_uri}> <{pred}> ?old'
+		f' }} }}'
+		for pred in VALIDATOR_PREDS.values()
+	]
+	triples = " ".join(
+		f"<{graph_uri}> <{VALIDATOR_PREDS[key]}> {_sparql_string(value)} ."
+		for key, value in sorted(validators.items())
+		if key in VALIDATOR_PREDS and value
+	)
+	if triples:
+		parts.append(f'INSERT DATA {{ GRAPH <{METADATA_GRAPH}> {{ {triples} }} }}')
+	return " ;\n".join(parts)
+
+
+def _inference_schema():
+	"""
+	Return (transitive_props, inverse_pairs, symmetric_props) as declared in the
+	triplestore, found with a single query.  owl:inverseOf is symmetric, so
+	(P1, P2) and (P2, P1) are deduplicated into the first pair seen.
+	"""
 	resp = session.post(
 		"http://triplestore:3030/raw_arachne/sparql",
 		headers={"Accept": "application/json"},
-		data={"query": f"SELECT DISTINCT ?s ?o WHERE {{ GRAPH ?g {{ ?s <{prop}> ?o }} FILTER(?g != <{INFERRED_GRAPH}>) }}"},
+		data={"query": (
+			f"SELECT DISTINCT ?kind ?p ?p2 WHERE {{"
+			f" GRAPH ?g {{"
+			f" {{ ?p a ?kind VALUES ?kind {{ <{OWL_TRANSITIVE}> <{OWL_SYMMETRIC}> }} }}"
+			f" UNION {{ ?p <{OWL_INVERSE_OF}> ?p2 BIND(<{OWL_INVERSE_OF}> AS ?kind) }}"
+			f" }}"
+			f" FILTER(?g != <{INFERRED_GRAPH}>)"
+			f" }}"
+		)},
 	)
 	resp.raise_for_status()
-	return {(b["s"]["value"], b["o"]["value"]) for b in resp.json()["results"]["bindings"]}
+
+	transitive_props = []
+	symmetric_props = []
+	seen = set()
+	inverse_pairs = []
+	for b in resp.json()["results"]["bindings"]:
+		kind, p = b["kind"]["value"], b["p"]["value"]
+		if kind == OWL_TRANSITIVE:
+			transitive_props.append(p)
+		elif kind == OWL_SYMMETRIC:
+			symmetric_props.append(p)
+		else:
+			p2 = b["p2"]["value"]
+			canonical = tuple(sorted([p, p2]))
+			if canonical not in seen:
+				seen.add(canonical)
+				inverse_pairs.append((p, p2))
+	return (transitive_props, inverse_pairs, symmetric_props)
+
+
+def _touching_pattern(nodes, graph_pattern):
+	"""
+	SPARQL matching ``?s ?p ?o`` inside *graph_pattern* (e.g. "GRAPH ?g") where
+	the subject or the object is one of *nodes*.
+	"""
+	values = " ".join(f"<{node}>" for node in sorted(nodes))
+	return (
+		f" VALUES ?x {{ {values} }}"
+		f" {graph_pattern} {{ {{ ?x ?p ?o BIND(?x AS ?s) }} UNION {{ ?s ?p ?x BIND(?x AS ?o) }} }}"
+	)
+
+
+def _inference_edges(props, touching=None, subjects=None):
+	"""
+	Return {prop: set of (subject, object) pairs} for every prop in *props*,
+	excluding the inferred graph, fetched with a single query and partitioned
+	here.  Literal-valued triples are left out: none of the inferences can use
+	them, as a literal can't be a subject.  If *touching* is given, only
+	triples whose subject or object is in it are fetched; if *subjects* is,
+	only triples whose subject is in it, INFERENCE_QUERY_BATCH per query.
+	"""
+	edges = {prop: set() for prop in props}
+	if not props:
+		return edges
+	values = " ".join(f"<{prop}>" for prop in edges)
+	if touching is not None:
+		patterns = [_touching_pattern(touching, "GRAPH ?g")] if touching else []
+	elif subjects is not None:
+		patterns = [f"{batch} GRAPH ?g {{ ?s ?p ?o }}" for batch in _subject_batches(subjects)]
+	else:
+		patterns = [" GRAPH ?g { ?s ?p ?o }"]
+	for pattern in patterns:
+		resp = session.post(
+			"http://triplestore:3030/raw_arachne/sparql",
+			headers={"Accept": "application/json"},
+			data={"query": (
+				f"SELECT DISTINCT ?s ?p ?o WHERE {{"
+				f" VALUES ?p {{ {values} }}"
+				f"{pattern}"
+				f" FILTER(?g != <{INFERRED_GRAPH}>)"
+				f" FILTER(!isLiteral(?o))"
+				f" }}"
+			)},
+		)
+		resp.raise_for_status()
+		for b in resp.json()["results"]["bindings"]:
+			edges[b["p"]["value"]].add((b["s"]["value"], b["o"]["value"]))
+	return edges
+
+
+def _subject_batches(subjects):
+	"""``VALUES ?s { … }`` clauses covering *subjects*, INFERENCE_QUERY_BATCH apiece."""
+	ordered = sorted(subjects)
+	return [
+		f" VALUES ?s {{ {' '.join(f'<{node}>' for node in ordered[i:i + INFERENCE_QUERY_BATCH])} }}"
+		for i in range(0, len(ordered), INFERENCE_QUERY_BATCH)
+	]
+
+
+def _walk_edges(starts, forward=True):
+	"""
+	Return {prop: set of (subject, object) pairs} for the direct triples, outside
+	the inferred graph, on every path along each prop from its nodes in *starts*
+	({prop: nodes}) — following edges forward, or against them if not *forward*.
+	Each step is one query per INFERENCE_QUERY_BATCH (prop, node) pairs on the
+	frontier, so the work scales with the region walked, not the store.
+	"""
+	edges = {prop: set() for prop in starts}
+	seen = {(prop, node) for prop, nodes in starts.items() for node in nodes}
+	frontier = sorted(seen)
+	var = "?s" if forward else "?o"
+	while frontier:
+		found = []
+		for i in range(0, len(frontier), INFERENCE_QUERY_BATCH):
+			values = " ".join(f"(<{prop}> <{node}>)" for prop, node in frontier[i:i + INFERENCE_QUERY_BATCH])
+			resp = session.post(
+				"http://triplestore:3030/raw_arachne/sparql",
+				headers={"Accept": "application/json"},
+				data={"query": (
+					f"SELECT DISTINCT ?s ?p ?o WHERE {{"
+					f" VALUES (?p {var}) {{ {values} }}"
+					f" GRAPH ?g {{ ?s ?p ?o }}"
+					f" FILTER(?g != <{INFERRED_GRAPH}>)"
+					f" FILTER(!isLiteral(?o))"
+					f" }}"
+				)},
+			)
+			resp.raise_for_status()
+			found.extend((b["p"]["value"], b["s"]["value"], b["o"]["value"]) for b in resp.json()["results"]["bindings"])
+		frontier = set()
+		for prop, s, o in found:
+			edges[prop].add((s, o))
+			step = (prop, o if forward else s)
+			if step not in seen:
+				seen.add(step)
+				frontier.add(step)
+		frontier = sorted(frontier)
+	return edges
+
+
+def _superclasses(subclass_pairs) -> dict:
+	"""
+	Return {class: set of its superclasses} over the rdfs:subClassOf closure of
+	*subclass_pairs* ((subclass, superclass) pairs), leaving out each class
+	itself and any Skolemised superclass — the anonymous OWL restrictions in
+	the ontologies, which aren't types anyone asks for.
+	"""
+	direct = {}
+	for sub, sup in subclass_pairs:
+		direct.setdefault(sub, set()).add(sup)
+	superclasses = {}
+	for cls, reachable in transitive_closure(direct).items():
+		ancestors = {c for c in reachable if c != cls and not c.startswith(SKOLEM_PREFIX)}
+		if ancestors:
+			superclasses[cls] = ancestors
+	return superclasses
+
+
+def _type_inferences(type_pairs, superclasses) -> set:
+	"""
+	Return the (instance, class) pairs that rdf:type entails from *type_pairs*
+	over *superclasses* (see _superclasses), less those already asserted.
+	"""
+	return {
+		(s, sup)
+		for s, cls in type_pairs
+		for sup in superclasses.get(cls, ())
+		if (s, sup) not in type_pairs
+	}
+
 
 def compute_inferences():
 	"""
 	Computes inferred triples for owl:TransitiveProperty and owl:inverseOf declarations
-	found in the triplestore, then writes them all to urn:lucos:inferred in a single
+	found in the triplestore, and the rdf:type of each instance's superclasses over the
+	rdfs:subClassOf hierarchy, then writes them all to urn:lucos:inferred in a single
 	operation.  Direct triples stay in their source named graphs; the union default graph
 	on the arachne endpoint combines both.
+
+	The inputs take two queries however many properties are involved: one for the
+	schema declarations, and one for every triple of the properties they name.
 	"""
-	inferred_lines = []
+	inferred_lines = set()
 
-	# ── Transitive closures ──────────────────────────────────────────────────
-	resp = session.post(
-		"http://triplestore:3030/raw_arachne/sparql",
-		headers={"Accept": "application/json"},
-		data={"query": f"SELECT DISTINCT ?p WHERE {{ GRAPH ?g {{ ?p a <{OWL_TRANSITIVE}> }} }}"},
+	(transitive_props, inverse_pairs, symmetric_props) = _inference_schema()
+	# owl:sameAs is symmetric by the OWL 2 RDF-Based Semantics spec; the cached
+	# W3C ontology file only declares it as rdf:Property, not owl:SymmetricProperty,
+	# so we always add it here — mirroring how compute_inferences() already
+	# hard-codes the meaning of TransitiveProperty and inverseOf in Python.
+	if OWL_SAME_AS not in symmetric_props:
+		symmetric_props.append(OWL_SAME_AS)
+	edges = _inference_edges(
+		transitive_props + [p for pair in inverse_pairs for p in pair] + symmetric_props
+		+ [RDF_TYPE, RDFS_SUBCLASS_OF]
 	)
-	resp.raise_for_status()
-	transitive_props = [b["p"]["value"] for b in resp.json()["results"]["bindings"]]
 
+	# ── Transitive closures ──────────────────────────────────────────────────
 	if transitive_props:
 		print(f"Transitive properties ({len(transitive_props)}): {', '.join('<' + p + '>' for p in transitive_props)}")
 		for prop in transitive_props:
-			direct_pairs = _sparql_pairs(prop)
+			direct_pairs = edges[prop]
 			# Build adjacency map: node → set of direct successors
 			direct = {}
 			for s, o in direct_pairs:
 				direct.setdefault(s, set()).add(o)
 
-			inferred_for_prop = []
-			for start in direct:
-				visited = set()
-				queue = list(direct[start])
-				while queue:
-					node = queue.pop(0)
-					if node in visited:
-						continue
-					visited.add(node)
-					if (start, node) not in direct_pairs:
-						inferred_for_prop.append((start, node))
-					for next_node in direct.get(node, []):
-						if next_node not in visited:
-							queue.append(next_node)
+			inferred_for_prop = [
+				(start, node)
+				for start, reachable in transitive_closure(direct).items()
+				for node in reachable
+				if (start, node) not in direct_pairs
+			]
 
 			print(f"  <{prop}>: {len(direct_pairs)} direct → {len(inferred_for_prop)} inferred")
 			for s, o in inferred_for_prop:
-				inferred_lines.append(f"<{s}> <{prop}> <{o}> .")
+				inferred_lines.add(f"<{s}> <{prop}> <{o}> .\n")
 	else:
 		print("No owl:TransitiveProperty properties found")
 
 	# ── Inverse properties ───────────────────────────────────────────────────
-	resp = session.post(
-		"http://triplestore:3030/raw_arachne/sparql",
-		headers={"Accept": "application/json"},
-		data={"query": f"SELECT DISTINCT ?p1 ?p2 WHERE {{ GRAPH ?g {{ ?p1 <{OWL_INVERSE_OF}> ?p2 }} FILTER(?g != <{INFERRED_GRAPH}>) }}"},
-	)
-	resp.raise_for_status()
-
-	# owl:inverseOf is symmetric — deduplicate (P1,P2) / (P2,P1) into a single canonical pair
-	seen = set()
-	inverse_pairs = []
-	for b in resp.json()["results"]["bindings"]:
-		p1, p2 = b["p1"]["value"], b["p2"]["value"]
-		canonical = tuple(sorted([p1, p2]))
-		if canonical not in seen:
-			seen.add(canonical)
-			inverse_pairs.append((p1, p2))
-
 	if inverse_pairs:
 		print(f"Inverse property pairs ({len(inverse_pairs)}): {', '.join(f'<{a}>/<{b}>' for a, b in inverse_pairs)}")
 		for p1, p2 in inverse_pairs:
-			pairs_p1 = _sparql_pairs(p1)
-			pairs_p2 = _sparql_pairs(p2)
+			pairs_p1 = edges[p1]
+			pairs_p2 = edges[p2]
 			# Generate P2 inverses for P1 data, and P1 inverses for P2 data
 			for src_pairs, src_prop, dst_prop, dst_pairs in [
 				(pairs_p1, p1, p2, pairs_p2),
@@ -240,52 +525,37 @@ def compute_inferences():
 				inferred_for_dir = [(o, s) for s, o in src_pairs if (o, s) not in dst_pairs]
 				print(f"  <{src_prop}> → <{dst_prop}>: {len(src_pairs)} direct → {len(inferred_for_dir)} inferred inverses")
 				for s, o in inferred_for_dir:
-					inferred_lines.append(f"<{s}> <{dst_prop}> <{o}> .")
+					inferred_lines.add(f"<{s}> <{dst_prop}> <{o}> .\n")
 	else:
 		print("No owl:inverseOf pairs found")
 
 	# ── Symmetric properties ──────────────────────────────────────────────────
-	resp = session.post(
-		"http://triplestore:3030/raw_arachne/sparql",
-		headers={"Accept": "application/json"},
-		data={"query": f"SELECT DISTINCT ?p WHERE {{ GRAPH ?g {{ ?p a <{OWL_SYMMETRIC}> }} }}"},
-	)
-	resp.raise_for_status()
-	symmetric_props = [b["p"]["value"] for b in resp.json()["results"]["bindings"]]
-
-	# owl:sameAs is symmetric by the OWL 2 RDF-Based Semantics spec; the cached
-	# W3C ontology file only declares it as rdf:Property, not owl:SymmetricProperty,
-	# so we always add it here — mirroring how compute_inferences() already
-	# hard-codes the meaning of TransitiveProperty and inverseOf in Python.
-	if OWL_SAME_AS not in symmetric_props:
-		symmetric_props.append(OWL_SAME_AS)
-
 	print(f"Symmetric properties ({len(symmetric_props)}): {', '.join('<' + p + '>' for p in symmetric_props)}")
 	for prop in symmetric_props:
-		# FILTER(!isLiteral(?o)) — literals cannot appear as RDF subjects, so
-		# materialising the reverse of a literal-object triple is a no-op.
-		resp = session.post(
-			"http://triplestore:3030/raw_arachne/sparql",
-			headers={"Accept": "application/json"},
-			data={"query": (
-				f"SELECT DISTINCT ?s ?o WHERE {{"
-				f" GRAPH ?g {{ ?s <{prop}> ?o }}"
-				f" FILTER(?g != <{INFERRED_GRAPH}>)"
-				f" FILTER(!isLiteral(?o))"
-				f" }}"
-			)},
-		)
-		resp.raise_for_status()
-		direct_pairs = {(b["s"]["value"], b["o"]["value"]) for b in resp.json()["results"]["bindings"]}
+		direct_pairs = edges[prop]
 		inferred_for_prop = [(o, s) for s, o in direct_pairs if (o, s) not in direct_pairs]
 		print(f"  <{prop}>: {len(direct_pairs)} direct → {len(inferred_for_prop)} inferred reverse(s)")
 		for s, o in inferred_for_prop:
-			inferred_lines.append(f"<{s}> <{prop}> <{o}> .")
+			inferred_lines.add(f"<{s}> <{prop}> <{o}> .\n")
+
+	# ── Types over the subclass hierarchy ────────────────────────────────────
+	# Materialised so that a query for instances of a supertype stays a single
+	# index lookup on ?s rdf:type <class>, rather than an rdf:type/rdfs:subClassOf*
+	# property path evaluated at query time.
+	superclasses = _superclasses(edges[RDFS_SUBCLASS_OF])
+	inferred_types = _type_inferences(edges[RDF_TYPE], superclasses)
+	print(f"Types: {len(superclasses)} classes with superclasses, {len(edges[RDF_TYPE])} direct → {len(inferred_types)} inferred")
+	for s, o in inferred_types:
+		inferred_lines.add(f"<{s}> <{RDF_TYPE}> <{o}> .\n")
 
 	# ── Write inferred graph ─────────────────────────────────────────────────
-	inferred_lines.sort()  # Deterministic ordering for stable hashing
-	turtle_content = "\n".join(inferred_lines)
-	content_hash = "sha256:" + hashlib.sha256(turtle_content.encode("utf-8")).hexdigest()
+	# The lines are already canonical N-Triples, so they are hashed, and later
+	# diffed against the stored graph, as they are: no Turtle is serialised and
+	# nothing is parsed back in.
+	digest = hashlib.sha256()
+	for line in sorted(inferred_lines):  # Deterministic ordering for stable hashing
+		digest.update(line.encode("utf-8"))
+	content_hash = "sha256:" + digest.hexdigest()
 
 	# Approach 2: skip the triplestore round-trip entirely if the content hash
 	# is unchanged from the last run.  When the same sources produce the same
@@ -296,14 +566,18 @@ def compute_inferences():
 		print(f"Inferred graph content hash unchanged ({content_hash}) — skipping writes")
 		return False
 
-	# Approach 1: diff-based update.  diff_graph_in_triplestore fetches the
+	# Approach 1: diff-based update.  diff_lines_in_triplestore fetches the
 	# current graph and returns only the minimal INSERT/DELETE fragment, or
-	# None if the triples are already identical (e.g. the hash changed due to
-	# serialisation order but the actual triple set is the same).
+	# None if the triples are already identical (e.g. the stored hash was
+	# cleared by update_inferences_for_items but the triple set is the same).
 	print(f"Computing diff for {len(inferred_lines)} inferred triple{'s' if len(inferred_lines) != 1 else ''} against <{INFERRED_GRAPH}>")
-	fragment = diff_graph_in_triplestore(INFERRED_GRAPH, turtle_content, "text/turtle")
+	fragment = stage_large_fragment(diff_lines_in_triplestore(INFERRED_GRAPH, inferred_lines))
 	if fragment:
-		execute_sparql_update(fragment)
+		try:
+			execute_sparql_update(fragment)
+		except Exception:
+			drop_staging_graphs([fragment])
+			raise
 		print(f"Inferred graph updated via diff")
 	else:
 		print(f"Inferred graph diff is empty — no triplestore writes needed")
@@ -311,6 +585,125 @@ def compute_inferences():
 	return fragment is not None
 
 
+def _inferred_pairs(props, touching=None, subjects=None):
+	"""
+	Return {prop: set of (subject, object) pairs} currently in the inferred
+	graph, for triples whose subject or object is in *touching*, or whose
+	subject is in *subjects*, INFERENCE_QUERY_BATCH subjects per query.
+	"""
+	pairs = {prop: set() for prop in props}
+	if not props:
+		return pairs
+	values = " ".join(f"<{prop}>" for prop in pairs)
+	if touching is not None:
+		patterns = [_touching_pattern(touching, f"GRAPH <{INFERRED_GRAPH}>")] if touching else []
+	else:
+		patterns = [f"{batch} GRAPH <{INFERRED_GRAPH}> {{ ?s ?p ?o }}" for batch in _subject_batches(subjects)]
+	for pattern in patterns:
+		resp = session.post(
+			"http://triplestore:3030/raw_arachne/sparql",
+			headers={"Accept": "application/json"},
+			data={"query": f"SELECT DISTINCT ?s ?p ?o WHERE {{ VALUES ?p {{ {values} }}{pattern} }}"},
+		)
+		resp.raise_for_status()
+		for b in resp.json()["results"]["bindings"]:
+			pairs[b["p"]["value"]].add((b["s"]["value"], b["o"]["value"]))
+	return pairs
+
+
+def update_inferences_for_items(item_uris):
+	"""
+	Bring urn:lucos:inferred up to date after the triples of *item_uris* were
+	rewritten (by a webhook), recomputing only the inferences that can depend
+	on them, and return True if the inferred graph changed.
+
+	Inverse and symmetric inferences can only change where they touch an item,
+	so only the direct triples touching the items are fetched.  A transitive
+	closure changes for the items and every node with a path to one of them;
+	those nodes are found by walking the property's edges back from the items,
+	the edges onward from them by walking forward (see _walk_edges), and the
+	closure is recomputed from just those nodes.  The inferred triples in that scope are compared with the
+	recomputed ones and the difference is applied, together with clearing the
+	inferred graph's stored hash so the next full compute_inferences() can't
+	skip its writes on a hash that no longer describes the graph.
+
+	Types over the subclass hierarchy change for the items, and for the
+	instances of every class that is an item or a subclass of one — so a class
+	whose rdfs:subClassOf changed brings all of its instances into scope.  Only
+	the hierarchy below the items and above those instances' classes is walked.
+
+	If a transitive property is also symmetric or part of an inverse pair, or
+	rdf:type is declared as either, the kinds of scope overlap, and this falls
+	back to compute_inferences().
+	Concurrent updates can interleave; any resulting drift is corrected by the
+	next full run.
+	"""
+	items = set(item_uris)
+	(transitive_props, inverse_pairs, symmetric_props) = _inference_schema()
+	if OWL_SAME_AS not in symmetric_props:
+		symmetric_props.append(OWL_SAME_AS)
+	local_props = list(dict.fromkeys(symmetric_props + [p for pair in inverse_pairs for p in pair]))
+	if set(transitive_props) & set(local_props) or RDF_TYPE in transitive_props + local_props:
+		print("Transitive properties overlap symmetric/inverse ones — recomputing all inferences")
+		return compute_inferences()
+
+	expected = {}
+	# ── Inverse and symmetric: only triples touching the items ──────────────
+	touching = _inference_edges(local_props, touching=items)
+	current = _inferred_pairs(local_props, touching=items)
+	for prop in symmetric_props:
+		direct_pairs = touching[prop]
+		expected.setdefault(prop, set()).update((o, s) for s, o in direct_pairs if (o, s) not in direct_pairs)
+	for p1, p2 in inverse_pairs:
+		for src_prop, dst_prop in [(p1, p2), (p2, p1)]:
+			dst_pairs = touching[dst_prop]
+			expected.setdefault(dst_prop, set()).update((o, s) for s, o in touching[src_prop] if (o, s) not in dst_pairs)
+
+	# ── Transitive: the items and everything reaching them ──────────────────
+	# Walked back from the items together with rdfs:subClassOf, whose reverse
+	# walk finds the subclasses of the items for the types below.
+	reaching = _walk_edges({prop: items for prop in transitive_props + [RDFS_SUBCLASS_OF]}, forward=False)
+	starts = {prop: items | {s for s, o in reaching[prop]} for prop in transitive_props}
+	onward = _walk_edges(starts)
+	for prop in transitive_props:
+		direct = {}
+		for s, o in onward[prop]:
+			direct.setdefault(s, set()).add(o)
+		expected[prop] = {
+			(start, node)
+			for start, reachable in transitive_closure(direct).items() if start in starts[prop]
+			for node in reachable if node not in direct[start]
+		}
+		current[prop] = _inferred_pairs([prop], subjects=starts[prop])[prop]
+
+	# ── Types: the items, and instances of their classes and subclasses ─────
+	classes = items | {s for s, o in reaching[RDFS_SUBCLASS_OF]}
+	typed = _inference_edges([RDF_TYPE], touching=classes)[RDF_TYPE]
+	subjects = items | {s for s, o in typed if o in classes}
+	type_pairs = _inference_edges([RDF_TYPE], subjects=subjects)[RDF_TYPE]
+	hierarchy = _walk_edges({RDFS_SUBCLASS_OF: {o for s, o in type_pairs}})[RDFS_SUBCLASS_OF]
+	expected[RDF_TYPE] = _type_inferences(type_pairs, _superclasses(hierarchy))
+	current[RDF_TYPE] = _inferred_pairs([RDF_TYPE], subjects=subjects)[RDF_TYPE]
+
+	to_insert = [
+		f"<{s}> <{prop}> <{o}> .\n" for prop, pairs in expected.items() for s, o in pairs - current.get(prop, set())
+	]
+	to_delete = [
+		f"<{s}> <{prop}> <{o}> .\n" for prop, pairs in current.items() for s, o in pairs - expected.get(prop, set())
+	]
+	print(f"Inferences for {len(items)} item(s): {len(to_insert)} insert(s), {len(to_delete)} delete(s)")
+	if not to_insert and not to_delete:
+		return False
+	parts = []
+	if to_insert:
+		parts.append(("INSERT DATA", INFERRED_GRAPH, to_insert))
+	if to_delete:
+		parts.append(("DELETE DATA", INFERRED_GRAPH, to_delete))
+	parts.append(source_hash_clear_update(INFERRED_GRAPH))
+	execute_sparql_update(UpdateFragment(parts))
+	return True
+
+
 def _content_type_to_rdflib_format(content_type: str) -> str:
 	"""Map an HTTP content-type value to the corresponding rdflib format name."""
 	ct = content_type.split(";")[0].strip().lower()
@@ -320,108 +713,676 @@ def _content_type_to_rdflib_format(content_type: str) -> str:
 		"application/n-triples": "nt",
 		"text/n3": "n3",
 		"application/n-quads": "nquads",
+		"application/ld+json": "json-ld",
 	}
 	return mapping.get(ct, "turtle")
 
 
-def execute_sparql_update(sparql_update: str):
-	"""Execute a SPARQL Update string against the raw_arachne dataset."""
+def parse_graph(content, content_type: str) -> Graph:
+	"""
+	Parse an RDF payload into an rdflib Graph, with its blank nodes Skolemised.
+
+	*content* is either a string or a binary file object (such as the spooled
+	body returned by ``fetch_source``); files are rewound and parsed without
+	being read into a single string.  An already-parsed Graph is returned as-is,
+	so a payload parsed once can be handed to both the triplestore diff and the
+	search index.
+
+	The payload is parsed into a SkolemisingGraph, which holds back only the
+	triples with blank nodes and stores them Skolemised once parsing is done,
+	so diff_graph_in_triplestore has no Skolemised copy of the graph to make.
+	"""
+	if isinstance(content, Graph):
+		return content
+	rdflib_format = _content_type_to_rdflib_format(content_type)
+	graph = SkolemisingGraph()
+	if isinstance(content, str):
+		graph.parse(data=content, format=rdflib_format)
+	else:
+		content.seek(0)
+		source = InputSource()
+		source.setByteStream(content)
+		graph.parse(source=source, format=rdflib_format)
+	return graph.skolemise()
+
+
+# Streamed update bodies are sent in chunks of roughly this many bytes
+UPDATE_CHUNK_SIZE = 64 * 1024
+
+
+def _nt_term(term) -> str:
+	"""Serialise one RDF term as it appears in N-Triples."""
+	if not isinstance(term, Literal):
+		return term.n3()
+	value = str(term).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"').replace("\r", "\\r")
+	if term.language:
+		return f'"{value}"@{term.language}'
+	if term.datatype:
+		return f'"{value}"^^<{term.datatype}>'
+	return f'"{value}"'
+
+
+def _nt_line(triple) -> str:
+	"""Serialise one triple as an N-Triples line, as Graph.serialize(format="nt") does."""
+	(s, p, o) = triple
+	return f"{s.n3()} {p.n3()} {_nt_term(o)} .\n"
+
+
+def _nt_row(row) -> str:
+	"""An UpdateFragment data row — a triple, or an already-serialised N-Triples line — as a line."""
+	return row if isinstance(row, str) else _nt_line(row)
+
+
+class UpdateFragment:
+	"""
+	A SPARQL Update fragment whose data blocks are serialised only when sent.
+
+	*parts* are joined with " ;" and are either literal update strings or
+	``(operation, graph_uri, triples)`` tuples, which render as
+	``operation { GRAPH <graph_uri> { … } }`` with one N-Triples line per triple
+	(e.g. operation "INSERT DATA").  The triples may also be given as
+	N-Triples lines, which are sent as they are.  Holding the triples rather than their
+	serialisation means a fragment costs no more memory than the diff it came
+	from; the text is produced chunk by chunk by ``chunks()``, or in full by
+	``str()``.
+
+	*staging_graph* names the staging graph, if any, which the fragment
+	publishes from and then drops.  If the fragment is never applied, the graph
+	has to be dropped with drop_staging_graphs() instead.
+	"""
+
+	def __init__(self, parts, staging_graph=None):
+		self.parts = parts
+		self.staging_graph = staging_graph
+
+	def chunks(self):
+		for i, part in enumerate(self.parts):
+			if i:
+				yield " ;\n"
+			if isinstance(part, str):
+				yield part
+				continue
+			(operation, graph_uri, triples) = part
+			yield f"{operation} {{\n  GRAPH <{graph_uri}> {{\n"
+			for row in triples:
+				yield _nt_row(row)
+			yield "  }\n}"
+
+	@property
+	def triple_count(self):
+		"""Number of triples in the fragment's data blocks."""
+		return sum(len(part[2]) for part in self.parts if not isinstance(part, str))
+
+	def __str__(self):
+		return "".join(self.chunks())
+
+
+def _update_pieces(updates):
+	for i, update in enumerate(updates):
+		if i:
+			yield " ;\n"
+		if isinstance(update, str):
+			yield update
+		else:
+			yield from update.chunks()
+
+
+def _update_body(updates):
+	"""
+	Yield the UTF-8 request body for a list of update strings and
+	UpdateFragments joined with " ;", in pieces of about UPDATE_CHUNK_SIZE.
+	"""
+	buffer = []
+	size = 0
+	for piece in _update_pieces(updates):
+		buffer.append(piece)
+		size += len(piece)
+		if size >= UPDATE_CHUNK_SIZE:
+			yield "".join(buffer).encode("utf-8")
+			buffer = []
+			size = 0
+	if buffer:
+		yield "".join(buffer).encode("utf-8")
+
+
+def execute_sparql_update(sparql_update):
+	"""
+	Execute a SPARQL Update against the raw_arachne dataset.
+
+	*sparql_update* is a string, an UpdateFragment, or a list of either, which
+	are joined with " ;" into a single request (and so a single transaction).
+	Anything but a plain string is streamed with chunked transfer encoding:
+	fragments are serialised as the body is sent, so the full update text is
+	never held in memory.
+	"""
+	if isinstance(sparql_update, UpdateFragment):
+		sparql_update = [sparql_update]
 	resp = session.post(
 		"http://triplestore:3030/raw_arachne/update",
 		headers={"Content-Type": "application/sparql-update"},
-		data=sparql_update,
+		data=sparql_update if isinstance(sparql_update, str) else _update_body(sparql_update),
+	)
+	resp.raise_for_status()
+
+
+# Fragments touching more triples than this are staged before Phase 1 (see
+# stage_large_fragment).  Overridable with INGEST_STAGED_COMMIT_THRESHOLD.
+DEFAULT_STAGED_COMMIT_THRESHOLD = 200_000
+# Triples written to a staging graph per request
+STAGING_CHUNK_TRIPLES = 25_000
+STAGING_GRAPH_PREFIX = "urn:lucos:staging:"
+STAGING_NS = "urn:lucos:staging#"
+
+
+def staged_commit_threshold() -> int:
+	"""Triple count above which fragments are staged; read from INGEST_STAGED_COMMIT_THRESHOLD on every call."""
+	try:
+		threshold = int(os.environ.get("INGEST_STAGED_COMMIT_THRESHOLD", DEFAULT_STAGED_COMMIT_THRESHOLD))
+	except ValueError:
+		return DEFAULT_STAGED_COMMIT_THRESHOLD
+	return threshold if threshold > 0 else DEFAULT_STAGED_COMMIT_THRESHOLD
+
+
+def _staged_statement(statement_uri, row) -> str:
+	"""N-Triples for *row* (see UpdateFragment) reified as <statement_uri> with STAGING_NS subject / predicate / object."""
+	if isinstance(row, str):
+		# Subjects and predicates are IRIs or blank node labels, so contain no spaces
+		(s, p, o) = row.rstrip("\n")[:-2].split(" ", 2)
+	else:
+		(s, p, o) = (row[0].n3(), row[1].n3(), _nt_term(row[2]))
+	return (
+		f"<{statement_uri}> <{STAGING_NS}subject> {s} .\n"
+		f"<{statement_uri}> <{STAGING_NS}predicate> {p} .\n"
+		f"<{statement_uri}> <{STAGING_NS}object> {o} .\n"
+	)
+
+
+# Graph pattern matching the reified statements in a staging graph
+_STAGED_PATTERN = (
+	f"?t <{STAGING_NS}subject> ?s ; <{STAGING_NS}predicate> ?p ; <{STAGING_NS}object> ?o"
+)
+
+
+def _write_staged_triples(staging_graph, marker, graph_uri, triples, first_id):
+	"""
+	Write *triples* into *staging_graph* as reified statements, STAGING_CHUNK_TRIPLES
+	per request, and return the next unused statement id.  Statement i is the IRI
+	<staging_graph#i>, with a <STAGING_NS + marker> link to the graph it is
+	destined for and subject / predicate / object properties.  The statements are
+	in the union default graph like any other named graph's triples, but only
+	as STAGING_NS reifications: none of the staged triples appear as themselves.
+	"""
+	def _flush(lines):
+		execute_sparql_update(f"INSERT DATA {{\n  GRAPH <{staging_graph}> {{\n{''.join(lines)}  }}\n}}")
+
+	lines = []
+	statement_id = first_id
+	for triple in triples:
+		statement_uri = f"{staging_graph}#{statement_id}"
+		lines.append(f"<{statement_uri}> <{STAGING_NS}{marker}> <{graph_uri}> .\n")
+		lines.append(_staged_statement(statement_uri, triple))
+		statement_id += 1
+		if (statement_id - first_id) % STAGING_CHUNK_TRIPLES == 0:
+			_flush(lines)
+			lines = []
+	if lines:
+		_flush(lines)
+	return statement_id
+
+
+def stage_large_fragment(fragment):
+	"""
+	Return *fragment* unchanged, or — if it holds more than
+	staged_commit_threshold() triples — write its data to a new staging graph in
+	bounded requests and return a small fragment that publishes it.
+
+	Sending a heavily-changed source as one INSERT DATA can mean a request body
+	of hundreds of MB, all of which Fuseki holds in its heap while parsing.
+	Staging instead spreads the data over requests of STAGING_CHUNK_TRIPLES
+	triples each; the returned fragment then applies it with INSERT / DELETE …
+	WHERE over the staging graph and drops the staging graph, all server-side.
+	That fragment goes into the Phase 1 update like any other, so the source
+	still changes in a single transaction and readers never see it half-applied.
+	Literal parts (e.g. the DELETE WHERE of the blank-node migration) are kept
+	in place, preserving their order relative to the data.
+
+	Until the publish runs, the reified statements are visible in the union
+	default graph (see _write_staged_triples).  If staging fails part way, the
+	staging graph is dropped here; if the publish never runs (e.g. Phase 1
+	fails), the caller drops it with drop_staging_graphs().
+	"""
+	if not isinstance(fragment, UpdateFragment) or fragment.triple_count <= staged_commit_threshold():
+		return fragment
+
+	staging_graph = f"{STAGING_GRAPH_PREFIX}{uuid.uuid4()}"
+	print(f"Staging {fragment.triple_count} triples in <{staging_graph}>")
+	publish = []
+	statement_id = 0
+	with span("stage"):
+		try:
+			for part in fragment.parts:
+				if isinstance(part, str):
+					publish.append(part)
+					continue
+				(operation, graph_uri, triples) = part
+				(marker, verb) = ("insert", "INSERT") if operation == "INSERT DATA" else ("delete", "DELETE")
+				statement_id = _write_staged_triples(staging_graph, marker, graph_uri, triples, statement_id)
+				publish.append(
+					f"{verb} {{ GRAPH <{graph_uri}> {{ ?s ?p ?o }} }}\n"
+					f"WHERE {{ GRAPH <{staging_graph}> {{ ?t <{STAGING_NS}{marker}> <{graph_uri}> . {_STAGED_PATTERN} }} }}"
+				)
+		except Exception:
+			_drop_graphs([staging_graph])
+			raise
+	count("staged", fragment.triple_count)
+	publish.append(f"DROP SILENT GRAPH <{staging_graph}>")
+	return UpdateFragment(publish, staging_graph=staging_graph)
+
+
+def drop_staging_graphs(fragments):
+	"""
+	Drop the staging graphs of any of *fragments* (UpdateFragments, strings or
+	None) which have one.  For fragments that won't be applied, e.g. because
+	Phase 1 failed: their staging graphs would otherwise stay in the union
+	default graph until the next cleanup_triplestore().
+	"""
+	_drop_graphs([fragment.staging_graph for fragment in fragments if getattr(fragment, "staging_graph", None)])
+
+
+def _drop_graphs(graph_uris):
+	"""Drop *graph_uris* in one update.  Anything left behind is removed by the
+	next cleanup_triplestore(), so errors are logged rather than raised."""
+	if not graph_uris:
+		return
+	try:
+		execute_sparql_update(" ;\n".join(f"DROP SILENT GRAPH <{graph_uri}>" for graph_uri in graph_uris))
+	except Exception as e:
+		print(f"Couldn't drop staging graph(s) {', '.join(f'<{g}>' for g in graph_uris)}: {e}", flush=True)
+
+
+# "local" diffs in Python against a CONSTRUCT of the current graph; "server"
+# uploads the new content and lets Fuseki work out the changes.  Overridable
+# with INGEST_DIFF_ENGINE.
+DEFAULT_DIFF_ENGINE = "local"
+DIFF_ENGINES = ("local", "server")
+
+
+def diff_engine() -> str:
+	"""The diff engine to use; read from INGEST_DIFF_ENGINE on every call."""
+	engine = os.environ.get("INGEST_DIFF_ENGINE", DEFAULT_DIFF_ENGINE).strip().lower()
+	return engine if engine in DIFF_ENGINES else DEFAULT_DIFF_ENGINE
+
+
+def _upload_body(staging_graph, triples):
+	"""Yield the reified N-Triples for *triples*, UTF-8 encoded, in pieces of about UPDATE_CHUNK_SIZE."""
+	buffer = []
+	size = 0
+	for statement_id, triple in enumerate(triples):
+		line = _staged_statement(f"{staging_graph}#{statement_id}", triple)
+		buffer.append(line)
+		size += len(line)
+		if size >= UPDATE_CHUNK_SIZE:
+			yield "".join(buffer).encode("utf-8")
+			buffer = []
+			size = 0
+	if buffer:
+		yield "".join(buffer).encode("utf-8")
+
+
+def server_side_diff(graph_uri: str, new_graph: Graph) -> UpdateFragment | None:
+	"""
+	Upload the Skolemised *new_graph* to a staging graph and return a fragment
+	in which Fuseki brings *graph_uri* into line with it.
+
+	The upload is a streamed POST to the graph store endpoint, with each triple
+	reified as in stage_large_fragment, so none of the uploaded triples appear
+	as themselves in the union default graph.  The returned fragment deletes every
+	triple of the live graph that has no staged counterpart (FILTER NOT EXISTS),
+	inserts every staged triple, and drops the staging graph.  Nothing of the
+	old graph is downloaded, so transfer and memory here scale with the new
+	payload alone.  Any blank nodes left in the live graph from before
+	Skolemisation can never match a staged triple, so the migration case needs
+	no special handling.
+
+	Once uploaded, an ASK over the same patterns checks whether the two graphs
+	differ at all; if not, the staging graph is dropped and ``None`` returned,
+	as the local diff does, so an unchanged source triggers no further work.
+	The size of a change isn't known until Fuseki applies it.  If the returned
+	fragment isn't applied, its staging graph is dropped with
+	drop_staging_graphs().
+	"""
+	staging_graph = f"{STAGING_GRAPH_PREFIX}{uuid.uuid4()}"
+	with span("upload"):
+		resp = session.post(
+			"http://triplestore:3030/raw_arachne/data",
+			params={"graph": staging_graph},
+			headers={"Content-Type": "application/n-triples"},
+			data=_upload_body(staging_graph, new_graph),
+		)
+		if not resp.ok:
+			print(f"Staging upload for <{graph_uri}> failed ({resp.status_code}): {resp.text[:500]}")
+			_drop_graphs([staging_graph])
+		resp.raise_for_status()
+	count("uploaded", len(new_graph))
+	print(f"Graph <{graph_uri}>: {len(new_graph)} triple(s) uploaded to <{staging_graph}> for a server-side diff")
+	with span("compare"):
+		try:
+			changed = _staged_graph_differs(graph_uri, staging_graph)
+		except Exception:
+			_drop_graphs([staging_graph])
+			raise
+	if not changed:
+		print(f"Graph <{graph_uri}>: no changes")
+		_drop_graphs([staging_graph])
+		return None
+	return UpdateFragment([
+		(
+			f"DELETE {{ GRAPH <{graph_uri}> {{ ?s ?p ?o }} }}\n"
+			f"WHERE {{ GRAPH <{graph_uri}> {{ ?s ?p ?o }}\n"
+			f"  FILTER NOT EXISTS {{ GRAPH <{staging_graph}> {{ {_STAGED_PATTERN} }} }} }}"
+		),
+		f"INSERT {{ GRAPH <{graph_uri}> {{ ?s ?p ?o }} }}\nWHERE {{ GRAPH <{staging_graph}> {{ {_STAGED_PATTERN} }} }}",
+		f"DROP SILENT GRAPH <{staging_graph}>",
+	], staging_graph=staging_graph)
+
+
+def _staged_graph_differs(graph_uri, staging_graph):
+	"""Whether *graph_uri* has a triple with no staged counterpart in *staging_graph*, or vice versa."""
+	resp = session.post(
+		"http://triplestore:3030/raw_arachne/sparql",
+		headers={"Accept": "application/json"},
+		data={"query": (
+			f"ASK {{"
+			f" {{ GRAPH <{graph_uri}> {{ ?s ?p ?o }}"
+			f" FILTER NOT EXISTS {{ GRAPH <{staging_graph}> {{ {_STAGED_PATTERN} }} }} }}"
+			f" UNION"
+			f" {{ GRAPH <{staging_graph}> {{ {_STAGED_PATTERN} }}"
+			f" FILTER NOT EXISTS {{ GRAPH <{graph_uri}> {{ ?s ?p ?o }} }} }}"
+			f" }}"
+		)},
 	)
 	resp.raise_for_status()
+	return resp.json()["boolean"]
+
+
+def _merge_diff(old_lines, new_lines):
+	"""
+	Diff two ascending sequences of distinct N-Triples lines in a single pass.
+	Returns (to_insert, to_delete) as lists of lines.  Both sequences are read
+	to the end.
+	"""
+	to_insert = []
+	to_delete = []
+	old_iter = iter(old_lines)
+	old = next(old_iter, None)
+	for new in new_lines:
+		while old is not None and old < new:
+			to_delete.append(old)
+			old = next(old_iter, None)
+		if old == new:
+			old = next(old_iter, None)
+		else:
+			to_insert.append(new)
+	while old is not None:
+		to_delete.append(old)
+		old = next(old_iter, None)
+	return (to_insert, to_delete)
+
+
+def _diff_fragment(graph_uri: str, to_insert, to_delete) -> UpdateFragment | None:
+	"""Count and log a computed diff, and return it as an UpdateFragment (None if empty)."""
+	count("inserts", len(to_insert))
+	count("deletes", len(to_delete))
+
+	if not to_insert and not to_delete:
+		print(f"Graph <{graph_uri}>: diff empty — no triplestore writes needed")
+		return None
+
+	print(
+		f"Graph <{graph_uri}>: diff has {len(to_insert)} insert(s), "
+		f"{len(to_delete)} delete(s)"
+	)
+	parts = []
+	if to_insert:
+		parts.append(("INSERT DATA", graph_uri, to_insert))
+	if to_delete:
+		parts.append(("DELETE DATA", graph_uri, to_delete))
+	return UpdateFragment(parts)
+
+
+class _NTriplesLineSink:
+	"""
+	A W3CNTriplesParser sink which keeps each parsed triple as its canonical
+	N-Triples line (see _nt_line) rather than adding it to a Graph.
+	"""
+
+	def __init__(self):
+		self.lines = set()
+		self.has_bnodes = False
+
+	def triple(self, s, p, o):
+		if isinstance(s, BNode) or isinstance(o, BNode):
+			self.has_bnodes = True
+		self.lines.add(_nt_line((s, p, o)))
+
+
+def _parse_nt_lines(lines, sink=None) -> _NTriplesLineSink:
+	"""
+	Parse an iterable of N-Triples lines (bytes or str) into *sink* (a new
+	_NTriplesLineSink by default), one line at a time, so a streamed response
+	can be parsed as it arrives.
+	"""
+	if sink is None:
+		sink = _NTriplesLineSink()
+	parser = W3CNTriplesParser(sink)
+	for line in lines:
+		parser.line = line.decode("utf-8") if isinstance(line, bytes) else line
+		try:
+			parser.parseline()
+		except ParseError:
+			raise ParseError(f"Invalid line: {parser.line}")
+	return sink
+
+
+def _construct_lines(query, sink=None) -> _NTriplesLineSink:
+	"""Run a CONSTRUCT *query* against raw_arachne, parsing the N-Triples as they stream in (see _parse_nt_lines)."""
+	resp = session.post(
+		"http://triplestore:3030/raw_arachne/sparql",
+		headers={"Accept": "application/n-triples"},
+		data={"query": query},
+		stream=True,
+	)
+	try:
+		resp.raise_for_status()
+		return _parse_nt_lines(resp.iter_lines(), sink)
+	finally:
+		resp.close()
+
+
+# A fingerprint diff fetches only the changed subjects' triples; once more than
+# this fraction of subjects have changed, diffing the whole graph is cheaper.
+FINGERPRINT_DIFF_MAX_FRACTION = 0.1
+# Subjects per CONSTRUCT when fetching changed subjects' triples
+FINGERPRINT_QUERY_BATCH = 500
+
+
+def _line_subject(line) -> str:
+	return line.split(" ", 1)[0]
+
 
+def _subject_fingerprints(sorted_lines) -> dict:
+	"""
+	Return {subject: fingerprint} for ascending N-Triples lines, each
+	fingerprint being a hash of the subject's lines.  Sorting keeps each
+	subject's lines together, as a subject term contains no spaces and is
+	followed by one.
+	"""
+	fingerprints = {}
+	for subject, lines in itertools.groupby(sorted_lines, key=_line_subject):
+		digest = hashlib.sha256()
+		for line in lines:
+			digest.update(line.encode("utf-8"))
+		fingerprints[subject] = digest.hexdigest()[:32]
+	return fingerprints
+
+
+def _fingerprint_diff(graph_uri: str, new_lines: list, fingerprints: dict, snapshot):
+	"""
+	Diff only the subjects whose fingerprints differ from *snapshot*'s
+	committed index — changed, added or removed — fetching just those
+	subjects' current triples from the triplestore.  Returns (used, fragment)
+	like _snapshot_diff.
+	"""
+	previous = snapshot.previous_fingerprints()
+	if previous is None:
+		return (False, None)
+	changed = {subject for subject, fingerprint in fingerprints.items() if previous.get(subject) != fingerprint}
+	changed.update(subject for subject in previous if subject not in fingerprints)
+	if len(changed) > FINGERPRINT_DIFF_MAX_FRACTION * max(len(fingerprints), len(previous)):
+		return (False, None)
+	# Blank node subjects can't be looked up; Skolemised graphs have none
+	if any(subject.startswith("_:") for subject in changed):
+		return (False, None)
+	count("changed_subjects", len(changed))
 
-def diff_graph_in_triplestore(graph_uri: str, new_content: str, content_type: str) -> str | None:
+	old = _NTriplesLineSink()
+	batches = sorted(changed)
+	with span("construct"):
+		for i in range(0, len(batches), FINGERPRINT_QUERY_BATCH):
+			values = " ".join(batches[i:i + FINGERPRINT_QUERY_BATCH])
+			_construct_lines(
+				f"CONSTRUCT {{ ?s ?p ?o }} WHERE {{ VALUES ?s {{ {values} }} GRAPH <{graph_uri}> {{ ?s ?p ?o }} }}",
+				old,
+			)
+	if old.has_bnodes:
+		return (False, None)
+	with span("diff"):
+		new_subset = {line for line in new_lines if _line_subject(line) in changed}
+		to_insert = new_subset - old.lines
+		to_delete = old.lines - new_subset
+	return (True, _diff_fragment(graph_uri, to_insert, to_delete))
+
+
+def _snapshot_diff(graph_uri: str, new_lines: set, snapshot):
+	"""
+	Record *new_lines* and their subject fingerprints as *snapshot*'s pending
+	snapshot and, if the previous one is usable, diff against it: by subject
+	fingerprint where few subjects changed, otherwise by a merge-join of the
+	lines.  Returns (used, fragment); used is False when the caller has to
+	fall back to a CONSTRUCT of the whole graph.
+	"""
+	with span("diff"):
+		new_lines = sorted(new_lines)
+		fingerprints = _subject_fingerprints(new_lines)
+	try:
+		snapshot.record(new_lines, fingerprints)
+	except OSError as e:
+		print(f"Couldn't write snapshot of <{graph_uri}>: {e}")
+	(used, fragment) = _fingerprint_diff(graph_uri, new_lines, fingerprints, snapshot)
+	if used:
+		count("snapshot_hits", 1)
+		return (True, fragment)
+	previous = snapshot.previous_lines()
+	if previous is None:
+		return (False, None)
+	with span("diff"):
+		(to_insert, to_delete) = _merge_diff(previous, new_lines)
+	if not snapshot.verified:
+		print(f"Snapshot of <{graph_uri}> failed verification — diffing against the triplestore instead")
+		return (False, None)
+	count("snapshot_hits", 1)
+	return (True, _diff_fragment(graph_uri, to_insert, to_delete))
+
+
+def diff_graph_in_triplestore(graph_uri: str, new_content, content_type: str, snapshot=None) -> UpdateFragment | None:
 	"""
 	Compute a SPARQL Update fragment to bring the named graph at *graph_uri* from
 	its current triplestore state to the state described by *new_content*.
 
+	*new_content* is anything accepted by ``parse_graph``.  Callers which also
+	need the graph for the search index should parse it once and pass the Graph;
+	it is not modified here.
+
 	Steps:
-	1. Parse *new_content* as an RDF graph using rdflib.
-	2. Skolemise blank nodes in the incoming graph.
-	3. Fetch the current graph from the triplestore via a CONSTRUCT query.
+	1. Parse *new_content* as an RDF graph using rdflib, unless already parsed.
+	2. Skolemise blank nodes in the incoming graph — already done if it came
+	   from parse_graph, otherwise into a copy.
+	3. Fetch the current graph from the triplestore via a CONSTRUCT query,
+	   parsing the response line by line as it streams in.
 	4. Compute ``to_insert = new − old`` and ``to_delete = old − new`` as set
-	   differences.
-	5. Build and return a SPARQL Update fragment, or ``None`` if there are no
-	   changes.
+	   differences.  Both sides are sets of canonical N-Triples lines (see
+	   _nt_line), so the old graph is never built as an rdflib Graph and the
+	   diff needs no re-serialising.
+	5. Return an UpdateFragment holding the INSERT DATA / DELETE DATA lines,
+	   or ``None`` if there are no changes.
 
 	Migration case: if the current triplestore graph still contains blank nodes
 	(i.e. the graph was written before Skolemisation was introduced), the function
 	returns a ``DELETE WHERE { … } ; INSERT DATA { … }`` fragment that purges the
 	blank nodes and replaces them with the Skolemised content in a single atomic
 	transaction.
+
+	When diff_engine() is "server", steps 3–5 are replaced by server_side_diff.
+
+	*snapshot*, if given, is the source's snapshot.SourceSnapshot.  The new
+	graph is recorded on it, and if the last committed snapshot is usable, steps
+	3 and 4 only cover the subjects whose fingerprints changed, or else become a
+	merge-join of the snapshot's sorted lines with the new ones; either way the
+	whole graph isn't fetched from the triplestore.
 	"""
 	# 1 + 2. Parse incoming content and Skolemise
-	rdflib_format = _content_type_to_rdflib_format(content_type)
-	new_graph = Graph()
-	new_graph.parse(data=new_content, format=rdflib_format)
-	new_graph = skolemise_graph(new_graph)
+	with span("parse"):
+		new_graph = parse_graph(new_content, content_type)
+	with span("skolemise"):
+		new_graph = skolemise_graph(new_graph)
 
-	# 3. Fetch current graph from the triplestore
-	construct_resp = session.post(
-		"http://triplestore:3030/raw_arachne/sparql",
-		headers={"Accept": "application/n-triples"},
-		data={"query": f"CONSTRUCT {{ ?s ?p ?o }} WHERE {{ GRAPH <{graph_uri}> {{ ?s ?p ?o }} }}"},
-	)
-	construct_resp.raise_for_status()
+	if diff_engine() == "server":
+		return server_side_diff(graph_uri, new_graph)
+
+	with span("diff"):
+		new_lines = {_nt_line(triple) for triple in new_graph}
 
-	old_graph = Graph()
-	raw_nt = construct_resp.text.strip()
-	if raw_nt:
-		old_graph.parse(data=raw_nt, format="nt")
+	if snapshot is not None:
+		(used, fragment) = _snapshot_diff(graph_uri, new_lines, snapshot)
+		if used:
+			return fragment
+
+	return diff_lines_in_triplestore(graph_uri, new_lines)
+
+
+def diff_lines_in_triplestore(graph_uri: str, new_lines: set) -> UpdateFragment | None:
+	"""
+	Compute a SPARQL Update fragment to bring the named graph at *graph_uri* to
+	*new_lines*, a set of canonical N-Triples lines (see _nt_line) with no
+	blank nodes.  These are steps 3–5 of diff_graph_in_triplestore, for callers
+	which already hold their triples as lines and so needn't build a Graph.
+	"""
+	# 3. Fetch current graph from the triplestore
+	with span("construct"):
+		old = _construct_lines(f"CONSTRUCT {{ ?s ?p ?o }} WHERE {{ GRAPH <{graph_uri}> {{ ?s ?p ?o }} }}")
 
 	# Migration case: if the old graph contains blank nodes, we cannot use
 	# DELETE DATA (SPARQL forbids blank nodes there).  Use DELETE WHERE to wipe
 	# all triples and re-insert the Skolemised content atomically.
-	old_has_bnodes = any(
-		isinstance(s, BNode) or isinstance(o, BNode) for s, _, o in old_graph
-	)
-	if old_has_bnodes:
+	if old.has_bnodes:
 		print(
 			f"Graph <{graph_uri}> contains blank nodes — migrating to Skolem URIs "
-			f"({len(old_graph)} triples old → {len(new_graph)} triples new)"
+			f"({len(old.lines)} triples old → {len(new_lines)} triples new)"
 		)
+		count("inserts", len(new_lines))
+		count("deletes", len(old.lines))
 		parts = [f"DELETE WHERE {{ GRAPH <{graph_uri}> {{ ?s ?p ?o }} }}"]
-		if new_graph:
-			new_nt = new_graph.serialize(format="nt")
-			parts.append(f"INSERT DATA {{\n  GRAPH <{graph_uri}> {{\n{new_nt}  }}\n}}")
-		return " ;\n".join(parts)
+		if new_lines:
+			parts.append(("INSERT DATA", graph_uri, new_lines))
+		return UpdateFragment(parts)
 
 	# 4. Compute diff
-	new_triples = set(new_graph)
-	old_triples = set(old_graph)
-	to_insert = new_triples - old_triples
-	to_delete = old_triples - new_triples
-
-	if not to_insert and not to_delete:
-		print(f"Graph <{graph_uri}>: diff empty — no triplestore writes needed")
-		return None
-
-	print(
-		f"Graph <{graph_uri}>: diff has {len(to_insert)} insert(s), "
-		f"{len(to_delete)} delete(s)"
-	)
+	with span("diff"):
+		to_insert = new_lines - old.lines
+		to_delete = old.lines - new_lines
 
 	# 5. Build SPARQL Update fragment
-	parts = []
-	if to_insert:
-		insert_graph = Graph()
-		for triple in to_insert:
-			insert_graph.add(triple)
-		insert_nt = insert_graph.serialize(format="nt")
-		parts.append(f"INSERT DATA {{\n  GRAPH <{graph_uri}> {{\n{insert_nt}  }}\n}}")
-
-	if to_delete:
-		delete_graph = Graph()
-		for triple in to_delete:
-			delete_graph.add(triple)
-		delete_nt = delete_graph.serialize(format="nt")
-		parts.append(f"DELETE DATA {{\n  GRAPH <{graph_uri}> {{\n{delete_nt}  }}\n}}")
-
-	return " ;\n".join(parts)
+	return _diff_fragment(graph_uri, to_insert, to_delete)
 
 
 # Cleans up any graphs in the triplestore which aren't in the list provided
@@ -0,0 +1,471 @@
+"""
+In-memory stand-in for the Fuseki triplestore.
+
+Speaks the subset of the SPARQL 1.1 query, update and graph store protocols that
+the ingestor and MCP server use, for the two services defined in
+triplestore/configuration/arachne.ttl:
+
+	/raw_arachne/{query,sparql}   SPARQL query
+	/raw_arachne/update           SPARQL update
+	/raw_arachne/data             graph store protocol, read-write
+	/arachne/{query,sparql}       SPARQL query
+	/arachne/get                  graph store protocol, read-only
+
+Both services share one rdflib Dataset whose default graph is the union of all
+named graphs, like the TDB2 dataset's unionDefaultGraph.  Credentials are
+accepted but not checked.
+
+A TriplestoreStandin can be used in-process, as a drop-in replacement for the
+requests session in triplestore.py and searchindex.py (it has post() and get()),
+or served over HTTP by StandinServer, which can also be mounted onto an existing
+requests session in place of http://triplestore:3030/.  Latency and failures can
+be injected either way:
+
+	standin = TriplestoreStandin(latency=0.05)
+	standin.fail_next(503, times=2, endpoint="update")
+	with StandinServer(standin) as server:
+		server.mount(triplestore.session)
+		...
+
+Run as a script to serve it on a port, e.g. for the MCP server's
+TRIPLESTORE_SPARQL_URL:
+
+	python triplestore_standin.py --port 3030 --load urn:example:graph=data.ttl
+"""
+import argparse, json, random, re, threading, time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from rdflib import BNode, Dataset, Graph, URIRef
+from rdflib.plugins.sparql.algebra import translateUpdate
+from rdflib.plugins.sparql.parser import parseUpdate
+
+FUSEKI_ORIGIN = "http://triplestore:3030"
+
+# service name → {endpoint name → operation}, as configured in arachne.ttl
+SERVICES = {
+	"raw_arachne": {"query": "query", "sparql": "query", "update": "update", "data": "gsp-rw"},
+	"arachne": {"query": "query", "sparql": "query", "get": "gsp-r"},
+}
+
+GSP_FORMATS = {
+	"text/turtle": "turtle",
+	"application/n-triples": "nt",
+	"application/rdf+xml": "xml",
+	"application/ld+json": "json-ld",
+}
+
+
+class StandinResponse:
+	"""The subset of requests.Response used by the ingestor."""
+
+	def __init__(self, status_code=200, text="", content_type="text/plain"):
+		self.status_code = status_code
+		self.text = text
+		self.headers = {"Content-Type": content_type}
+
+	@property
+	def ok(self):
+		return self.status_code < 400
+
+	@property
+	def content(self):
+		return self.text.encode("utf-8")
+
+	def json(self):
+		return json.loads(self.text)
+
+	def iter_lines(self, chunk_size=512, decode_unicode=False):
+		for line in self.content.splitlines():
+			yield line.decode("utf-8") if decode_unicode else line
+
+	def close(self):
+		pass
+
+	def raise_for_status(self):
+		if not self.ok:
+			raise requests.HTTPError(f"{self.status_code} error from triplestore stand-in: {self.text[:200]}", response=self)
+
+
+class TriplestoreStandin:
+	"""
+	An rdflib Dataset behind the raw_arachne and arachne endpoints.
+
+	*latency* is a number of seconds to wait before answering each request.
+	*failure_rate* is the probability that any request fails with
+	*failure_status*; a status of None drops the connection instead of
+	answering.  *seed* makes random failures reproducible.
+
+	Updates are checked against the SPARQL 1.1 Update grammar before they're
+	applied, so the stand-in rejects what Fuseki would.  *fast_updates* skips
+	that check, for benchmarks timing large updates the ingestor is known to
+	write correctly.
+	"""
+
+	def __init__(self, latency=0.0, failure_rate=0.0, failure_status=503, seed=None, fast_updates=False):
+		self.dataset = Dataset(default_union=True)
+		self.latency = latency
+		self.failure_rate = failure_rate
+		self.failure_status = failure_status
+		self.fast_updates = fast_updates
+		self.calls = Counter()
+		self._random = random.Random(seed)
+		self._scheduled_failures = []
+		self._lock = threading.RLock()
+
+	def load(self, graph_uri, graph):
+		"""Add every triple of *graph* to the named graph *graph_uri*."""
+		with self._lock:
+			named = self.dataset.graph(URIRef(graph_uri))
+			for triple in graph:
+				named.add(triple)
+
+	def graph(self, graph_uri):
+		return self.dataset.graph(URIRef(graph_uri))
+
+	def __len__(self):
+		with self._lock:
+			return sum(len(g) for g in self.dataset.graphs())
+
+	def fail_next(self, status=503, times=1, endpoint=None):
+		"""
+		Make the next *times* requests fail with *status* (None drops the connection).
+		If *endpoint* is given (e.g. "update" or "sparql"), only requests to that
+		endpoint count.
+		"""
+		with self._lock:
+			self._scheduled_failures.append([endpoint, status, times])
+
+	def _injected_failure(self, endpoint):
+		"""Return (True, status) if this request should fail, else (False, None)."""
+		with self._lock:
+			for scheduled in self._scheduled_failures:
+				if scheduled[0] in (None, endpoint):
+					scheduled[2] -= 1
+					if scheduled[2] <= 0:
+						self._scheduled_failures.remove(scheduled)
+					return (True, scheduled[1])
+			if self.failure_rate and self._random.random() < self.failure_rate:
+				return (True, self.failure_status)
+		return (False, None)
+
+	# -- in-process session interface -----------------------------------------
+
+	def post(self, url, headers=None, data=None, params=None, **kwargs):
+		return self.request("POST", url, headers=headers, data=data, params=params)
+
+	def get(self, url, headers=None, params=None, **kwargs):
+		return self.request("GET", url, headers=headers, params=params)
+
+	def request(self, method, url, headers=None, data=None, params=None, **kwargs):
+		"""Answer a requests-style call without going over HTTP."""
+		headers = dict(headers or {})
+		if isinstance(data, dict):
+			data = urlencode(data)
+			headers.setdefault("Content-Type", "application/x-www-form-urlencoded")
+		elif data is not None and not isinstance(data, (str, bytes)):
+			# A streamed body, as sent by execute_sparql_update
+			data = b"".join(chunk.encode("utf-8") if isinstance(chunk, str) else chunk for chunk in data)
+		if isinstance(data, str):
+			data = data.encode("utf-8")
+		parsed = urlparse(url)
+		query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+		query.update(params or {})
+		response = self.handle(method, parsed.path, query, headers, data or b"")
+		if response is None:
+			raise requests.ConnectionError(f"Triplestore stand-in dropped the connection to {url}")
+		return response
+
+	# -- protocol -------------------------------------------------------------
+
+	def handle(self, method, path, params, headers, body):
+		"""
+		Answer one protocol request, returning a StandinResponse, or None if the
+		connection should be dropped.  *params* holds the URL query parameters,
+		*headers* the request headers and *body* the raw request body.
+		"""
+		headers = {key.lower(): value for key, value in headers.items()}
+		segments = path.strip("/").split("/")
+		if len(segments) != 2 or segments[1] not in SERVICES.get(segments[0], {}):
+			return StandinResponse(404, f"No endpoint at {path}")
+		(service, endpoint) = segments
+		operation = SERVICES[service][endpoint]
+		self.calls[f"{service}/{endpoint}"] += 1
+
+		if self.latency:
+			time.sleep(self.latency)
+		(fail, status) = self._injected_failure(endpoint)
+		if fail:
+			return None if status is None else StandinResponse(status, f"Injected failure for {path}")
+
+		content_type = headers.get("content-type", "").split(";")[0].strip()
+		try:
+			if operation == "query":
+				query = params.get("query")
+				if method == "POST" and content_type == "application/x-www-form-urlencoded":
+					query = _form(body).get("query", query)
+				elif method == "POST" and content_type == "application/sparql-query":
+					query = body.decode("utf-8")
+				if not query:
+					return StandinResponse(400, "No query given")
+				return self._query(query, params.get("format") or headers.get("accept", ""))
+			if operation == "update":
+				if method != "POST":
+					return StandinResponse(405, "Updates must be POSTed")
+				update = _form(body).get("update") if content_type == "application/x-www-form-urlencoded" else body.decode("utf-8")
+				self._update(update)
+				return StandinResponse(204)
+			return self._graph_store(method, operation, params, content_type, headers.get("accept", ""), body)
+		except Exception as e:
+			return StandinResponse(400, str(e))
+
+	def _update(self, update):
+		"""
+		Apply a SPARQL Update.  INSERT DATA / DELETE DATA blocks laid out as the
+		ingestor writes them (see _data_blocks) are applied by parsing their
+		N-Triples directly; everything else goes through rdflib's SPARQL Update
+		implementation, in order.  rdflib's translation of a data block costs far
+		more than the ingestor spends building it, which would swamp timings.
+
+		Unless fast_updates is set, the whole update is validated first (see
+		_validate_update), and nothing is applied if it fails.
+		"""
+		if not self.fast_updates:
+			_validate_update(update)
+		with self._lock:
+			for (operation, graph_uri, body) in _data_blocks(update):
+				if operation is None:
+					self.dataset.update(body)
+					continue
+				named = self.graph(graph_uri)
+				parsed = Graph().parse(data=body, format="nt")
+				if operation == "INSERT":
+					named.addN((s, p, o, named) for (s, p, o) in parsed)
+				else:
+					for triple in parsed:
+						named.remove(triple)
+
+	def _query(self, query, accept):
+		with self._lock:
+			result = self.dataset.query(query)
+			if result.type in ("CONSTRUCT", "DESCRIBE"):
+				if "n-triples" in accept:
+					return StandinResponse(200, result.graph.serialize(format="nt"), "application/n-triples")
+				return StandinResponse(200, result.graph.serialize(format="turtle"), "text/turtle")
+			return StandinResponse(200, result.serialize(format="json").decode("utf-8"), "application/sparql-results+json")
+
+	def _graph_store(self, method, operation, params, content_type, accept, body):
+		if "graph" in params:
+			graph_uri = params["graph"]
+		elif "default" in params:
+			graph_uri = None
+		else:
+			return StandinResponse(400, "Graph store requests need a graph or default parameter")
+
+		if method == "GET":
+			with self._lock:
+				source = self.dataset if graph_uri is None else self.graph(graph_uri)
+				graph = Graph()
+				for triple in source.triples((None, None, None)):
+					graph.add(triple)
+			if graph_uri is not None and not len(graph):
+				return StandinResponse(404, f"No such graph: <{graph_uri}>")
+			media_type = next((t for t in GSP_FORMATS if t in accept), "text/turtle")
+			return StandinResponse(200, graph.serialize(format=GSP_FORMATS[media_type]), media_type)
+
+		if operation != "gsp-rw":
+			return StandinResponse(405, "Read-only graph store endpoint")
+		if graph_uri is None:
+			return StandinResponse(400, "Writes to the union default graph are not supported")
+		if method == "DELETE":
+			with self._lock:
+				if not len(self.graph(graph_uri)):
+					return StandinResponse(404, f"No such graph: <{graph_uri}>")
+				self.dataset.remove_graph(URIRef(graph_uri))
+			return StandinResponse(204)
+		if method not in ("PUT", "POST"):
+			return StandinResponse(405, f"Unsupported method {method}")
+
+		parsed = Graph()
+		parsed.parse(data=body.decode("utf-8"), format=GSP_FORMATS.get(content_type, content_type))
+		with self._lock:
+			if method == "PUT":
+				self.dataset.remove_graph(URIRef(graph_uri))
+			self.load(graph_uri, parsed)
+		return StandinResponse(200, json.dumps({"count": len(parsed), "tripleCount": len(parsed), "quadCount": 0}), "application/json")
+
+
+# The opening of a data block as UpdateFragment writes it; its N-Triples lines
+# follow, one per line, up to _DATA_BLOCK_END.  N-Triples escapes newlines in
+# literals, so the end marker can't occur inside the data.
+_DATA_BLOCK_START = re.compile(r"(INSERT|DELETE) DATA \{\n  GRAPH <([^>\n]*)> \{\n")
+_DATA_BLOCK_END = "\n  }\n}"
+
+
+def _data_blocks(update):
+	"""
+	Split *update* into (operation, graph_uri, N-Triples) for each data block
+	and (None, None, SPARQL) for the update text between them.
+	"""
+	position = 0
+	while True:
+		match = _DATA_BLOCK_START.search(update, position)
+		end = update.find(_DATA_BLOCK_END, match.end() - 1) if match else -1
+		if end < 0:
+			break
+		between = update[position:match.start()].strip().strip(";").strip()
+		if between:
+			yield (None, None, between)
+		yield (match.group(1), match.group(2), update[match.end():end + 1])
+		position = end + len(_DATA_BLOCK_END)
+	rest = update[position:].strip().strip(";").strip()
+	if rest:
+		yield (None, None, rest)
+
+
+def _validate_update(update):
+	"""
+	Raise ValueError unless *update* is valid SPARQL 1.1 Update.  rdflib's
+	parser enforces the grammar, but not the rule that DELETE DATA can't
+	contain blank nodes, so that's checked here.
+	"""
+	try:
+		operations = translateUpdate(parseUpdate(update)).algebra
+	except Exception as e:
+		raise ValueError(f"Invalid SPARQL Update: {e}") from e
+	for operation in operations:
+		if operation.name != "DeleteData":
+			continue
+		triples = list(operation.triples or []) + [triple for quads in (operation.quads or {}).values() for triple in quads]
+		if any(isinstance(term, BNode) for triple in triples for term in triple):
+			raise ValueError("Invalid SPARQL Update: blank nodes are not allowed in DELETE DATA")
+
+
+def _form(body):
+	return {key: values[0] for key, values in parse_qs(body.decode("utf-8")).items()}
+
+
+class _Handler(BaseHTTPRequestHandler):
+	# Set on the subclass created by StandinServer
+	standin = None
+
+	def _respond(self):
+		parsed = urlparse(self.path)
+		params = {key: values[0] for key, values in parse_qs(parsed.query, keep_blank_values=True).items()}
+		if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+			body = self._read_chunked()
+		else:
+			length = int(self.headers.get("Content-Length") or 0)
+			body = self.rfile.read(length) if length else b""
+		response = self.standin.handle(self.command, parsed.path, params, dict(self.headers.items()), body)
+		if response is None:
+			self.close_connection = True
+			return
+		payload = response.content
+		try:
+			self.send_response(response.status_code)
+			self.send_header("Content-Type", response.headers["Content-Type"])
+			self.send_header("Content-Length", str(len(payload)))
+			self.end_headers()
+			self.wfile.write(payload)
+		except (BrokenPipeError, ConnectionResetError):
+			# The client gave up waiting, e.g. on an injected latency beyond its timeout
+			pass
+
+	def _read_chunked(self):
+		chunks = []
+		while True:
+			size = int(self.rfile.readline().split(b";")[0].strip(), 16)
+			if size == 0:
+				# Skip any trailers up to the terminating blank line
+				while self.rfile.readline().strip():
+					pass
+				return b"".join(chunks)
+			chunks.append(self.rfile.read(size))
+			self.rfile.readline()
+
+	do_GET = do_POST = do_PUT = do_DELETE = _respond
+
+	def log_message(self, format, *args):
+		pass
+
+
+class _ForwardingAdapter(HTTPAdapter):
+	"""Send requests for one origin to another, e.g. http://triplestore:3030 to a local port."""
+
+	def __init__(self, from_origin, to_origin):
+		super().__init__()
+		self.from_origin = from_origin
+		self.to_origin = to_origin
+
+	def send(self, request, **kwargs):
+		request.url = self.to_origin + request.url[len(self.from_origin):]
+		return super().send(request, **kwargs)
+
+
+class StandinServer:
+	"""Serve a TriplestoreStandin over HTTP on a background thread."""
+
+	def __init__(self, standin=None, host="127.0.0.1", port=0):
+		self.standin = standin if standin is not None else TriplestoreStandin()
+		handler = type("StandinHandler", (_Handler,), {"standin": self.standin})
+		self.httpd = ThreadingHTTPServer((host, port), handler)
+		self.httpd.daemon_threads = True
+		self._thread = None
+
+	@property
+	def url(self):
+		(host, port) = self.httpd.server_address[:2]
+		return f"http://{host}:{port}"
+
+	def start(self):
+		self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+		self._thread.start()
+		return self
+
+	def stop(self):
+		self.httpd.shutdown()
+		self.httpd.server_close()
+		if self._thread:
+			self._thread.join()
+
+	def __enter__(self):
+		return self.start()
+
+	def __exit__(self, *exc_info):
+		self.stop()
+
+	def mount(self, session, origin=FUSEKI_ORIGIN):
+		"""Route *session*'s requests for *origin* to this server."""
+		session.mount(origin + "/", _ForwardingAdapter(origin, self.url))
+		return session
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Serve an in-memory stand-in for the arachne triplestore")
+	parser.add_argument("--host", default="127.0.0.1")
+	parser.add_argument("--port", type=int, default=3030)
+	parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering each request")
+	parser.add_argument("--failure-rate", type=float, default=0.0, help="Probability that a request fails with 503")
+	parser.add_argument("--load", action="append", default=[], metavar="GRAPH_URI=FILE",
+		help="Load an RDF file into a named graph before serving (repeatable)")
+	args = parser.parse_args(argv)
+
+	standin = TriplestoreStandin(latency=args.latency, failure_rate=args.failure_rate)
+	for spec in args.load:
+		(graph_uri, _, path) = spec.rpartition("=")
+		standin.load(graph_uri, Graph().parse(path))
+	server = StandinServer(standin, host=args.host, port=args.port)
+	print(f"Triplestore stand-in with {len(standin)} triples listening on {server.url}", flush=True)
+	try:
+		server.httpd.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		server.httpd.server_close()
+
+
+if __name__ == "__main__":
+	main()
@@ -73,7 +73,8 @@ TYPESENSE_URL = "http://search:8108"
 # KEY_LUCOS_ARACHNE is registered in the search container with full ["*"] permissions
 TYPESENSE_API_KEY = os.environ.get("KEY_LUCOS_ARACHNE", "")
 
-TRIPLESTORE_SPARQL_URL = "http://triplestore:3030/arachne/sparql"
+# Overridable so the tools can be run against a stand-in (see ingestor/triplestore_standin.py)
+TRIPLESTORE_SPARQL_URL = os.environ.get("TRIPLESTORE_SPARQL_URL", "http://triplestore:3030/arachne/sparql")
 TRIPLESTORE_AUTH = ("lucos_arachne", os.environ.get("KEY_LUCOS_ARACHNE", ""))
 
 # Per-tool query budgets — all strictly below Fuseki's 30 s service-loop guard.
@@ -94,7 +95,7 @@ mcp = MCPServer(
     name="lucos_arachne",
     instructions=(
         "This server provides structured access to the lucos_arachne knowledge graph. "
-        "It queries the Fuseki triplestore (OWL-inferred arachne endpoint) and the "
+        "It queries the Fuseki triplestore (arachne endpoint, including inferred triples) and the "
         "Typesense full-text search index. Use the available tools to explore entities, "
         "types, and relationships in the knowledge graph."
     ),
@@ -285,11 +286,11 @@ def get_entity(uri: str) -> str:
     """
     Return all properties and values for a given entity URI.
 
-    Uses the OWL-inferred `arachne` endpoint, so the result includes both directly
-    asserted triples and inferred ones. For example, if a group has a `foaf:member`
-    assertion pointing to a person, Fuseki's OWL reasoner infers the inverse
-    `foaf:memberOf` on the person. On the raw `raw_arachne` endpoint that inverse
-    triple would be absent even though the relationship exists in the data.
+    Uses the `arachne` endpoint, so the result includes both directly asserted
+    triples and the inferred ones the ingestor materialises into `urn:lucos:inferred`.
+    For example, if a group has a `foaf:member` assertion pointing to a person, the
+    inverse `foaf:memberOf` is inferred on the person, and an entity whose type is a
+    subclass also has `rdf:type` of each superclass.
 
     Queries for all triples where the given URI is the subject. Properties are shown with
     human-readable prefixed names where possible (e.g. foaf:name, skos:prefLabel).
@@ -387,11 +388,11 @@ def list_types() -> str:
     """
     List all RDF types in the triplestore with instance counts.
 
-    Uses the OWL-inferred `arachne` endpoint so that instance counts reflect
-    class-hierarchy closure. An entity declared as a subtype (e.g. `schema:MusicAlbum`)
-    is also counted under its supertypes (e.g. `schema:CreativeWork`) if the ontology
-    defines the subclass relationship. On the raw `raw_arachne` endpoint, subclass
-    membership is not expanded and supertype counts would under-report.
+    Instance counts reflect class-hierarchy closure. An entity declared as a subtype
+    (e.g. `schema:MusicAlbum`) is also counted under its supertypes (e.g.
+    `schema:CreativeWork`) if the ontology defines the subclass relationship: the
+    ingestor materialises `rdf:type` over `rdfs:subClassOf` into the inferred graph,
+    which the `arachne` endpoint's union default graph includes.
 
     Returns a list of types sorted by instance count (descending), with
     human-readable labels where available (skos:prefLabel or rdfs:label),
@@ -564,11 +565,10 @@ def find_entities(
     Find entities of a given type in the knowledge graph, with optional property values
     and filters.
 
-    Uses the OWL-inferred `arachne` endpoint so that type membership includes subclass
-    instances: querying for `schema:CreativeWork` returns `schema:MusicAlbum` entities
-    too, because the OWL reasoner expands the subclass hierarchy. On the raw
-    `raw_arachne` endpoint, only entities with a direct `rdf:type` assertion for the
-    requested type would match — subclass instances would be silently excluded.
+    Type membership includes subclass instances: querying for `schema:CreativeWork`
+    returns `schema:MusicAlbum` entities too, because the ingestor materialises
+    `rdf:type` over the subclass hierarchy into the inferred graph, which the
+    `arachne` endpoint includes. The type check stays a plain `?s a <type>` lookup.
 
     Returns a list of matching entities with their URI, label, and any requested
     property values.
@@ -706,8 +706,8 @@ def count_by_property(type: str, property: str) -> str:
     """
     Count how many entities of a given type have a specific property.
 
-    Uses the OWL-inferred `arachne` endpoint. The type check (`?s a <type>`)
-    benefits from OWL closure: subclass instances are included in the total,
+    Uses the `arachne` endpoint. The type check (`?s a <type>`) includes the
+    materialised subclass closure: subclass instances are included in the total,
     so querying for `schema:CreativeWork` counts `schema:MusicAlbum` instances
     too. The property check (`?s <prop> ?val`) gains little from inference since
     most data properties in this graph are directly asserted — but keeping both